@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Compare full-path and directory-relative (dir_fd) file operations on a
+deep synthetic tree: scanning it, then converting every matching file
+with hard-link backups.
+
+Each mode gets a fresh tree. Besides wall time, the number of path
+components the kernel has to resolve is counted over the os calls the
+engine makes (stat, link, rename, unlink, open); a call relative to an
+open directory resolves only the file name. Stats made inside scandir
+entries are not visible to the counter, so the scan is reported by time
+only. --lookup-us adds an estimate for a filesystem where every component
+lookup costs that many microseconds (a network client revalidating its
+cache, say).
+
+Usage:
+    python benchmarks/bench_dirfd.py [--files 20000] [--depth 24] [--fanout 1]
+                                     [--jobs 1] [--lookup-us 0] [--dir DIR] [--json]
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from extupdate.dirfd import DIR_FD_SUPPORTED  # noqa: E402
+from extupdate.engine import ConversionEngine, ConversionOptions  # noqa: E402
+from extupdate.scanner import read_directory, scan  # noqa: E402
+
+from synthetic import TreeSpec, count_dirs, default_base, make_tree  # noqa: E402
+
+# os functions taking a path (first, or first and second for two-path
+# calls) that the conversion step uses
+ONE_PATH_CALLS = ("stat", "lstat", "unlink", "open")
+TWO_PATH_CALLS = ("rename", "replace", "link")
+
+
+class ComponentCounter:
+    """Count path components resolved by os calls while active"""
+
+    def __init__(self):
+        self.calls = 0
+        self.components = 0
+        self._lock = threading.Lock()
+        self._saved = {}
+
+    @staticmethod
+    def _count(path) -> int:
+        """Components of path; names relative to a dir_fd are usually just one"""
+        if isinstance(path, int):
+            return 0
+        return len([part for part in os.fsdecode(path).split(os.sep) if part])
+
+    def _wrap(self, name: str, paths: int):
+        original = getattr(os, name)
+
+        def counted(*args, **kwargs):
+            resolved = sum(self._count(path) for path in args[:paths])
+            with self._lock:
+                self.calls += 1
+                self.components += resolved
+            return original(*args, **kwargs)
+        self._saved[name] = original
+        setattr(os, name, counted)
+
+    def __enter__(self):
+        for name in ONE_PATH_CALLS:
+            self._wrap(name, 1)
+        for name in TWO_PATH_CALLS:
+            self._wrap(name, 2)
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self._saved.items():
+            setattr(os, name, original)
+        self._saved.clear()
+
+
+def run_mode(base: str, args, dir_fd: bool) -> Dict:
+    root = tempfile.mkdtemp(prefix="extupdate-bench-", dir=base)
+    try:
+        make_tree(root, TreeSpec(args.files, args.depth, args.fanout, ((".xls", 1),)))
+        # Absolute paths, as the GUI and CLI pass them
+        root = os.path.abspath(root)
+        reader = functools.partial(read_directory, dir_fd=dir_fd)
+        start = time.perf_counter()
+        found = scan(root, ".xls", True, 1, reader=reader)
+        scan_seconds = time.perf_counter() - start
+
+        options = ConversionOptions(root=root, source_ext=".xls", target_ext=".xlsx", recursive=True,
+                                    backup=True, backup_strategy="hardlink", jobs=args.jobs)
+        engine = ConversionEngine(options)
+        engine.dir_fd = dir_fd
+        plan = engine.plan(found)
+        with ComponentCounter() as counter:
+            start = time.perf_counter()
+            result = engine.execute(plan)
+            seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    converted = {
+        "seconds": round(seconds, 4),
+        "files_per_second": round(len(plan) / seconds, 1),
+        "os_calls": counter.calls,
+        "components_resolved": counter.components,
+        "components_per_file": round(counter.components / max(len(plan), 1), 1),
+        "errors": len(result.errors),
+    }
+    if args.lookup_us:
+        converted["estimated_seconds"] = round(seconds + counter.components * args.lookup_us / 1e6, 4)
+    return {"scan": {"seconds": round(scan_seconds, 4), "files": len(found)}, "convert": converted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=20000, help="files to generate")
+    parser.add_argument("--depth", type=int, default=24, help="directory levels below the root")
+    parser.add_argument("--fanout", type=int, default=1, help="subdirectories per directory")
+    parser.add_argument("--jobs", type=int, default=1, help="executor pool size")
+    parser.add_argument("--lookup-us", type=float, default=0.0,
+                        help="estimated cost of one path component lookup, in microseconds")
+    parser.add_argument("--dir", default=None,
+                        help="where to create trees (default: /dev/shm or the temp dir)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if not DIR_FD_SUPPORTED:
+        parser.error("dir_fd operations are not supported on this platform")
+    base = args.dir or default_base()
+    results = {
+        "tree": {"files": args.files, "depth": args.depth, "fanout": args.fanout,
+                 "dirs": count_dirs(args.depth, args.fanout), "dir": base},
+        "paths": run_mode(base, args, False),
+        "dir_fd": run_mode(base, args, True),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    tree = results["tree"]
+    print(f"{tree['files']} files in {tree['dirs']} dirs, depth {tree['depth']}, jobs {args.jobs}")
+    for mode in ("paths", "dir_fd"):
+        r = results[mode]
+        c = r["convert"]
+        line = (f"{mode:>7}: scan {r['scan']['seconds']:.3f}s  convert {c['seconds']:.3f}s "
+                f"({c['files_per_second']:.0f} files/s)  {c['components_per_file']:.1f} components/file")
+        if "estimated_seconds" in c:
+            line += f"  est. {c['estimated_seconds']:.3f}s at {args.lookup_us:g}us/lookup"
+        print(line + (f"  errors={c['errors']}" if c["errors"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Time the conversion stage with backups enabled: the original serial
+copy2 + rename loop against the engine's executors.
+
+A fresh synthetic tree is generated for every run, so each measurement
+starts from the same state. Only the execute step is timed.
+
+Usage:
+    python benchmarks/bench_execute.py [--files 2000] [--size 262144]
+                                       [--dirs 20] [--jobs 1 4 8] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from extupdate.engine import ConversionEngine, ConversionOptions  # noqa: E402
+
+
+def make_tree(root: str, files: int, dirs: int, size: int, ext: str = ".xls"):
+    """Create files of the given size spread evenly over dirs subdirectories"""
+    payload = os.urandom(size)
+    for d in range(dirs):
+        os.makedirs(os.path.join(root, f"d{d:03d}"), exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(root, f"d{i % dirs:03d}", f"f{i:06d}{ext}"), "wb") as f:
+            f.write(payload)
+
+
+def serial_loop(options: ConversionOptions, paths):
+    """The conversion loop as it was before the executor existed"""
+    for path in paths:
+        if options.backup:
+            shutil.copy2(path, path + ".backup")
+        os.rename(path, path[:-len(options.source_ext)] + options.target_ext)
+
+
+def run_once(base: str, args, jobs):
+    root = tempfile.mkdtemp(prefix="extupdate-bench-", dir=base)
+    try:
+        make_tree(root, args.files, args.dirs, args.size)
+        options = ConversionOptions(root=root, source_ext=".xls", target_ext=".xlsx",
+                                    recursive=True, backup=True, jobs=jobs or 1)
+        engine = ConversionEngine(options)
+        plan = engine.plan()
+        start = time.perf_counter()
+        if jobs is None:
+            serial_loop(options, [p.old_path for p in plan])
+            errors = 0
+        else:
+            errors = len(engine.execute(plan).errors)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return {
+        "seconds": round(elapsed, 4),
+        "files_per_second": round(args.files / elapsed, 1),
+        "mb_per_second": round(args.files * args.size / elapsed / 1e6, 1),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=2000, help="files to generate")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="bytes per file")
+    parser.add_argument("--dirs", type=int, default=20, help="directories to spread files over")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 4, 8],
+                        help="executor pool sizes to measure")
+    parser.add_argument("--dir", default=None,
+                        help="where to create trees (default: /dev/shm or the temp dir)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    base = args.dir or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+    results = {
+        "tree": {"files": args.files, "size": args.size, "dirs": args.dirs, "dir": base},
+        "serial_loop": run_once(base, args, None),
+    }
+    for jobs in args.jobs:
+        results[f"jobs_{jobs}"] = run_once(base, args, jobs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.files} files x {args.size} bytes in {args.dirs} dirs, backups on")
+    for name, r in results.items():
+        if name == "tree":
+            continue
+        print(f"{name:>12}: {r['seconds']:.3f}s  {r['files_per_second']:>9.1f} files/s  "
+              f"{r['mb_per_second']:>7.1f} MB/s  errors={r['errors']}")
+
+
+if __name__ == "__main__":
+    main()
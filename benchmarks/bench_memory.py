@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Compare the memory used by scan results, rename plans and buffered
+history records as plain Python objects and as compact tables.
+
+Everything is generated in memory (no files are created): a synthetic
+share with --dirs directories and --files file paths spread over them.
+For each representation the retained size (tracemalloc, after building
+it), the peak while building, and the time to build it and to iterate
+over it once are reported:
+
+- scan:    list of path strings, list of ScannedFile, FileTable
+- plan:    list of PlannedRename, CompactPlan
+- history: list of history dicts, RecordBuffer
+
+Times are measured in a separate run with tracemalloc off.
+
+Usage:
+    python benchmarks/bench_memory.py [--files 1000000] [--dirs 20000] [--json]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from extupdate.compact import CompactPlan, FileTable, RecordBuffer  # noqa: E402
+from extupdate.engine import PlannedRename  # noqa: E402
+from extupdate.scanner import ScannedFile  # noqa: E402
+
+# Extensions of the generated files, most of them matching the scan
+EXTENSIONS = (".xls", ".xls", ".xls", ".xlsx", ".xlsm")
+BATCH_ID = "20240501-100000-0badcafe"
+
+
+def iter_files(files: int, dirs: int) -> Iterator[ScannedFile]:
+    """Fresh path strings for a synthetic share, grouped by directory"""
+    per_dir = max(files // dirs, 1)
+    for i in range(files):
+        d = i // per_dir
+        path = (f"/srv/share/dept{d % 40:02d}/project{d:06d}/"
+                f"quarterly report {i:08d}{EXTENSIONS[i % len(EXTENSIONS)]}")
+        yield ScannedFile(path, 4096 + i % 65536, 1714550400.0 + i)
+
+
+def iter_renames(files: int, dirs: int) -> Iterator[PlannedRename]:
+    for f in iter_files(files, dirs):
+        base = os.path.splitext(f.path)[0]
+        yield PlannedRename(f.path, base + ".xlsx")
+
+
+def iter_entries(files: int, dirs: int) -> Iterator[Dict]:
+    """History records as ConversionEngine.history_entry builds them"""
+    for i, item in enumerate(iter_renames(files, dirs)):
+        yield {
+            "timestamp": f"2024-05-01T10:{i // 60000 % 60:02d}:{i // 1000 % 60:02d}.{i % 1000:03d}500",
+            "old_path": item.old_path,
+            "new_path": item.new_path,
+            "old_ext": os.path.splitext(item.old_path)[1],
+            "new_ext": ".xlsx",
+            "backup": "hardlink",
+            "batch": BATCH_ID,
+            "size": 4096 + i % 65536,
+            "mtime_ns": 1714550400000000000 + i,
+        }
+
+
+def build_file_table(files: int, dirs: int) -> FileTable:
+    table = FileTable(ScannedFile)
+    for f in iter_files(files, dirs):
+        table.append(f.path, f.size, f.mtime)
+    return table
+
+
+def build_compact_plan(files: int, dirs: int) -> CompactPlan:
+    plan = CompactPlan(PlannedRename)
+    for item in iter_renames(files, dirs):
+        plan.append(item.old_path, item.new_path)
+    return plan
+
+
+def build_record_buffer(files: int, dirs: int) -> RecordBuffer:
+    buffer = RecordBuffer()
+    for entry in iter_entries(files, dirs):
+        buffer.append(entry)
+    return buffer
+
+
+# (phase, representation, builder)
+CASES = [
+    ("scan", "list of str", lambda n, d: [f.path for f in iter_files(n, d)]),
+    ("scan", "list of ScannedFile", lambda n, d: list(iter_files(n, d))),
+    ("scan", "FileTable", build_file_table),
+    ("plan", "list of PlannedRename", lambda n, d: list(iter_renames(n, d))),
+    ("plan", "CompactPlan", build_compact_plan),
+    ("history", "list of dict", lambda n, d: list(iter_entries(n, d))),
+    ("history", "RecordBuffer", build_record_buffer),
+]
+
+
+def measure_memory(build: Callable, files: int, dirs: int) -> Dict:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        built = build(files, dirs)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del built
+    return {"retained_bytes": retained - before, "peak_bytes": peak - before,
+            "bytes_per_file": round((retained - before) / files, 1)}
+
+
+def measure_time(build: Callable, files: int, dirs: int) -> Dict:
+    gc.collect()
+    start = time.perf_counter()
+    built = build(files, dirs)
+    built_at = time.perf_counter()
+    for _ in built:
+        pass
+    done = time.perf_counter()
+    return {"build_s": round(built_at - start, 3), "iterate_s": round(done - built_at, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=1000000, help="file paths to generate")
+    parser.add_argument("--dirs", type=int, default=20000, help="directories to spread them over")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for phase, representation, build in CASES:
+        result = {"phase": phase, "representation": representation}
+        result.update(measure_memory(build, args.files, args.dirs))
+        result.update(measure_time(build, args.files, args.dirs))
+        results.append(result)
+
+    if args.json:
+        print(json.dumps({"python": sys.version.split()[0], "files": args.files, "dirs": args.dirs,
+                          "results": results}, indent=2))
+        return
+
+    print(f"{args.files} files in {args.dirs} directories")
+    print(f"{'phase':<8} {'representation':<22} {'retained MB':>12} {'peak MB':>9} {'B/file':>8} "
+          f"{'build s':>8} {'iterate s':>10}")
+    for r in results:
+        print(f"{r['phase']:<8} {r['representation']:<22} {r['retained_bytes'] / 1e6:>12.1f} "
+              f"{r['peak_bytes'] / 1e6:>9.1f} {r['bytes_per_file']:>8.1f} {r['build_s']:>8.2f} "
+              f"{r['iterate_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
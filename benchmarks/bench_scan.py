@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Compare filesystem calls made by the legacy two-walk scan and the
+single-pass os.scandir scanner on a synthetic tree, and time the
+parallel directory walker.
+
+The legacy path is reproduced as it was before the scanner existed: a
+preview walk (os.walk/os.listdir + os.path.isfile), an os.stat per
+previewed file, then a second walk in get_files_to_convert.
+
+Calls are counted by wrapping the os functions the scan code uses. On a
+POSIX system each counted call corresponds to at least one syscall;
+os.scandir additionally issues getdents calls proportional to directory
+size, which are the same for both paths.
+
+--latency adds an artificial delay to every directory read to mimic a
+network share, which is where the parallel walker pays off.
+
+Usage:
+    python benchmarks/bench_scan.py [--files 100000] [--flat] [--workers 8]
+                                    [--latency 2] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from extupdate.scanner import DEFAULT_SCAN_WORKERS, scan  # noqa: E402
+
+
+def make_tree(root: str, files: int, per_dir: int = 500, ext_mix=(".xls", ".xlsx", ".csv")):
+    """Create files spread across subdirectories of root"""
+    for i in range(files):
+        directory = os.path.join(root, f"d{i // per_dir:04d}")
+        if i % per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        ext = ext_mix[i % len(ext_mix)]
+        with open(os.path.join(directory, f"f{i:07d}{ext}"), "wb"):
+            pass
+
+
+class CallCounter:
+    """Count calls to filesystem functions while active"""
+
+    def __init__(self, latency: float = 0.0):
+        self.counts = Counter()
+        self.latency = latency
+        self._saved = {}
+
+    def __enter__(self):
+        counts = self.counts
+
+        def wrap(name):
+            original = getattr(os, name)
+
+            def counted(*args, **kwargs):
+                counts[name] += 1
+                return original(*args, **kwargs)
+            self._saved[name] = original
+            setattr(os, name, counted)
+
+        for name in ("stat", "lstat", "listdir"):
+            wrap(name)
+
+        original_scandir = os.scandir
+        self._saved["scandir"] = original_scandir
+
+        class EntryProxy:
+            __slots__ = ("_entry",)
+
+            def __init__(self, entry):
+                self._entry = entry
+
+            def stat(self, *args, **kwargs):
+                counts["DirEntry.stat"] += 1
+                return self._entry.stat(*args, **kwargs)
+
+            def __getattr__(self, name):
+                return getattr(self._entry, name)
+
+            def __fspath__(self):
+                return self._entry.path
+
+        class ScandirProxy:
+            def __init__(self, it):
+                self._it = it
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                return EntryProxy(next(self._it))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+            def close(self):
+                self._it.close()
+
+        latency = self.latency
+
+        def counted_scandir(*args, **kwargs):
+            counts["scandir"] += 1
+            if latency:
+                time.sleep(latency)
+            return ScandirProxy(original_scandir(*args, **kwargs))
+
+        os.scandir = counted_scandir
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self._saved.items():
+            setattr(os, name, original)
+
+
+def legacy_scan(root: str, ext: str, recursive: bool):
+    """Preview walk + per-file stat + second walk, as before the scanner"""
+    def walk():
+        found = []
+        if recursive:
+            for dirpath, dirs, filenames in os.walk(root):
+                for filename in filenames:
+                    if filename.endswith(ext):
+                        found.append(os.path.join(dirpath, filename))
+        else:
+            for filename in os.listdir(root):
+                path = os.path.join(root, filename)
+                if os.path.isfile(path) and filename.endswith(ext):
+                    found.append(path)
+        return found
+
+    for path in walk():
+        os.stat(path)
+    return walk()
+
+
+def single_pass_scan(root: str, ext: str, recursive: bool):
+    """One scandir walk feeding both preview and conversion"""
+    return scan(root, ext, recursive).paths
+
+
+def parallel_scan(root: str, ext: str, recursive: bool, workers: int):
+    """Single-pass scan reading directories on a thread pool"""
+    return scan(root, ext, recursive, workers).paths
+
+
+def measure(latency: float, func, *args):
+    with CallCounter(latency) as counter:
+        start = time.perf_counter()
+        found = func(*args)
+        elapsed = time.perf_counter() - start
+    return {"files": len(found), "seconds": round(elapsed, 4), "calls": dict(counter.counts),
+            "total_calls": sum(counter.counts.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=100000, help="files to generate")
+    parser.add_argument("--per-dir", type=int, default=500, help="files per directory")
+    parser.add_argument("--ext", default=".xls", help="extension to scan for")
+    parser.add_argument("--flat", action="store_true",
+                        help="non-recursive scan of a single directory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_SCAN_WORKERS,
+                        help="threads for the parallel walker")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="milliseconds added to every directory read")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    root = tempfile.mkdtemp(prefix="extupdate-bench-", dir=base)
+    try:
+        per_dir = args.files if args.flat else args.per_dir
+        make_tree(root, args.files, per_dir)
+        scan_root = os.path.join(root, "d0000") if args.flat else root
+        recursive = not args.flat
+        latency = args.latency / 1000.0
+        results = {
+            "tree": {"files": args.files, "per_dir": per_dir, "recursive": recursive,
+                     "latency_ms": args.latency},
+            "legacy": measure(latency, legacy_scan, scan_root, args.ext, recursive),
+            "single_pass": measure(latency, single_pass_scan, scan_root, args.ext, recursive),
+        }
+        if recursive:
+            results["parallel"] = measure(latency, parallel_scan, scan_root, args.ext,
+                                          recursive, args.workers)
+            results["parallel"]["workers"] = args.workers
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Tree: {args.files} files, recursive={recursive}, latency={args.latency}ms")
+    for name in ("legacy", "single_pass", "parallel"):
+        if name not in results:
+            continue
+        r = results[name]
+        calls = ", ".join(f"{k}={v}" for k, v in sorted(r["calls"].items()))
+        print(f"{name:>12}: {r['files']} matches in {r['seconds']:.3f}s, "
+              f"{r['total_calls']} fs calls ({calls})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Measure start-up cost: import time of the CLI and GUI entry modules
+(from python -X importtime) and wall time of short CLI commands.
+
+Each measurement runs in a fresh interpreter. The importtime report is
+parsed to give the total import time of the entry module, the modules
+with the largest cumulative cost, and whether tkinter was imported.
+With a display available, the time until the GUI window is first drawn
+is measured too.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 15] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+ENTRY_MODULES = {
+    "cli": "extupdate.cli",
+    "gui": "extupdate.gui",
+}
+
+# Time from interpreter start until the main window has been drawn once
+GUI_SNIPPET = """
+import time
+start = time.perf_counter()
+from extupdate.gui import ExtUpdateApp
+app = ExtUpdateApp()
+app.window.update()
+print(time.perf_counter() - start)
+app.window.destroy()
+"""
+
+
+def python(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, *args], env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, text=True, **kwargs)
+
+
+def parse_importtime(report: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every line of an importtime report"""
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def measure_imports(module: str, repeat: int, top: int) -> Dict:
+    totals = []
+    modules = []
+    for _ in range(repeat):
+        completed = python("-X", "importtime", "-c", f"import {module}")
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        modules = parse_importtime(completed.stderr)
+        # The package and then the module itself are imported at top level
+        totals.append(sum(cum for name, _, cum, depth in modules
+                          if depth == 0 and name.split(".")[0] == "extupdate"))
+    names = {m[0] for m in modules}
+    slowest = sorted((m for m in modules if m[0] != module), key=lambda m: m[2], reverse=True)[:top]
+    return {
+        "import_ms": round(statistics.median(totals) / 1000, 2),
+        "modules": len(modules),
+        "tkinter": "tkinter" in names,
+        "slowest": [{"module": name, "cumulative_ms": round(cum / 1000, 2), "self_ms": round(own / 1000, 2)}
+                    for name, own, cum, _ in slowest],
+    }
+
+
+def measure_command(args: List[str], repeat: int) -> float:
+    """Median wall time in ms of running python with args"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        python(*args)
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 1)
+
+
+def measure_gui(repeat: int, workdir: str):
+    times = []
+    for _ in range(repeat):
+        completed = python("-c", GUI_SNIPPET, cwd=workdir)
+        if completed.returncode != 0:
+            return None
+        times.append(float(completed.stdout.strip().splitlines()[-1]))
+    return round(statistics.median(times) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="runs to take the median of")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "imports": {}, "commands_ms": {}}
+    for label, module in ENTRY_MODULES.items():
+        results["imports"][label] = measure_imports(module, args.repeat, args.top)
+
+    with tempfile.TemporaryDirectory(prefix="extupdate-bench-") as workdir:
+        results["commands_ms"]["python -c pass"] = measure_command(["-c", "pass"], args.repeat)
+        results["commands_ms"]["extupdate --version"] = measure_command(
+            ["-m", "extupdate", "--version"], args.repeat)
+        results["commands_ms"]["extupdate convert -n (empty folder)"] = measure_command(
+            ["-m", "extupdate", "convert", workdir, "-n", "--from", ".xls", "--to", ".xlsx",
+             "--no-cache", "--no-history"], args.repeat)
+        results["gui_first_draw_ms"] = measure_gui(args.repeat, workdir)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for label, r in results["imports"].items():
+        print(f"import {ENTRY_MODULES[label]}: {r['import_ms']:.1f} ms, {r['modules']} modules, "
+              f"tkinter={'yes' if r['tkinter'] else 'no'}")
+        for m in r["slowest"]:
+            print(f"  {m['cumulative_ms']:>8.2f} ms  {m['module']}")
+    for command, ms in results["commands_ms"].items():
+        print(f"{command:>40}: {ms:.1f} ms")
+    gui = results["gui_first_draw_ms"]
+    print(f"{'GUI first draw':>40}: " + (f"{gui:.1f} ms" if gui is not None else "no display"))
+
+
+if __name__ == "__main__":
+    main()
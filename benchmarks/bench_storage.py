@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Time a conversion on the s3:// backend against a local stand-in server
+(s3stub.S3Stub) that adds a fixed delay to every request.
+
+Each run fills a fresh bucket, then scans and converts it with copy
+backups at each --jobs setting. On an object store a converted file
+costs an existence check, a backup copy, a copy and a delete, plus a
+stat for the history record, so with round-trips dominating, the
+time falls with the number of requests in flight until --connections
+caps them. --fail-rate answers that fraction of requests with 503 to
+show the cost of retries.
+
+Usage:
+    python benchmarks/bench_storage.py [--files 500] [--dirs 10] [--latency-ms 20]
+                                       [--jobs 1 8 32] [--connections 32]
+                                       [--fail-rate 0] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from extupdate.engine import ConversionEngine, ConversionOptions  # noqa: E402
+from extupdate.history import HistoryStore  # noqa: E402
+from extupdate.s3 import S3Storage  # noqa: E402
+
+from s3stub import S3Stub  # noqa: E402
+
+BUCKET = "bench"
+
+
+def run_once(stub: S3Stub, args, jobs: int):
+    stub.buckets.pop(BUCKET, None)
+    for i in range(args.files):
+        stub.put(BUCKET, f"tree/d{i % args.dirs:03d}/f{i:06d}.xls", b"\0" * 1024)
+    requests = stub.requests
+    storage = S3Storage(BUCKET, endpoint=stub.endpoint, max_connections=args.connections)
+    workdir = tempfile.mkdtemp(prefix="extupdate-bench-")
+    try:
+        options = ConversionOptions(root=f"s3://{BUCKET}/tree", source_ext=".xls", target_ext=".xlsx",
+                                    recursive=True, backup=True, jobs=jobs, scan_workers=jobs)
+        history = HistoryStore(os.path.join(workdir, "history.db"))
+        engine = ConversionEngine(options, history, storage=storage)
+        start = time.perf_counter()
+        plan = engine.scan()
+        scanned = time.perf_counter()
+        result = engine.execute(engine.plan(plan))
+        elapsed = time.perf_counter() - start
+        history.close()
+    finally:
+        storage.close()
+    return {
+        "jobs": jobs,
+        "scan_seconds": round(scanned - start, 3),
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(args.files / elapsed, 1),
+        "requests": stub.requests - requests,
+        "retried": storage.retried,
+        "errors": len(result.errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=500, help="objects to generate")
+    parser.add_argument("--dirs", type=int, default=10, help="prefixes to spread objects over")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="delay the stub adds to each request")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 8, 32], help="files in flight to measure")
+    parser.add_argument("--connections", type=int, default=32, help="connection pool size")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with S3Stub(latency=args.latency_ms / 1000, fail_rate=args.fail_rate) as stub:
+        results = [run_once(stub, args, jobs) for jobs in args.jobs]
+
+    if args.json:
+        print(json.dumps({"files": args.files, "latency_ms": args.latency_ms, "results": results}, indent=2))
+        return
+    print(f"{args.files} objects, {args.latency_ms:g} ms per request, {args.connections} connections")
+    for r in results:
+        print(f"  jobs={r['jobs']:<3} scan {r['scan_seconds']:7.3f}s  total {r['seconds']:7.3f}s  "
+              f"{r['files_per_second']:8.1f} files/s  {r['requests']} requests, "
+              f"{r['retried']} retried, {r['errors']} errors")
+
+
+if __name__ == "__main__":
+    main()
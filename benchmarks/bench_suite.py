@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Time every phase of a conversion on a synthetic tree and emit JSON.
+
+The engine is driven directly (no tk.Tk()), so this runs without a
+display. Each repeat generates a fresh tree and measures, in order:
+
+- scan:    ConversionEngine.scan() of the whole tree, no scan cache
+- plan:    ConversionEngine.plan() over the scanned files
+- backup:  BackupManager.backup() of every planned file, through the
+           engine's executor
+- rename:  ConversionEngine.execute() with backups and history off
+           (journal on unless --no-journal)
+- history: building, appending and flushing one history record per
+           rename, then reading back the first page the history viewer shows
+
+For each phase the result has the wall time, the peak RSS reached during
+the phase, and syscall counts. Calls are counted by wrapping the os
+functions the engine uses, so each counted call is at least one syscall;
+on Linux the read/write syscall totals from /proc/self/io are included
+as well. Peak RSS is reset between phases on Linux (clear_refs); where
+that is not possible the process-wide peak is reported.
+
+With --repeat the median of each number is reported. Save the output of
+two versions and pass one to --compare to print the change per phase.
+
+Usage:
+    python benchmarks/bench_suite.py [--files 10000] [--depth 2] [--fanout 10]
+                                     [--ext-mix .xls:3,.xlsx:1,.csv:1]
+                                     [--size 0-65536] [--repeat 3]
+                                     [-o results.json] [--compare old.json]
+"""
+import argparse
+import builtins
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import extupdate  # noqa: E402
+from extupdate.backup import BACKUP_AUTO, BACKUP_STRATEGIES, BackupManager  # noqa: E402
+from extupdate.engine import ConversionEngine, ConversionOptions  # noqa: E402
+from extupdate.executor import directory_key  # noqa: E402
+from extupdate.history import HistoryStore  # noqa: E402
+from extupdate.scanner import DEFAULT_SCAN_WORKERS  # noqa: E402
+
+from synthetic import (  # noqa: E402
+    DEFAULT_EXT_MIX,
+    TreeSpec,
+    default_base,
+    make_tree,
+    parse_ext_mix,
+    parse_size_range,
+)
+
+PHASES = ["scan", "plan", "backup", "rename", "history"]
+
+# os functions that map onto filesystem syscalls in the engine
+COUNTED_OS_CALLS = (
+    "stat", "lstat", "fstat", "scandir", "listdir", "open", "rename", "replace",
+    "link", "unlink", "mkdir", "makedirs", "access", "fsync", "copy_file_range",
+    "sendfile", "utime", "chmod",
+)
+
+
+class SyscallCounter:
+    """Count calls to os filesystem functions (and builtins.open) while active"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._saved = {}
+
+    def _wrap(self, owner, name: str, label: str):
+        original = getattr(owner, name, None)
+        if original is None:
+            return
+        counts, lock = self.counts, self._lock
+
+        def counted(*args, **kwargs):
+            with lock:
+                counts[label] += 1
+            return original(*args, **kwargs)
+        self._saved[(owner, name)] = original
+        setattr(owner, name, counted)
+
+    def __enter__(self):
+        for name in COUNTED_OS_CALLS:
+            self._wrap(os, name, name)
+        self._wrap(builtins, "open", "open")
+        return self
+
+    def __exit__(self, *exc):
+        for (owner, name), original in self._saved.items():
+            setattr(owner, name, original)
+        self._saved.clear()
+
+
+def read_proc_io() -> Optional[Dict[str, int]]:
+    """Read/write syscall totals for this process (Linux only)"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(":", 1) for line in f)
+    except OSError:
+        return None
+    return {"syscr": int(fields["syscr"]), "syscw": int(fields["syscw"])}
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS mark for this process, if supported"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb() -> int:
+    """Peak RSS since the last reset (Linux) or process start"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, KB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class Phase:
+    """Measure wall time, peak RSS and syscalls of one phase"""
+
+    def __init__(self, name: str, results: Dict):
+        self.name = name
+        self.results = results
+
+    def __enter__(self):
+        self.rss_reset = reset_peak_rss()
+        self.io_before = read_proc_io()
+        self.counter = SyscallCounter().__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.counter.__exit__(*exc)
+        io_after = read_proc_io()
+        calls = dict(self.counter.counts)
+        result = {
+            "seconds": round(elapsed, 4),
+            "peak_rss_kb": peak_rss_kb(),
+            "peak_rss_is_process_wide": not self.rss_reset,
+            "syscalls": sum(calls.values()),
+            "calls": calls,
+        }
+        if self.io_before is not None and io_after is not None:
+            result["read_syscalls"] = io_after["syscr"] - self.io_before["syscr"]
+            result["write_syscalls"] = io_after["syscw"] - self.io_before["syscw"]
+        self.results[self.name] = result
+
+
+def run_once(base: Optional[str], spec: TreeSpec, args) -> Dict:
+    """Generate a fresh tree and measure each phase on it"""
+    workdir = tempfile.mkdtemp(prefix="extupdate-bench-", dir=base)
+    root = os.path.join(workdir, "tree")
+    os.mkdir(root)
+    phases = {}
+    try:
+        make_tree(root, spec)
+        options = ConversionOptions(root=root, source_ext=args.source_ext, target_ext=args.target_ext,
+                                    recursive=True, backup=False, jobs=args.jobs,
+                                    scan_workers=args.scan_workers)
+        journal_dir = None if args.no_journal else os.path.join(workdir, "journal")
+        engine = ConversionEngine(options, journal_dir=journal_dir)
+
+        with Phase("scan", phases):
+            files = engine.scan()
+        with Phase("plan", phases):
+            plan = engine.plan(files)
+        del files
+
+        with Phase("backup", phases):
+            backups = BackupManager(args.backup_strategy)
+            failures = engine.executor.run(plan, lambda index, item: backups.backup(item.old_path),
+                                           key=lambda item: directory_key(item.old_path))
+        phases["backup"]["errors"] = len(failures)
+        phases["backup"]["strategies"] = dict(backups.used)
+
+        with Phase("rename", phases):
+            result = engine.execute(plan)
+        phases["rename"]["errors"] = len(result.errors)
+        batch_id = result.batch_id
+
+        history = HistoryStore(os.path.join(workdir, "history.db"))
+        with Phase("history", phases):
+            for item in plan:
+                history.append(engine.history_entry(item, args.backup_strategy, batch_id))
+            history.flush()
+            history.search(limit=100)
+
+        phases["planned"] = len(plan)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return phases
+
+
+def median_runs(runs: List[Dict]) -> Dict:
+    """Median of every numeric field across repeats"""
+    if len(runs) == 1:
+        return runs[0]
+    merged = {}
+    for phase in PHASES:
+        first = runs[0][phase]
+        merged[phase] = {}
+        for key, value in first.items():
+            if isinstance(value, float):
+                merged[phase][key] = round(statistics.median(run[phase][key] for run in runs), 4)
+            elif isinstance(value, int) and not isinstance(value, bool):
+                # Counts stay integers
+                merged[phase][key] = statistics.median_low(run[phase][key] for run in runs)
+            elif key == "calls":
+                names = set().union(*(run[phase]["calls"] for run in runs))
+                merged[phase]["calls"] = {
+                    name: statistics.median_low(run[phase]["calls"].get(name, 0) for run in runs)
+                    for name in sorted(names)
+                }
+            else:
+                merged[phase][key] = value
+    merged["planned"] = runs[0]["planned"]
+    return merged
+
+
+def compare(old: Dict, new: Dict):
+    """Print the change in time, peak RSS and syscalls for each phase"""
+    print(f"{'phase':>8}  {'seconds':>28}  {'peak RSS KB':>28}  {'syscalls':>24}")
+    for phase in PHASES:
+        if phase not in old["phases"] or phase not in new["phases"]:
+            continue
+        a, b = old["phases"][phase], new["phases"][phase]
+        cells = []
+        for key in ("seconds", "peak_rss_kb", "syscalls"):
+            before, after = a[key], b[key]
+            change = f"{(after - before) / before * 100:+.0f}%" if before else "n/a"
+            cells.append(f"{before:g} -> {after:g} ({change})")
+        print(f"{phase:>8}  {cells[0]:>28}  {cells[1]:>28}  {cells[2]:>24}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=10000, help="files to generate")
+    parser.add_argument("--depth", type=int, default=2, help="levels of subdirectories")
+    parser.add_argument("--fanout", type=int, default=10, help="subdirectories per directory")
+    parser.add_argument("--ext-mix", default=DEFAULT_EXT_MIX,
+                        help="weighted extensions to generate, e.g. .xls:3,.xlsx:1")
+    parser.add_argument("--size", default="0", help="file size in bytes, or a MIN-MAX range")
+    parser.add_argument("--seed", type=int, default=0, help="seed for extensions and sizes")
+    parser.add_argument("--from", dest="source_ext", default=".xls", help="extension to convert")
+    parser.add_argument("--to", dest="target_ext", default=".xlsx", help="extension to convert to")
+    parser.add_argument("--jobs", type=int, default=1, help="executor workers")
+    parser.add_argument("--scan-workers", type=int, default=DEFAULT_SCAN_WORKERS, help="scanner threads")
+    parser.add_argument("--backup-strategy", choices=BACKUP_STRATEGIES, default=BACKUP_AUTO)
+    parser.add_argument("--no-journal", action="store_true", help="rename without a batch journal")
+    parser.add_argument("--repeat", type=int, default=1, help="runs to take the median of")
+    parser.add_argument("--dir", default=None,
+                        help="where to create trees (default: /dev/shm or the temp dir)")
+    parser.add_argument("-o", "--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", metavar="OLD_JSON",
+                        help="print the change against an earlier results file")
+    args = parser.parse_args()
+
+    try:
+        min_size, max_size = parse_size_range(args.size)
+        spec = TreeSpec(args.files, args.depth, args.fanout, parse_ext_mix(args.ext_mix),
+                        min_size, max_size, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    base = args.dir or default_base()
+    runs = [run_once(base, spec, args) for _ in range(max(args.repeat, 1))]
+    results = {
+        "version": extupdate.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tree": dict(spec.to_dict(), dir=base),
+        "settings": {"from": args.source_ext, "to": args.target_ext, "jobs": args.jobs,
+                     "scan_workers": args.scan_workers, "backup_strategy": args.backup_strategy,
+                     "journal": not args.no_journal, "repeat": len(runs)},
+        "phases": median_runs(runs),
+    }
+    results["planned"] = results["phases"].pop("planned")
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+    elif not args.output:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
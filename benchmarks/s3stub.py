@@ -0,0 +1,198 @@
+"""
+A local stand-in for an S3-compatible server, for trying the s3://
+backend without a network or an account.
+
+S3Stub serves one in-memory bucket over plain HTTP on 127.0.0.1 from its
+own asyncio loop. It answers the requests extupdate makes: ListObjectsV2
+with a "/" delimiter (paged by max-keys), HEAD on the bucket and on
+objects, PUT with x-amz-copy-source, and DELETE. Signatures are not
+checked. latency adds a delay to every response, like a round-trip to a
+remote server, and fail_rate answers that fraction of requests with
+503 SlowDown, so the backend's connection pooling and retries can be
+measured.
+
+Usage from a script:
+    with S3Stub(latency=0.02) as stub:
+        stub.put("bucket", "reports/a.xls", b"...")
+        os.environ["AWS_ENDPOINT_URL_S3"] = stub.endpoint
+        ...  # extupdate convert s3://bucket/reports ...
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+PAGE_SIZE = 1000
+
+
+class S3Stub:
+    """In-memory S3 server on a background thread"""
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        # bucket -> key -> (data, mtime)
+        self.buckets: Dict[str, Dict[str, Tuple[bytes, float]]] = {}
+        self.requests = 0
+        self.connections = 0
+        self.endpoint = ""
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    def put(self, bucket: str, key: str, data: bytes = b""):
+        with self._lock:
+            self.buckets.setdefault(bucket, {})[key] = (data, time.time())
+
+    def keys(self, bucket: str) -> List[str]:
+        with self._lock:
+            return sorted(self.buckets.get(bucket, {}))
+
+    def start(self) -> "S3Stub":
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True, name="s3stub")
+        self._thread.start()
+
+        async def serve():
+            return await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self._server = asyncio.run_coroutine_threadsafe(serve(), self._loop).result()
+        port = self._server.sockets[0].getsockname()[1]
+        self.endpoint = f"http://127.0.0.1:{port}"
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            # Connections the client kept alive would otherwise outlive the loop
+            for writer in list(self._handlers.values()):
+                writer.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self) -> "S3Stub":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        with self._lock:
+            self.connections += 1
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length:
+                    await reader.readexactly(length)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, extra, body = self._respond(method, target, headers)
+                head = [f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}",
+                        f"Content-Length: {extra.pop('Content-Length', len(body))}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + (b"" if method == "HEAD" else body))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._handlers.pop(task, None)
+            writer.close()
+
+    def _respond(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        with self._lock:
+            self.requests += 1
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                return 503, {}, _error("SlowDown", "Please reduce your request rate.")
+            url = urlsplit(target)
+            bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+            objects = self.buckets.get(bucket)
+            if objects is None:
+                return 404, {}, _error("NoSuchBucket", "The specified bucket does not exist")
+            if not key:
+                if method == "HEAD":
+                    return 200, {}, b""
+                return 200, {}, _listing(objects, dict(parse_qsl(url.query, keep_blank_values=True)))
+            if method == "HEAD":
+                if key not in objects:
+                    return 404, {}, b""
+                data, mtime = objects[key]
+                return 200, {"Content-Length": str(len(data)),
+                             "Last-Modified": formatdate(mtime, usegmt=True)}, b""
+            if method == "PUT" and "x-amz-copy-source" in headers:
+                source_bucket, _, source_key = unquote(headers["x-amz-copy-source"]).lstrip("/").partition("/")
+                source = self.buckets.get(source_bucket, {}).get(source_key)
+                if source is None:
+                    return 404, {}, _error("NoSuchKey", "The specified key does not exist.")
+                objects[key] = (source[0], time.time())
+                return 200, {}, b"<CopyObjectResult></CopyObjectResult>"
+            if method == "DELETE":
+                objects.pop(key, None)
+                return 204, {}, b""
+            return 501, {}, _error("NotImplemented", f"{method} is not supported by the stub")
+
+
+def _error(code: str, message: str) -> bytes:
+    return f"<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>".encode()
+
+
+def _listing(objects: Dict[str, Tuple[bytes, float]], params: Dict[str, str]) -> bytes:
+    """ListObjectsV2 response for a prefix and "/" delimiter"""
+    prefix = params.get("prefix", "")
+    limit = int(params.get("max-keys") or PAGE_SIZE)
+    after = params.get("continuation-token", "")
+    entries = []
+    seen = set()
+    for key in sorted(objects):
+        if not key.startswith(prefix):
+            continue
+        rest = key[len(prefix):]
+        if "/" in rest:
+            common = prefix + rest.split("/", 1)[0] + "/"
+            if common in seen:
+                continue
+            seen.add(common)
+            entries.append((common, None))
+        else:
+            entries.append((key, objects[key]))
+    entries = [entry for entry in entries if entry[0] > after]
+    page, truncated = entries[:limit], len(entries) > limit
+    parts = ['<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">',
+             f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"]
+    if truncated:
+        parts.append(f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>")
+    for name, value in page:
+        if value is None:
+            parts.append(f"<CommonPrefixes><Prefix>{escape(name)}</Prefix></CommonPrefixes>")
+        else:
+            modified = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(value[1])) + ".000Z"
+            parts.append(f"<Contents><Key>{escape(name)}</Key><Size>{len(value[0])}</Size>"
+                         f"<LastModified>{modified}</LastModified></Contents>")
+    parts.append("</ListBucketResult>")
+    return "".join(parts).encode()
@@ -0,0 +1,101 @@
+"""
+Synthetic directory trees for the benchmarks.
+
+A tree has `depth` levels of subdirectories below the root, each
+directory holding `fanout` subdirectories, and files dealt round-robin
+over every directory (root included). Extensions are drawn from a
+weighted mix and sizes from a range, both from a seeded generator, so
+the same arguments always produce the same tree.
+"""
+import os
+import random
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_EXT_MIX = ".xls:3,.xlsx:1,.csv:1"
+
+
+class TreeSpec(NamedTuple):
+    """Shape of a synthetic tree"""
+    files: int = 10000
+    depth: int = 2
+    fanout: int = 10
+    ext_mix: Tuple[Tuple[str, int], ...] = ((".xls", 3), (".xlsx", 1), (".csv", 1))
+    min_size: int = 0
+    max_size: int = 0
+    seed: int = 0
+
+    def to_dict(self) -> Dict:
+        data = self._asdict()
+        data["ext_mix"] = format_ext_mix(self.ext_mix)
+        data["dirs"] = count_dirs(self.depth, self.fanout)
+        return data
+
+
+def parse_ext_mix(text: str) -> Tuple[Tuple[str, int], ...]:
+    """Parse ".xls:3,.xlsx:1" into ((".xls", 3), (".xlsx", 1)); weights default to 1"""
+    mix = []
+    for part in text.split(","):
+        ext, _, weight = part.strip().partition(":")
+        if not ext.startswith("."):
+            raise ValueError(f"Extension must start with '.': {ext!r}")
+        mix.append((ext, int(weight) if weight else 1))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise ValueError("Extension mix needs at least one positive weight")
+    return tuple(mix)
+
+
+def format_ext_mix(mix: Sequence[Tuple[str, int]]) -> str:
+    return ",".join(f"{ext}:{weight}" for ext, weight in mix)
+
+
+def parse_size_range(text: str) -> Tuple[int, int]:
+    """Parse "4096" or "1024-65536" into (min, max) bytes"""
+    low, _, high = text.partition("-")
+    low_size = int(low)
+    high_size = int(high) if high else low_size
+    if low_size < 0 or high_size < low_size:
+        raise ValueError(f"Invalid size range: {text!r}")
+    return low_size, high_size
+
+
+def count_dirs(depth: int, fanout: int) -> int:
+    return sum(fanout ** level for level in range(depth + 1))
+
+
+def make_dirs(root: str, depth: int, fanout: int) -> List[str]:
+    """Create the directory skeleton, returning every directory (root first)"""
+    dirs = [root]
+    level = [root]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                path = os.path.join(parent, f"d{i:03d}")
+                os.mkdir(path)
+                next_level.append(path)
+        dirs.extend(next_level)
+        level = next_level
+    return dirs
+
+
+def make_tree(root: str, spec: TreeSpec) -> Dict[str, int]:
+    """Populate root with the tree described by spec; returns files per extension"""
+    rng = random.Random(spec.seed)
+    dirs = make_dirs(root, spec.depth, spec.fanout)
+    exts = [ext for ext, _ in spec.ext_mix]
+    weights = [weight for _, weight in spec.ext_mix]
+    payload = os.urandom(spec.max_size) if spec.max_size else b""
+    counts = {ext: 0 for ext in exts}
+    for i in range(spec.files):
+        ext = rng.choices(exts, weights)[0]
+        size = rng.randint(spec.min_size, spec.max_size) if spec.max_size else 0
+        with open(os.path.join(dirs[i % len(dirs)], f"f{i:07d}{ext}"), "wb") as f:
+            if size:
+                f.write(payload[:size])
+        counts[ext] += 1
+    return counts
+
+
+def default_base() -> Optional[str]:
+    """tmpfs when available, so the disk does not dominate the numbers"""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else None
@@ -0,0 +1,59 @@
+"""
+███████ ██   ██ ████████ ██    ██ ██████  ██████   █████  ████████ ███████ 
+██       ██ ██     ██    ██    ██ ██   ██ ██   ██ ██   ██    ██    ██      
+█████     ███      ██    ██    ██ ██████  ██   ██ ███████    ██    █████   
+██       ██ ██     ██    ██    ██ ██      ██   ██ ██   ██    ██    ██      
+███████ ██   ██    ██     ██████  ██      ██████  ██   ██    ██    ███████ 
+
+Bulk Update/Change Excel File Extensions.
+-
+Author:
+sorzkode
+https://github.com/sorzkode
+
+MIT License
+Copyright (c) 2025
+"""
+__version__ = "2.0.0"
+
+from .engine import (
+    EXCEL_EXTENSIONS,
+    COMPATIBILITY_WARNINGS,
+    ConversionEngine,
+    ConversionOptions,
+    ConversionResult,
+    PlannedRename,
+    ProgressEvent,
+    format_size,
+    plan_conversion,
+    plan_rules,
+    scan_files,
+)
+from .rules import Rule, RuleSet
+from .detect import CHECK_MODES, Detection, SignatureCache, detect_all, sniff
+from .converters import Converter, find_converter, register_converter
+from .planner import DryRunPlanner, PlanRecord, PlanTotals
+from .control import BatchControl
+from .metrics import Metrics
+from .cache import ScanCache
+from .backup import BACKUP_STRATEGIES, BackupManager
+from .executor import SerialExecutor, ThreadPoolBatchExecutor, make_executor
+from .history import HistoryQuery, HistoryStore
+from .scanner import FilePlan, ScannedFile
+from .compact import CompactPlan, FileTable
+from .watch import WatchDaemon
+from .scheduler import Job, JobScheduler, Manifest
+from .storage import LocalStorage, StorageBackend, open_storage, register_backend
+from .cli import main
+
+
+def __getattr__(name):
+    # The GUI is imported on demand so headless use never loads tkinter
+    if name == "ExtUpdateApp":
+        from .gui import ExtUpdateApp
+        return ExtUpdateApp
+    # Likewise the S3 backend, which needs asyncio and ssl
+    if name == "S3Storage":
+        from .s3 import S3Storage
+        return S3Storage
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
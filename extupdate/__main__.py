@@ -0,0 +1,7 @@
+"""Allow running EXTUPDATE with ``python -m extupdate``"""
+import sys
+
+from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
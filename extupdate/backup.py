@@ -0,0 +1,286 @@
+"""
+Backup strategies used before renaming a file.
+
+Renaming never changes file contents, so a backup does not have to be a
+full byte copy. The strategies, cheapest first:
+
+- journal:     no file is written; the original name is kept in the
+               history so the rename can be rolled back
+- hardlink:    a second directory entry for the same inode
+- reflink:     a copy-on-write clone (FICLONE on btrfs/XFS), falling back
+               to a copy when unsupported
+- kernel-copy: a copy done in the kernel with os.copy_file_range or
+               os.sendfile, falling back to shutil.copy2
+- copy:        shutil.copy2, as before
+
+"auto" tries hardlink, reflink, kernel-copy and copy in that order on the
+first file of each device and remembers what worked.
+
+Every strategy takes the source and backup names relative to a
+dirfd.Directory, so a batch can make them relative to an open directory;
+by default they are plain paths.
+"""
+import errno
+import os
+import shutil
+import stat
+import sys
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .dirfd import PATHS, Directory
+
+BACKUP_SUFFIX = ".backup"
+
+BACKUP_AUTO = "auto"
+BACKUP_COPY = "copy"
+BACKUP_HARDLINK = "hardlink"
+BACKUP_REFLINK = "reflink"
+BACKUP_KERNEL_COPY = "kernel-copy"
+BACKUP_JOURNAL = "journal"
+
+BACKUP_STRATEGIES = [
+    BACKUP_AUTO, BACKUP_HARDLINK, BACKUP_REFLINK,
+    BACKUP_KERNEL_COPY, BACKUP_COPY, BACKUP_JOURNAL
+]
+
+# Order tried by "auto"; journal is never picked automatically since it
+# writes no file at all
+AUTO_ORDER = [BACKUP_HARDLINK, BACKUP_REFLINK, BACKUP_KERNEL_COPY, BACKUP_COPY]
+
+# ioctl request number for FICLONE (linux/fs.h)
+FICLONE = 0x40049409
+
+# Errors meaning "this filesystem does not support the operation" (or
+# not for this file, such as a source at its hard link limit)
+_UNSUPPORTED = {
+    errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EMLINK,
+    errno.EOPNOTSUPP, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), errno.EACCES,
+}
+
+
+def backup_path(path: str) -> str:
+    """Where the backup of path is written"""
+    return path + BACKUP_SUFFIX
+
+
+def _remove_existing(dst: str, directory: Directory = PATHS):
+    try:
+        directory.unlink(dst)
+    except FileNotFoundError:
+        pass
+
+
+def _replace_target(src: str, dst: str, directory: Directory, fsrc):
+    """Make way for a new backup at dst of the file open as fsrc
+
+    An old backup is removed rather than truncated: it may be a hard link
+    to the source itself (left by a hardlink backup and an undo), and
+    writing into it would destroy the original.
+    """
+    try:
+        st = directory.lstat(dst)
+    except FileNotFoundError:
+        return
+    src_st = os.fstat(fsrc.fileno())
+    if (st.st_dev, st.st_ino) == (src_st.st_dev, src_st.st_ino):
+        raise shutil.SameFileError(f"{directory.path_of(src)!r} and {directory.path_of(dst)!r} are the same file")
+    _remove_existing(dst, directory)
+
+
+def _copystat(src: str, dst: str, directory: Directory, fsrc, fdst):
+    """Copy times, mode and extended attributes as shutil.copystat does
+
+    Through the open files when directory holds a descriptor, so no path
+    is looked up again. The copy must be complete (and flushed).
+    """
+    if directory.fd is None:
+        shutil.copystat(directory.path_of(src), directory.path_of(dst))
+        return
+    st = os.fstat(fsrc.fileno())
+    if hasattr(os, "listxattr"):
+        try:
+            for name in os.listxattr(fsrc.fileno()):
+                try:
+                    os.setxattr(fdst.fileno(), name, os.getxattr(fsrc.fileno(), name))
+                except OSError as e:
+                    if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.ENODATA, errno.EINVAL):
+                        raise
+        except OSError as e:
+            if e.errno not in (errno.ENOTSUP, errno.ENODATA, errno.EINVAL):
+                raise
+    os.utime(fdst.fileno(), ns=(st.st_atime_ns, st.st_mtime_ns))
+    try:
+        os.chmod(fdst.fileno(), stat.S_IMODE(st.st_mode))
+    except NotImplementedError:
+        pass
+
+
+def hardlink(src: str, dst: str, directory: Directory = PATHS):
+    """Back up src by hard-linking it to dst"""
+    try:
+        directory.link(src, dst)
+    except FileExistsError:
+        _remove_existing(dst, directory)
+        directory.link(src, dst)
+
+
+def reflink(src: str, dst: str, directory: Directory = PATHS):
+    """Back up src as a copy-on-write clone at dst"""
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink is only supported on Linux")
+    import fcntl
+
+    opener = directory.opener
+    with open(src, "rb", opener=opener) as fsrc:
+        _replace_target(src, dst, directory, fsrc)
+        with open(dst, "xb", opener=opener) as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                _remove_existing(dst, directory)
+                raise
+            _copystat(src, dst, directory, fsrc, fdst)
+
+
+def kernel_copy(src: str, dst: str, directory: Directory = PATHS):
+    """Back up src with an in-kernel copy (copy_file_range, then sendfile)"""
+    copy_range = getattr(os, "copy_file_range", None)
+    sendfile = getattr(os, "sendfile", None)
+    if copy_range is None and sendfile is None:
+        raise OSError(errno.ENOSYS, "no in-kernel copy available")
+
+    opener = directory.opener
+    with open(src, "rb", opener=opener) as fsrc:
+        _replace_target(src, dst, directory, fsrc)
+        with open(dst, "xb", opener=opener) as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            offset = 0
+            while remaining > 0:
+                chunk = min(remaining, 1 << 30)
+                if copy_range is not None:
+                    try:
+                        copied = copy_range(fsrc.fileno(), fdst.fileno(), chunk)
+                    except OSError as e:
+                        if e.errno not in _UNSUPPORTED or offset:
+                            raise
+                        copy_range = None
+                        continue
+                else:
+                    copied = sendfile(fdst.fileno(), fsrc.fileno(), offset, chunk)
+                if copied == 0:
+                    break
+                offset += copied
+                remaining -= copied
+            _copystat(src, dst, directory, fsrc, fdst)
+
+
+def copy(src: str, dst: str, directory: Directory = PATHS):
+    """Back up src with a full byte copy"""
+    opener = directory.opener
+    with open(src, "rb", opener=opener) as fsrc:
+        _replace_target(src, dst, directory, fsrc)
+        if directory.fd is None:
+            shutil.copy2(directory.path_of(src), directory.path_of(dst))
+            return
+        with open(dst, "xb", opener=opener) as fdst:
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+            fdst.flush()
+            _copystat(src, dst, directory, fsrc, fdst)
+
+
+def journal_only(src: str, dst: str, directory: Directory = PATHS):
+    """Write nothing; the history record is the backup"""
+
+
+_STRATEGY_FUNCS: Dict[str, Callable[[str, str, Directory], None]] = {
+    BACKUP_HARDLINK: hardlink,
+    BACKUP_REFLINK: reflink,
+    BACKUP_KERNEL_COPY: kernel_copy,
+    BACKUP_COPY: copy,
+    BACKUP_JOURNAL: journal_only,
+}
+
+
+class BackupManager:
+    """Create backups with a chosen strategy, tracking what was used
+
+    Explicit strategies other than journal fall back to a plain copy when
+    the filesystem does not support them; the strategy that actually
+    produced each backup is counted in used.
+    """
+
+    def __init__(self, strategy: str = BACKUP_AUTO):
+        if strategy not in BACKUP_STRATEGIES:
+            raise ValueError(f"Unknown backup strategy: {strategy}")
+        self.strategy = strategy
+        self.used: Dict[str, int] = {}
+        self._by_device: Dict[Optional[int], str] = {}
+        self._dir_devices: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, device: Optional[int]) -> List[str]:
+        """Strategies to try, in order, for a file on device"""
+        if self.strategy == BACKUP_JOURNAL:
+            return [BACKUP_JOURNAL]
+        if self.strategy != BACKUP_AUTO:
+            return [self.strategy] if self.strategy == BACKUP_COPY else [self.strategy, BACKUP_COPY]
+        with self._lock:
+            known = self._by_device.get(device)
+        if known is None:
+            return AUTO_ORDER
+        # Start from what worked before on this device, but keep the rest:
+        # one file may still refuse it (protected_hardlinks, EMLINK, an
+        # immutable file)
+        return [known] + [name for name in AUTO_ORDER if name != known]
+
+    def device_of(self, path: str, directory: Optional[Directory] = None) -> int:
+        """Device of the directory holding path (stat-ed once per directory)
+
+        directory, if given, is that directory already open.
+        """
+        parent = os.path.dirname(path)
+        with self._lock:
+            device = self._dir_devices.get(parent)
+        if device is None:
+            device = (directory or Directory(parent)).device()
+            with self._lock:
+                self._dir_devices[parent] = device
+        return device
+
+    def backup(self, path: str, directory: Optional[Directory] = None) -> str:
+        """Back up path, returning the name of the strategy used
+
+        directory, if given, is the open directory holding path; the
+        backup is then made relative to it.
+        """
+        device = self.device_of(path, directory) if self.strategy == BACKUP_AUTO else None
+        if directory is None:
+            directory, src = PATHS, path
+        else:
+            src = os.path.basename(path)
+        dst = backup_path(src)
+        candidates = self.candidates(device)
+        for name in candidates[:-1]:
+            try:
+                _STRATEGY_FUNCS[name](src, dst, directory)
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+                continue
+            return self._record(name, device)
+        name = candidates[-1]
+        _STRATEGY_FUNCS[name](src, dst, directory)
+        return self._record(name, device)
+
+    def record(self, name: str):
+        """Count a backup made outside this manager (by a storage backend)"""
+        self._record(name, None)
+
+    def _record(self, name: str, device: Optional[int]) -> str:
+        with self._lock:
+            if self.strategy == BACKUP_AUTO:
+                self._by_device.setdefault(device, name)
+            self.used[name] = self.used.get(name, 0) + 1
+        return name
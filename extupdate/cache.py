@@ -0,0 +1,221 @@
+"""
+Persistent directory index for fast rescans.
+
+The cache remembers, for every directory scanned, its modification time
+and its full listing (every file with size and mtime, plus
+subdirectories). A directory is only read again when its mtime changed,
+which happens whenever an entry is added, removed or renamed in it, so
+every scan costs one stat per directory. A long-lived session (the GUI)
+may pass revalidate_after to trust listings checked that recently
+without even a stat, so switching the extension filter on a folder that
+was just scanned is answered from memory; changes other processes make
+meanwhile are then missed until it passes.
+
+File sizes and times in the listing are those seen when the directory
+was last read; edits that do not rename files are not picked up until
+the directory itself changes or the cache is bypassed.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .scanner import Extensions, ScannedFile, read_directory, scandir, suffix_matcher
+
+DEFAULT_CACHE_FILE = "extupdate_scan_cache.json"
+
+# Total files and subdirectories kept across all cached directories
+DEFAULT_MAX_ENTRIES = 1000000
+
+# Seconds a validated listing is trusted without stat-ing the directory:
+# none by default, so a rescan always sees other processes' changes
+DEFAULT_REVALIDATE_AFTER = 0.0
+
+# For an interactive session switching filters on the folder it shows
+SESSION_REVALIDATE_AFTER = 30.0
+
+# A directory modified this close to when it was listed may have changed
+# again within the same timestamp tick, so its listing is not trusted
+RACY_WINDOW_NS = 2 * 10**9
+
+CACHE_VERSION = 1
+
+
+class _Listing:
+    """Cached contents of one directory"""
+
+    __slots__ = ("mtime_ns", "listed_ns", "checked", "used", "files", "subdirs")
+
+    def __init__(self, mtime_ns: int, listed_ns: int, files: List[Tuple[str, int, float]],
+                 subdirs: List[str]):
+        self.mtime_ns = mtime_ns
+        self.listed_ns = listed_ns
+        self.checked = time.monotonic()
+        self.used = time.time()
+        self.files = files
+        self.subdirs = subdirs
+
+    @property
+    def size(self) -> int:
+        return len(self.files) + len(self.subdirs)
+
+    def to_json(self) -> list:
+        return [self.mtime_ns, self.listed_ns, self.used, self.files, self.subdirs]
+
+    @classmethod
+    def from_json(cls, data: list) -> "_Listing":
+        listing = cls(data[0], data[1], [tuple(f) for f in data[3]], data[4])
+        listing.used = data[2]
+        # Loaded listings must be revalidated before use
+        listing.checked = float("-inf")
+        return listing
+
+
+class ScanCache:
+    """On-disk, size-bounded index of directory listings"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 revalidate_after: float = DEFAULT_REVALIDATE_AFTER):
+        self.path = path
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self.hits = 0
+        self.misses = 0
+        self._listings: Dict[str, _Listing] = {}
+        self._entries = 0
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the index from disk (once); a missing or bad file means empty"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") != CACHE_VERSION:
+                    return
+                for directory, raw in data["dirs"].items():
+                    listing = _Listing.from_json(raw)
+                    self._listings[directory] = listing
+                    self._entries += listing.size
+            except (OSError, ValueError, KeyError, TypeError, IndexError):
+                self._listings = {}
+                self._entries = 0
+
+    def save(self):
+        """Write the index to disk if it changed, evicting down to max_entries"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._evict()
+            data = {
+                "version": CACHE_VERSION,
+                "dirs": {d: listing.to_json() for d, listing in self._listings.items()},
+            }
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Forget every listing and remove the index file"""
+        with self._lock:
+            self._listings = {}
+            self._entries = 0
+            self._dirty = False
+            self._loaded = True
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, directories: Iterable[str]):
+        """Forget the listings of directories whose contents were just changed
+
+        Their next scan reads them again, even within revalidate_after.
+        """
+        with self._lock:
+            for directory in set(directories):
+                listing = self._listings.pop(directory, None)
+                if listing is not None:
+                    self._entries -= listing.size
+                    self._dirty = True
+
+    def _evict(self):
+        """Drop least recently used listings until within max_entries"""
+        if self._entries <= self.max_entries:
+            return
+        for directory, listing in sorted(self._listings.items(), key=lambda item: item[1].used):
+            del self._listings[directory]
+            self._entries -= listing.size
+            if self._entries <= self.max_entries:
+                break
+
+    def _listing(self, directory: str) -> _Listing:
+        """Current listing for directory, from the index when still valid"""
+        with self._lock:
+            listing = self._listings.get(directory)
+        now = time.monotonic()
+        if (listing is not None and self.revalidate_after
+                and now - listing.checked < self.revalidate_after):
+            listing.used = time.time()
+            self.hits += 1
+            return listing
+
+        mtime_ns = os.stat(directory).st_mtime_ns
+        if (listing is not None and listing.mtime_ns == mtime_ns
+                and mtime_ns < listing.listed_ns - RACY_WINDOW_NS):
+            listing.checked = now
+            listing.used = time.time()
+            self.hits += 1
+            return listing
+
+        self.misses += 1
+        listed_ns = time.time_ns()
+        files: List[Tuple[str, int, float]] = []
+        subdirs: List[str] = []
+        with scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.name, st.st_size, st.st_mtime))
+                except OSError:
+                    continue
+        fresh = _Listing(mtime_ns, listed_ns, files, subdirs)
+        with self._lock:
+            old = self._listings.get(directory)
+            if old is not None:
+                self._entries -= old.size
+            self._listings[directory] = fresh
+            self._entries += fresh.size
+            self._dirty = True
+        return fresh
+
+    def read_directory(self, directory: str, ext: Extensions,
+                       recursive: bool) -> Tuple[List[ScannedFile], List[str]]:
+        """DirectoryReader answering from the index where possible"""
+        listing = self._listing(directory)
+        matches = suffix_matcher(ext)
+        files = [
+            ScannedFile(os.path.join(directory, name), size, mtime)
+            for name, size, mtime in listing.files if matches(name)
+        ]
+        subdirs = [os.path.join(directory, name) for name in listing.subdirs] if recursive else []
+        return files, subdirs
+
+
+def directory_reader(cache: Optional[ScanCache]):
+    """The reader to scan with: the cache's if one is given"""
+    if cache is None:
+        return read_directory
+    cache.load()
+    return cache.read_directory
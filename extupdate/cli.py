@@ -0,0 +1,745 @@
+"""
+Command line interface for EXTUPDATE.
+
+Running ``extupdate`` without arguments starts the GUI; any arguments
+select the headless command line path, which never imports tkinter.
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from . import __version__
+from .cache import DEFAULT_CACHE_FILE, ScanCache
+from .control import BatchControl
+from .converters import DEFAULT_CONVERT_TIMEOUT
+from .detect import CHECK_MODES, CHECK_OFF, DEFAULT_SIGNATURE_FILE, SignatureCache
+from .backup import BACKUP_AUTO, BACKUP_STRATEGIES
+from .engine import (
+    EVENT_CONVERTED,
+    EXCEL_EXTENSIONS,
+    ConversionEngine,
+    ConversionOptions,
+    ConversionResult,
+    ProgressCallback,
+    ProgressEvent,
+    format_size,
+)
+from .executor import make_executor
+from .rules import Rule, RuleSet
+from .planner import PLAN_FORMATS, DryRunPlanner, make_plan_writer
+from .progress import JsonProgressLog, ProgressPrinter, fan_out
+from .journal import DEFAULT_JOURNAL_DIR, BatchJournal, find_journal, pending_journals
+from .metrics import Metrics
+from .scanner import DEFAULT_SCAN_WORKERS
+from .scheduler import JobResult, JobScheduler, Manifest
+from .storage import is_remote, open_storage
+from .history import DEFAULT_HISTORY_FILE, LEGACY_HISTORY_FILES, HistoryQuery, HistoryStore
+from .watch import DEFAULT_POLL_INTERVAL, DEFAULT_QUIET_SECONDS, WatchDaemon
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the headless commands"""
+    parser = argparse.ArgumentParser(
+        prog="extupdate",
+        description="Bulk update/change Excel file extensions."
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("gui", help="start the graphical interface")
+
+    convert = subparsers.add_parser("convert", help="convert file extensions in a folder")
+    add_selection_arguments(convert)
+    convert.add_argument("-n", "--dry-run", action="store_true",
+                         help="show what would be converted without renaming")
+    convert.add_argument("-j", "--jobs", type=int, default=None,
+                         help="number of files to convert concurrently (default: 1, one per CPU "
+                              "with --reencode, or the connection pool size for s3:// paths)")
+    convert.add_argument("--reencode", action="store_true",
+                         help="convert file contents to the target format instead of only renaming")
+    convert.add_argument("--convert-timeout", type=float, default=DEFAULT_CONVERT_TIMEOUT,
+                         help=f"seconds allowed per re-encoded file, 0 for no limit "
+                              f"(default: {DEFAULT_CONVERT_TIMEOUT:g})")
+    convert.add_argument("--convert-memory", type=int, default=0, metavar="MB",
+                         help="memory limit per conversion worker in MB, 0 for no limit (default: 0)")
+    convert.add_argument("-v", "--verbose", action="store_true",
+                         help="list every file converted (always listed with --dry-run)")
+    convert.add_argument("--json", action="store_true",
+                         help="print the result as JSON")
+    add_history_arguments(convert)
+    add_progress_arguments(convert)
+    add_metrics_arguments(convert)
+    add_journal_arguments(convert)
+    convert.add_argument("--no-journal", action="store_true",
+                         help="do not write a rollback journal for the batch")
+    convert.set_defaults(func=cmd_convert)
+
+    watch = subparsers.add_parser("watch", help="keep converting files as they arrive in a folder")
+    add_selection_arguments(watch)
+    watch.add_argument("-j", "--jobs", type=int, default=1,
+                       help="number of files to convert concurrently (default: 1)")
+    watch.add_argument("--quiet", type=float, default=DEFAULT_QUIET_SECONDS, metavar="SECONDS",
+                       help=f"convert a file once it has not changed for this long "
+                            f"(default: {DEFAULT_QUIET_SECONDS:g})")
+    watch.add_argument("--poll", action="store_true",
+                       help="poll the folder instead of using inotify (e.g. for network mounts)")
+    watch.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, metavar="SECONDS",
+                       help=f"seconds between polls (default: {DEFAULT_POLL_INTERVAL:g})")
+    watch.add_argument("--json", action="store_true",
+                       help="print one JSON line per batch")
+    add_history_arguments(watch)
+    add_metrics_arguments(watch)
+    add_journal_arguments(watch)
+    watch.set_defaults(func=cmd_watch)
+
+    run = subparsers.add_parser("run", help="run the conversion jobs of a manifest, several at a time")
+    run.add_argument("manifest", help="JSON manifest of jobs (root, rules, options, priority)")
+    run.add_argument("-n", "--dry-run", action="store_true",
+                     help="show what every job would convert without renaming")
+    run.add_argument("--per-device", type=int, default=None, metavar="N",
+                     help="jobs running at once on one device, unless the manifest's "
+                          "device_limits say otherwise (default: the manifest's, or 1)")
+    run.add_argument("--max-jobs", type=int, default=0, metavar="N",
+                     help="jobs running at once over all devices, 0 for no limit (default: 0)")
+    run.add_argument("--cache-file", default=DEFAULT_CACHE_FILE,
+                     help=f"directory index for fast rescans (default: {DEFAULT_CACHE_FILE})")
+    run.add_argument("--no-cache", action="store_true",
+                     help="read every directory and file instead of using the caches")
+    run.add_argument("--signature-file", default=DEFAULT_SIGNATURE_FILE,
+                     help=f"cache of detected file formats (default: {DEFAULT_SIGNATURE_FILE})")
+    run.add_argument("--json", action="store_true", help="print the results as JSON")
+    add_history_arguments(run)
+    add_progress_arguments(run)
+    add_metrics_arguments(run)
+    add_journal_arguments(run)
+    run.set_defaults(func=cmd_run)
+
+    plan = subparsers.add_parser("plan", help="stream what a conversion would do, without changing anything")
+    add_selection_arguments(plan)
+    plan.add_argument("--format", choices=PLAN_FORMATS, default="ndjson",
+                      help="output format (default: ndjson)")
+    plan.add_argument("-o", "--output", metavar="FILE",
+                      help="write the plan to FILE instead of stdout")
+    plan.set_defaults(func=cmd_plan)
+
+    batches = subparsers.add_parser("batches", help="list interrupted batches")
+    add_journal_arguments(batches)
+    batches.add_argument("--json", action="store_true", help="print the list as JSON")
+    batches.set_defaults(func=cmd_batches)
+
+    resume = subparsers.add_parser("resume", help="finish an interrupted batch")
+    resume.add_argument("batch", nargs="?", help="batch ID (default: most recent)")
+    resume.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of files to convert concurrently (default: 1)")
+    resume.add_argument("--json", action="store_true", help="print the result as JSON")
+    add_history_arguments(resume)
+    add_progress_arguments(resume)
+    add_metrics_arguments(resume)
+    add_journal_arguments(resume)
+    resume.set_defaults(func=cmd_resume)
+
+    rollback = subparsers.add_parser("rollback", help="undo an interrupted batch")
+    rollback.add_argument("batch", nargs="?", help="batch ID (default: most recent)")
+    rollback.add_argument("-j", "--jobs", type=int, default=1,
+                          help="number of files to restore concurrently (default: 1)")
+    rollback.add_argument("--json", action="store_true", help="print the result as JSON")
+    add_progress_arguments(rollback)
+    add_metrics_arguments(rollback)
+    add_journal_arguments(rollback)
+    rollback.set_defaults(func=cmd_rollback)
+
+    history = subparsers.add_parser("history", help="search the conversion history")
+    history.add_argument("--search", default="", metavar="TEXT",
+                         help="only conversions whose old or new path contains TEXT")
+    history.add_argument("--since", default="", metavar="DATE",
+                         help="only conversions on or after DATE (YYYY-MM-DD)")
+    history.add_argument("--until", default="", metavar="DATE",
+                         help="only conversions on or before DATE (YYYY-MM-DD)")
+    history.add_argument("--from", dest="old_ext", default="", help="only conversions from this extension")
+    history.add_argument("--to", dest="new_ext", default="", help="only conversions to this extension")
+    history.add_argument("--batch", default="", help="only conversions of this batch")
+    history.add_argument("--batches", action="store_true",
+                         help="list matching batches instead of single conversions")
+    history.add_argument("-n", "--limit", type=int, default=50,
+                         help="newest conversions to show, 0 for all (default: 50)")
+    output = history.add_mutually_exclusive_group()
+    output.add_argument("--csv", metavar="FILE", help="export every match as CSV to FILE ('-' for stdout)")
+    output.add_argument("--json", action="store_true", help="print the matches as JSON")
+    history.add_argument("--history-file", default=DEFAULT_HISTORY_FILE,
+                         help=f"history database (default: {DEFAULT_HISTORY_FILE})")
+    history.set_defaults(func=cmd_history, no_history=False)
+
+    undo = subparsers.add_parser("undo", help="revert a past batch recorded in the history")
+    undo.add_argument("batch", help="batch ID (see: extupdate history --batches)")
+    undo.add_argument("-n", "--dry-run", action="store_true",
+                      help="only check which files can be reverted")
+    undo.add_argument("--force", action="store_true",
+                      help="also revert files whose size or modification time changed since the conversion")
+    undo.add_argument("-j", "--jobs", type=int, default=1,
+                      help="number of files to revert concurrently (default: 1)")
+    undo.add_argument("--json", action="store_true", help="print the result as JSON")
+    undo.add_argument("--history-file", default=DEFAULT_HISTORY_FILE,
+                      help=f"history database (default: {DEFAULT_HISTORY_FILE})")
+    add_progress_arguments(undo)
+    add_metrics_arguments(undo)
+    add_journal_arguments(undo)
+    undo.set_defaults(func=cmd_undo, no_history=False)
+
+    return parser
+
+
+def add_selection_arguments(parser: argparse.ArgumentParser):
+    """Arguments choosing which files are converted, and how they are backed up"""
+    parser.add_argument("path", help="folder containing Excel files, or an s3://bucket/prefix URL")
+    parser.add_argument("--from", dest="source_ext",
+                        choices=EXCEL_EXTENSIONS, help="current extension")
+    parser.add_argument("--to", dest="target_ext",
+                        choices=EXCEL_EXTENSIONS, help="target extension")
+    parser.add_argument("--rule", dest="rules", action="append", default=[], metavar="SRC:DST",
+                        help="convert SRC files to DST; repeat to convert several "
+                             "extensions in one pass (instead of --from/--to)")
+    parser.add_argument("--rules", dest="rules_file", metavar="FILE",
+                        help="JSON rule file with per-extension targets and path filters")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="include subfolders")
+    parser.add_argument("--backup", action="store_true",
+                        help="create a .backup of each file before renaming")
+    parser.add_argument("--backup-strategy", choices=BACKUP_STRATEGIES, default=None,
+                        help=f"how backups are made (implies --backup; default: {BACKUP_AUTO})")
+    parser.add_argument("--scan-workers", type=int, default=DEFAULT_SCAN_WORKERS,
+                        help=f"threads reading directories in recursive scans "
+                             f"(default: {DEFAULT_SCAN_WORKERS})")
+    parser.add_argument("--cache-file", default=DEFAULT_CACHE_FILE,
+                        help=f"directory index for fast rescans (default: {DEFAULT_CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="read every directory and file instead of using the caches")
+    parser.add_argument("--check", choices=CHECK_MODES, default=CHECK_OFF,
+                        help="check file contents: skip files whose format does not match the "
+                             "target extension, or auto-pick the matching extension (default: off)")
+    parser.add_argument("--signature-file", default=DEFAULT_SIGNATURE_FILE,
+                        help=f"cache of detected file formats (default: {DEFAULT_SIGNATURE_FILE})")
+
+
+def add_history_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--history-file", default=DEFAULT_HISTORY_FILE,
+                        help=f"history database (default: {DEFAULT_HISTORY_FILE})")
+    parser.add_argument("--no-history", action="store_true",
+                        help="do not record conversions in the history journal")
+
+
+def add_progress_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--progress", action="store_true",
+                        help="show a progress bar on stderr")
+    parser.add_argument("--progress-log", metavar="FILE",
+                        help="append one JSON line per processed file to FILE")
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write phase timings and per-operation latencies as JSON to FILE ('-' for stderr)")
+    parser.add_argument("--prometheus", metavar="FILE",
+                        help="write the metrics to FILE for the Prometheus textfile collector (*.prom)")
+
+
+def add_journal_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--journal-dir", default=DEFAULT_JOURNAL_DIR,
+                        help=f"where batch journals are kept (default: {DEFAULT_JOURNAL_DIR})")
+
+
+def open_history(args: argparse.Namespace) -> Optional[HistoryStore]:
+    """History store selected by the command line, or None"""
+    if args.no_history:
+        return None
+    legacy = LEGACY_HISTORY_FILES if args.history_file == DEFAULT_HISTORY_FILE else ()
+    return HistoryStore(args.history_file, legacy_paths=legacy)
+
+
+def open_metrics(args: argparse.Namespace) -> Optional[Metrics]:
+    """Metrics collector if the command line asked for metrics, else None"""
+    if args.metrics or args.prometheus:
+        return Metrics()
+    return None
+
+
+def write_metrics(args: argparse.Namespace, metrics: Optional[Metrics]):
+    """Write collected metrics where the command line asked for them"""
+    if metrics is None:
+        return
+    try:
+        if args.metrics == "-":
+            print(json.dumps(metrics.to_dict(), indent=2), file=sys.stderr)
+        elif args.metrics:
+            metrics.write_json(args.metrics)
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
+    except OSError as e:
+        print(f"extupdate: warning: could not write metrics: {e}", file=sys.stderr)
+
+
+@contextlib.contextmanager
+def handle_signals(control: BatchControl, on_cancel: Optional[Callable[[], None]] = None):
+    """Ctrl-C and SIGTERM cancel the batch between files; SIGUSR1 pauses/resumes it
+
+    on_cancel is called after the control is cancelled, for callers that
+    also need to be woken up.
+    """
+    def cancel(signum, frame):
+        if control.cancelled:
+            raise KeyboardInterrupt
+        control.cancel()
+        if on_cancel is not None:
+            on_cancel()
+        print("\nextupdate: stopping after the files in progress (Ctrl-C again to abort)", file=sys.stderr)
+
+    def toggle_pause(signum, frame):
+        print(f"\nextupdate: {'paused' if control.toggle_pause() else 'resumed'}", file=sys.stderr)
+
+    handlers = {signal.SIGINT: cancel, signal.SIGTERM: cancel}
+    if hasattr(signal, "SIGUSR1"):
+        handlers[signal.SIGUSR1] = toggle_pause
+    previous = {}
+    try:
+        for signum, handler in handlers.items():
+            previous[signum] = signal.signal(signum, handler)
+    except ValueError:
+        # Not the main thread: the caller drives the control itself
+        pass
+    try:
+        yield
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def run_with_progress(args: argparse.Namespace,
+                      run: Callable[[Optional[ProgressCallback]], ConversionResult],
+                      control: Optional[BatchControl] = None) -> ConversionResult:
+    """Run a batch, feeding the progress bar and log selected on the command line"""
+    printer = ProgressPrinter() if args.progress else None
+    log = JsonProgressLog(args.progress_log) if args.progress_log else None
+    result = None
+    try:
+        with handle_signals(control) if control is not None else contextlib.nullcontext():
+            result = run(fan_out([printer, log]))
+    finally:
+        if printer is not None:
+            printer.close()
+        if log is not None:
+            log.close(result)
+    return result
+
+
+def print_result(result: ConversionResult, args: argparse.Namespace, summary: str,
+                 continue_with: Optional[str] = None):
+    """Print the outcome of a batch as text or JSON
+
+    continue_with is the command that finishes the batch if it was cancelled.
+    """
+    if args.json:
+        print(json.dumps(result.to_dict(), indent=2))
+        return
+    print(summary)
+    if result.backups:
+        print(f"Backups: {result.backup_summary()}")
+    if result.cancelled:
+        hint = f"; continue with: {continue_with}" if continue_with else ""
+        print(f"Cancelled before every file was processed{hint}", file=sys.stderr)
+    for skipped in result.skipped:
+        print(f"skipped: {skipped}", file=sys.stderr)
+    for conflict in result.conflicts:
+        print(f"conflict: {conflict}", file=sys.stderr)
+    for error in result.errors:
+        print(f"error: {error}", file=sys.stderr)
+
+
+def exit_status(result: ConversionResult) -> int:
+    """0 on success, 1 if any file failed or conflicted, 130 if the batch was cancelled"""
+    if result.cancelled:
+        return 130
+    return 1 if result.errors or result.conflicts else 0
+
+
+def parse_rules(args: argparse.Namespace) -> List[Rule]:
+    """Rules from --rule and --rules, or an empty list when --from/--to are used"""
+    rules = [Rule.parse(text) for text in args.rules]
+    if args.rules_file:
+        try:
+            rules.extend(RuleSet.load(args.rules_file).rules)
+        except OSError as e:
+            raise ValueError(f"Cannot read rule file: {e}")
+    if rules and (args.source_ext or args.target_ext):
+        raise ValueError("--from/--to cannot be combined with --rule/--rules")
+    if not rules and not (args.source_ext and args.target_ext):
+        raise ValueError("give --from and --to, or at least one --rule/--rules")
+    return rules
+
+
+def options_from_args(args: argparse.Namespace, **extra) -> ConversionOptions:
+    """Validated conversion options from the selection arguments (ValueError if unusable)"""
+    options = ConversionOptions(
+        root=args.path,
+        source_ext=args.source_ext or "",
+        target_ext=args.target_ext or "",
+        rules=parse_rules(args),
+        content_check=args.check,
+        recursive=args.recursive,
+        backup=args.backup or args.backup_strategy is not None,
+        backup_strategy=args.backup_strategy or BACKUP_AUTO,
+        scan_workers=args.scan_workers,
+        **extra
+    )
+    options.validate()
+    return options
+
+
+def open_caches(args: argparse.Namespace) -> Tuple[Optional[ScanCache], Optional[SignatureCache]]:
+    """Directory index and signature cache selected by the command line"""
+    if args.no_cache:
+        return None, None
+    return ScanCache(args.cache_file), SignatureCache(args.signature_file)
+
+
+def cmd_convert(args: argparse.Namespace) -> int:
+    """Run a headless conversion"""
+    try:
+        options = options_from_args(
+            args,
+            dry_run=args.dry_run,
+            jobs=args.jobs or ((os.cpu_count() or 1) if args.reencode else open_storage(args.path).default_jobs),
+            reencode=args.reencode,
+            convert_timeout=args.convert_timeout,
+            convert_memory_mb=args.convert_memory
+        )
+    except ValueError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 2
+
+    journal_dir = None if args.no_journal else args.journal_dir
+    cache, signatures = open_caches(args)
+    control = BatchControl()
+    metrics = open_metrics(args)
+    engine = ConversionEngine(options, open_history(args), journal_dir=journal_dir, cache=cache,
+                              signatures=signatures, control=control, metrics=metrics)
+    plan = engine.plan()
+    # Only files that went through are listed, and only on request: a
+    # large batch would flood the terminal
+    listed: List[int] = []
+    record = None
+    if (args.verbose or options.dry_run) and not args.json:
+        def record(event: ProgressEvent):
+            if event.kind == EVENT_CONVERTED:
+                listed.append(event.index)
+
+    result = run_with_progress(args, lambda progress: engine.execute(plan, fan_out([progress, record])), control)
+    write_metrics(args, metrics)
+
+    if args.json:
+        output = result.to_dict()
+        output["files"] = [{"old_path": p.old_path, "new_path": p.new_path} for p in plan]
+        print(json.dumps(output, indent=2))
+    else:
+        verb = "Would convert" if options.dry_run else "Converted"
+        for i in sorted(listed):
+            print(f"{plan[i].old_path} -> {os.path.basename(plan[i].new_path)}")
+        resumable = journal_dir is not None and not options.dry_run
+        print_result(result, args, f"{verb} {result.converted}/{result.total} files "
+                                   f"({options.describe()})",
+                     f"extupdate resume {result.batch_id}" if resumable else None)
+
+    return exit_status(result)
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    """Convert files as they arrive, until interrupted"""
+    try:
+        options = options_from_args(args, jobs=args.jobs)
+        if is_remote(options.root):
+            raise ValueError("watch needs a local folder")
+    except ValueError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 2
+
+    cache, signatures = open_caches(args)
+    control = BatchControl()
+    metrics = open_metrics(args)
+    engine = ConversionEngine(options, open_history(args), journal_dir=args.journal_dir, cache=cache,
+                              signatures=signatures, control=control, metrics=metrics)
+    failed = 0
+
+    def report(result: ConversionResult):
+        nonlocal failed
+        failed += len(result.errors)
+        if args.json:
+            print(json.dumps(result.to_dict()), flush=True)
+            return
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{stamp}  Converted {result.converted}/{result.total} files ({options.describe()})", flush=True)
+        for skipped in result.skipped:
+            print(f"skipped: {skipped}", file=sys.stderr)
+        for error in result.errors:
+            print(f"error: {error}", file=sys.stderr)
+        if result.cancelled:
+            print(f"Cancelled before every file was processed; continue with: "
+                  f"extupdate resume {result.batch_id}", file=sys.stderr)
+
+    daemon = WatchDaemon(engine, args.quiet, args.poll, args.poll_interval, on_batch=report)
+    print(f"extupdate: watching {options.root}{' and subfolders' if options.recursive else ''} "
+          f"for {options.describe()}; Ctrl-C to stop", file=sys.stderr)
+    try:
+        with handle_signals(control, daemon.stop):
+            daemon.run()
+    except OSError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        write_metrics(args, metrics)
+    print(f"extupdate: stopped after {daemon.batches} batches, {daemon.converted} files converted "
+          f"(watched with {daemon.method})", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    """Run the jobs of a manifest concurrently within per-device limits"""
+    try:
+        manifest = Manifest.load(args.manifest)
+        if args.per_device is not None:
+            manifest.per_device = args.per_device
+        manifest.validate()
+        if args.max_jobs < 0:
+            raise ValueError("--max-jobs cannot be negative")
+    except OSError as e:
+        print(f"extupdate: error: cannot read manifest: {e}", file=sys.stderr)
+        return 2
+    except ValueError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 2
+    if args.dry_run:
+        for job in manifest.jobs:
+            job.options.dry_run = True
+
+    def report(job_result: JobResult):
+        if args.json:
+            return
+        result = job_result.result
+        print(f"{job_result.job.name}: {result.converted}/{result.total} files "
+              f"({job_result.job.options.describe()}){' with errors' if result.errors else ''}",
+              flush=True)
+
+    cache, signatures = open_caches(args)
+    control = BatchControl()
+    metrics = open_metrics(args)
+    scheduler = JobScheduler(manifest, open_history(args), journal_dir=args.journal_dir, cache=cache,
+                             signatures=signatures, control=control, metrics=metrics, max_jobs=args.max_jobs)
+    schedule = None
+
+    def run(progress: Optional[ProgressCallback]) -> ConversionResult:
+        nonlocal schedule
+        schedule = scheduler.run(progress, report)
+        return schedule.summary()
+
+    result = run_with_progress(args, run, control)
+    write_metrics(args, metrics)
+
+    if args.json:
+        print(json.dumps(schedule.to_dict(), indent=2))
+        return exit_status(result)
+    verb = "Would convert" if args.dry_run else "Converted"
+    not_started = sum(1 for job in schedule.jobs if job.skipped)
+    note = f", {not_started} not started" if not_started else ""
+    print_result(result, args, f"{verb} {result.converted}/{result.total} files in "
+                               f"{len(schedule.jobs)} jobs{note}",
+                 "extupdate batches, then extupdate resume BATCH_ID")
+    return exit_status(result)
+
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    """Stream the rename plan as NDJSON or CSV, with totals on stderr"""
+    try:
+        options = options_from_args(args, dry_run=True)
+    except ValueError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 2
+
+    cache, signatures = open_caches(args)
+    planner = DryRunPlanner(options, cache, signatures)
+    stream = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        totals = planner.write(make_plan_writer(args.format, stream))
+    finally:
+        if args.output:
+            stream.close()
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError:
+            pass
+
+    statuses = ", ".join(f"{k}={v}" for k, v in sorted(totals.statuses.items()))
+    print(f"{totals.files} files, {format_size(totals.bytes)}; backups need up to "
+          f"{format_size(totals.backup_bytes)}; {statuses or 'nothing to do'}", file=sys.stderr)
+    return 1 if totals.problems else 0
+
+
+def cmd_batches(args: argparse.Namespace) -> int:
+    """List interrupted batches"""
+    summaries = [journal.summary() for journal in pending_journals(args.journal_dir)]
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return 0
+    if not summaries:
+        print("No interrupted batches")
+    for summary in summaries:
+        states = ", ".join(f"{k}={v}" for k, v in sorted(summary["states"].items()))
+        print(f"{summary['batch']}  {summary['created']}  {summary['root']}  "
+              f"{summary['conversion']}  ({states})")
+    return 0
+
+
+def load_batch(args: argparse.Namespace) -> Optional[BatchJournal]:
+    journal = find_journal(args.batch, args.journal_dir)
+    if journal is None:
+        which = args.batch or "interrupted"
+        print(f"extupdate: error: no {which} batch found in {args.journal_dir}", file=sys.stderr)
+    return journal
+
+
+def cmd_resume(args: argparse.Namespace) -> int:
+    """Finish an interrupted batch"""
+    journal = load_batch(args)
+    if journal is None:
+        return 2
+    control = BatchControl()
+    metrics = open_metrics(args)
+    engine = ConversionEngine.for_journal(journal, open_history(args), make_executor(args.jobs), control,
+                                          metrics)
+    result = run_with_progress(args, lambda progress: engine.resume(journal, progress), control)
+    write_metrics(args, metrics)
+    print_result(result, args, f"Resumed batch {journal.batch_id}: "
+                               f"{result.converted}/{result.total} files converted",
+                 f"extupdate resume {journal.batch_id}")
+    return exit_status(result)
+
+
+def cmd_rollback(args: argparse.Namespace) -> int:
+    """Undo an interrupted batch"""
+    journal = load_batch(args)
+    if journal is None:
+        return 2
+    control = BatchControl()
+    metrics = open_metrics(args)
+    engine = ConversionEngine.for_journal(journal, executor=make_executor(args.jobs), control=control,
+                                          metrics=metrics)
+    result = run_with_progress(args, lambda progress: engine.rollback(journal, progress), control)
+    write_metrics(args, metrics)
+    print_result(result, args, f"Rolled back batch {journal.batch_id}: "
+                               f"{result.converted} files restored",
+                 f"extupdate rollback {journal.batch_id}")
+    return exit_status(result)
+
+
+def cmd_history(args: argparse.Namespace) -> int:
+    """List or export history entries matching the filters"""
+    query = HistoryQuery(args.search, args.since, args.until, args.old_ext, args.new_ext, args.batch)
+    try:
+        query.validate()
+    except ValueError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 2
+    store = open_history(args)
+    if args.batches:
+        return list_batches(store, query, args)
+    try:
+        if args.csv:
+            if args.csv == "-":
+                written = store.export_csv(sys.stdout, query)
+            else:
+                with open(args.csv, "w", encoding="utf-8", newline="") as f:
+                    written = store.export_csv(f, query)
+            print(f"Exported {written} conversions", file=sys.stderr)
+            return 0
+        if args.limit > 0:
+            entries = store.search(query, args.limit)
+        else:
+            entries = list(store.iter_entries(query))
+    except OSError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(entries, indent=2))
+        return 0
+    for entry in entries:
+        print(f"{entry['timestamp'][:19]}  {entry['old_path']} -> {os.path.basename(entry['new_path'])}")
+    total = store.count(query)
+    if total > len(entries):
+        print(f"({len(entries)} of {total} matching conversions; use --limit 0 or --csv for all)",
+              file=sys.stderr)
+    return 0
+
+
+def list_batches(store: HistoryStore, query: HistoryQuery, args: argparse.Namespace) -> int:
+    """Print the batches with conversions matching the query"""
+    try:
+        batches = store.batches(query, args.limit if args.limit > 0 else -1)
+    except OSError as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(batches, indent=2))
+        return 0
+    for batch in batches:
+        notes = []
+        if batch["undoes"]:
+            notes.append(f"undo of {batch['undoes']}")
+        if batch["undone"]:
+            notes.append("undone")
+        note = f"  [{'; '.join(notes)}]" if notes else ""
+        print(f"{batch['batch']}  {batch['started'][:19]}  {batch['files']:>6} files  "
+              f"{batch['conversion']}{note}")
+    return 0
+
+
+def cmd_undo(args: argparse.Namespace) -> int:
+    """Revert a past batch from its history records"""
+    control = BatchControl()
+    metrics = open_metrics(args)
+    options = ConversionOptions(root=os.getcwd(), backup=False, dry_run=args.dry_run, jobs=args.jobs)
+    engine = ConversionEngine(options, open_history(args), journal_dir=args.journal_dir,
+                              control=control, metrics=metrics)
+    try:
+        result = run_with_progress(args, lambda progress: engine.undo(args.batch, progress, args.force),
+                                   control)
+    except (ValueError, OSError) as e:
+        print(f"extupdate: error: {e}", file=sys.stderr)
+        return 2
+    write_metrics(args, metrics)
+    verb = "Would revert" if args.dry_run else "Reverted"
+    print_result(result, args, f"{verb} {result.converted}/{result.total} files of batch {args.batch}",
+                 f"extupdate resume {result.batch_id}")
+    return exit_status(result)
+
+
+def run_gui():
+    """Start the tkinter GUI"""
+    from .gui import main as gui_main
+    gui_main()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main entry point"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        return run_gui()
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in (None, "gui"):
+        return run_gui()
+    return args.func(args)
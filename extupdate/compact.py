@@ -0,0 +1,383 @@
+"""
+Compact in-memory tables for million-file scans, plans and history.
+
+Held as Python objects, every file of a large batch costs several full
+path strings (the scan result, the old and new name of the rename, the
+history record), a tuple or dict around them and an ISO timestamp
+string. Nearly all of that is repetition: a share has far fewer
+directories than files, and a handful of extensions.
+
+The tables here store each directory once in an Interner and each file
+as columns: a directory id, the file's stem, and small integer codes for
+its extensions, sizes and times in typed arrays, and timestamps as
+integer microseconds. Rows are turned back into ScannedFile,
+PlannedRename or history dicts only when they are read, one at a time.
+
+This module imports nothing else from the package; the scanner and the
+engine pass in the row types they want back.
+"""
+import os
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+
+# Naive epoch for timestamps stored as microseconds (history timestamps
+# are naive local times, so no timezone arithmetic is involved)
+EPOCH = datetime(1970, 1, 1)
+_EPOCH_DAY = EPOCH.toordinal()
+
+# Stored for None in the integer columns of a RecordBuffer
+MISSING = -1
+
+
+class Interner(Generic[T]):
+    """Give each distinct value a small integer id, counting from 0 in order of first use"""
+
+    __slots__ = ("values", "_ids")
+
+    def __init__(self, values: Iterable[T] = ()):
+        self.values: List[T] = []
+        self._ids: Dict[T, int] = {}
+        for value in values:
+            self.intern(value)
+
+    def intern(self, value: T) -> int:
+        found = self._ids.get(value)
+        if found is None:
+            found = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return found
+
+    def __getitem__(self, code: int) -> T:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def split_name(name: str) -> Tuple[str, str]:
+    """(stem, extension) of a file name; the extension includes the dot"""
+    dot = name.rfind(".")
+    if dot <= 0:
+        return name, ""
+    return name[:dot], name[dot:]
+
+
+def _row(*fields) -> tuple:
+    return fields
+
+
+def _pair(old_path: str, new_path: str) -> Tuple[str, str]:
+    return old_path, new_path
+
+
+def _ranks(values: Sequence[str]) -> List[int]:
+    """Position of each value in sorted order, indexed by its code"""
+    ranks = [0] * len(values)
+    for rank, code in enumerate(sorted(range(len(values)), key=values.__getitem__)):
+        ranks[code] = rank
+    return ranks
+
+
+class FileTable:
+    """Scanned files as columns: directory id, stem, extension code, size, mtime
+
+    Rows are read back as row_type(path, size, mtime), plain tuples by
+    default.
+    """
+
+    __slots__ = ("row_type", "dirs", "exts", "dir_ids", "stems", "ext_codes", "sizes", "mtimes")
+
+    def __init__(self, row_type: Callable = _row, dirs: Optional[Interner[str]] = None):
+        self.row_type = row_type
+        self.dirs: Interner[str] = dirs if dirs is not None else Interner()
+        self.exts: Interner[str] = Interner()
+        self.dir_ids = array("I")
+        self.stems: List[str] = []
+        self.ext_codes = array("H")
+        self.sizes = array("q")
+        self.mtimes = array("d")
+
+    def append(self, path: str, size: int, mtime: float):
+        directory, name = os.path.split(path)
+        stem, ext = split_name(name)
+        self.dir_ids.append(self.dirs.intern(directory))
+        self.stems.append(stem)
+        self.ext_codes.append(self.exts.intern(ext))
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+
+    def __len__(self) -> int:
+        return len(self.stems)
+
+    def path(self, i: int) -> str:
+        return os.path.join(self.dirs[self.dir_ids[i]], self.stems[i] + self.exts[self.ext_codes[i]])
+
+    def __getitem__(self, i: int):
+        return self.row_type(self.path(i), self.sizes[i], self.mtimes[i])
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self.stems)):
+            yield self[i]
+
+    def total_bytes(self) -> int:
+        return sum(self.sizes)
+
+    def sort(self):
+        """Order rows by directory, then stem and extension"""
+        dir_rank = _ranks(self.dirs.values)
+        ext_rank = _ranks(self.exts.values)
+        dir_ids, stems, ext_codes = self.dir_ids, self.stems, self.ext_codes
+        order = sorted(range(len(stems)), key=lambda i: (
+            dir_rank[dir_ids[i]], stems[i], ext_rank[ext_codes[i]]))
+        self.dir_ids = array("I", (self.dir_ids[i] for i in order))
+        self.stems = [self.stems[i] for i in order]
+        self.ext_codes = array("H", (self.ext_codes[i] for i in order))
+        self.sizes = array("q", (self.sizes[i] for i in order))
+        self.mtimes = array("d", (self.mtimes[i] for i in order))
+
+
+class CompactPlan(Sequence):
+    """A rename plan stored as (directory id, stem, old extension, new extension) rows
+
+    Indexing and iteration yield item_type(old_path, new_path) objects
+    built on access: (old, new) tuples by default, PlannedRename in the
+    engine. Renames that change
+    more than the extension are kept as they are.
+    """
+
+    __slots__ = ("item_type", "dirs", "exts", "dir_ids", "stems", "old_exts", "new_exts", "_others")
+
+    def __init__(self, item_type: Callable = _pair, dirs: Optional[Interner[str]] = None):
+        self.item_type = item_type
+        self.dirs: Interner[str] = dirs if dirs is not None else Interner()
+        self.exts: Interner[str] = Interner()
+        self.dir_ids = array("I")
+        self.stems: List[Optional[str]] = []
+        self.old_exts = array("H")
+        self.new_exts = array("H")
+        # Row -> (old path, new path) for renames that are not extension changes
+        self._others: Dict[int, Tuple[str, str]] = {}
+
+    @classmethod
+    def from_items(cls, items: Iterable, item_type: Callable = _pair,
+                   dirs: Optional[Interner[str]] = None) -> "CompactPlan":
+        """Plan from PlannedRename-like objects (anything with old_path and new_path)"""
+        plan = cls(item_type, dirs)
+        for item in items:
+            plan.append(item.old_path, item.new_path)
+        return plan
+
+    def append(self, old_path: str, new_path: str):
+        directory, name = os.path.split(old_path)
+        stem, old_ext = split_name(name)
+        new_ext = new_path[len(old_path) - len(old_ext):]
+        if new_path[:len(old_path) - len(old_ext)] != old_path[:len(old_path) - len(old_ext)] or not old_ext:
+            self._others[len(self.stems)] = (old_path, new_path)
+            self.dir_ids.append(0)
+            self.stems.append(None)
+            self.old_exts.append(0)
+            self.new_exts.append(0)
+            return
+        self.dir_ids.append(self.dirs.intern(directory))
+        self.stems.append(stem)
+        self.old_exts.append(self.exts.intern(old_ext))
+        self.new_exts.append(self.exts.intern(new_ext))
+
+    def __len__(self) -> int:
+        return len(self.stems)
+
+    def pair(self, i: int) -> Tuple[str, str]:
+        """(old path, new path) of row i"""
+        stem = self.stems[i]
+        if stem is None:
+            return self._others[i]
+        base = os.path.join(self.dirs[self.dir_ids[i]], stem)
+        return base + self.exts[self.old_exts[i]], base + self.exts[self.new_exts[i]]
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self.item_type(*self.pair(j)) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self.item_type(*self.pair(i))
+
+    def __iter__(self) -> Iterator:
+        item_type, pair = self.item_type, self.pair
+        for i in range(len(self.stems)):
+            yield item_type(*pair(i))
+
+    def retyped(self, item_type: Callable) -> "CompactPlan":
+        """The same rows (shared, not copied) read back as item_type(old_path, new_path)"""
+        view = CompactPlan.__new__(CompactPlan)
+        for name in self.__slots__:
+            setattr(view, name, getattr(self, name))
+        view.item_type = item_type
+        return view
+
+    def pairs(self) -> "CompactPlan":
+        """The plan as a sequence of (old path, new path) tuples, built on access"""
+        return self.retyped(_pair)
+
+
+def compact_pairs(pairs: Iterable[Tuple[str, str]] = ()) -> CompactPlan:
+    """CompactPlan of (old path, new path) tuples that reads back as tuples"""
+    plan = CompactPlan()
+    for old_path, new_path in pairs:
+        plan.append(old_path, new_path)
+    return plan
+
+
+def rename_pairs(plan: Sequence) -> Sequence[Tuple[str, str]]:
+    """(old path, new path) of every rename, without copying a CompactPlan"""
+    if isinstance(plan, CompactPlan):
+        return plan.pairs()
+    return [(item.old_path, item.new_path) for item in plan]
+
+
+def plan_from_pairs(pairs: Sequence[Tuple[str, str]], item_type: Callable) -> CompactPlan:
+    """Pairs (as from rename_pairs or compact_pairs) read back as item_type(old, new)"""
+    if isinstance(pairs, CompactPlan):
+        return pairs.retyped(item_type)
+    plan = CompactPlan(item_type)
+    for old_path, new_path in pairs:
+        plan.append(old_path, new_path)
+    return plan
+
+
+def to_micros(timestamp: str) -> Optional[int]:
+    """Microseconds since EPOCH of a timestamp from datetime.isoformat()
+
+    None for anything else (other separators, a timezone, or a form that
+    would not read back unchanged from from_micros).
+    """
+    if len(timestamp) not in (19, 26) or timestamp[10] != "T" or (len(timestamp) == 26 and timestamp[19] != "."):
+        return None
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if len(timestamp) == 26 and not moment.microsecond:
+        return None
+    seconds = (moment.toordinal() - _EPOCH_DAY) * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+    return seconds * 1000000 + moment.microsecond
+
+
+def from_micros(micros: int) -> str:
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+class RecordBuffer:
+    """History records waiting to be written, stored as columns
+
+    Paths are split into interned directories, stems and extension codes;
+    timestamps are integer microseconds; backup strategy, batch, converter
+    and undone batch are interned codes. Fields with no column of their
+    own are kept per row, only for the rows that have them.
+    """
+
+    # Columns of a history record that are stored as interned codes
+    CODED = ("backup", "batch", "converter", "undoes")
+
+    __slots__ = ("dirs", "exts", "codes", "times", "old_dirs", "old_stems", "old_exts",
+                 "new_dirs", "new_stems", "new_exts", "coded", "sizes", "mtimes", "_raw")
+
+    def __init__(self):
+        self.dirs: Interner[str] = Interner()
+        self.exts: Interner[str] = Interner()
+        # Code 0 is None
+        self.codes: Interner[Optional[str]] = Interner([None])
+        self.times = array("q")
+        self.old_dirs = array("I")
+        self.old_stems: List[str] = []
+        self.old_exts = array("H")
+        self.new_dirs = array("I")
+        self.new_stems: List[str] = []
+        self.new_exts = array("H")
+        self.coded = {name: array("I") for name in self.CODED}
+        self.sizes = array("q")
+        self.mtimes = array("q")
+        # Row -> fields kept as given: unparsable timestamps and extra keys
+        self._raw: Dict[int, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.old_stems)
+
+    def __bool__(self) -> bool:
+        return bool(self.old_stems)
+
+    def _split(self, path: str) -> Tuple[int, str, int]:
+        directory, name = os.path.split(path)
+        stem, ext = split_name(name)
+        return self.dirs.intern(directory), stem, self.exts.intern(ext)
+
+    def append(self, entry: Dict):
+        """Add a history record (as built by ConversionEngine.history_entry)"""
+        row = len(self.old_stems)
+        raw = {}
+        micros = to_micros(entry["timestamp"])
+        if micros is None:
+            raw["timestamp"] = entry["timestamp"]
+            micros = 0
+        self.times.append(micros)
+
+        old_dir, old_stem, old_ext = self._split(entry["old_path"])
+        new_dir, new_stem, new_ext = self._split(entry["new_path"])
+        if new_stem == old_stem:
+            # Share the string rather than store an equal copy
+            new_stem = old_stem
+        self.old_dirs.append(old_dir)
+        self.old_stems.append(old_stem)
+        self.old_exts.append(old_ext)
+        self.new_dirs.append(new_dir)
+        self.new_stems.append(new_stem)
+        self.new_exts.append(new_ext)
+        for name in self.CODED:
+            self.coded[name].append(self.codes.intern(entry.get(name)))
+        size, mtime_ns = entry.get("size"), entry.get("mtime_ns")
+        self.sizes.append(MISSING if size is None else size)
+        self.mtimes.append(MISSING if mtime_ns is None else mtime_ns)
+
+        # old_ext/new_ext are normally the path extensions; keep them if not
+        for key in ("old_ext", "new_ext"):
+            if entry.get(key) != self.exts[old_ext if key == "old_ext" else new_ext]:
+                raw[key] = entry.get(key)
+        for key, value in entry.items():
+            if key not in RECORD_FIELDS:
+                raw[key] = value
+        if raw:
+            self._raw[row] = raw
+
+    def entry(self, i: int) -> Dict:
+        """Row i as a history record dict"""
+        dirs, exts = self.dirs.values, self.exts.values
+        entry = {
+            "timestamp": from_micros(self.times[i]),
+            "old_path": os.path.join(dirs[self.old_dirs[i]], self.old_stems[i] + exts[self.old_exts[i]]),
+            "new_path": os.path.join(dirs[self.new_dirs[i]], self.new_stems[i] + exts[self.new_exts[i]]),
+            "old_ext": exts[self.old_exts[i]],
+            "new_ext": exts[self.new_exts[i]],
+        }
+        for name in self.CODED:
+            value = self.codes[self.coded[name][i]]
+            if value is not None:
+                entry[name] = value
+        if self.sizes[i] != MISSING:
+            entry["size"] = self.sizes[i]
+        if self.mtimes[i] != MISSING:
+            entry["mtime_ns"] = self.mtimes[i]
+        raw = self._raw.get(i)
+        if raw:
+            entry.update(raw)
+        return entry
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self.old_stems)):
+            yield self.entry(i)
+
+
+# Fields a RecordBuffer stores in columns
+RECORD_FIELDS = frozenset(("timestamp", "old_path", "new_path", "old_ext", "new_ext", "size", "mtime_ns")
+                          + RecordBuffer.CODED)
@@ -0,0 +1,54 @@
+"""
+Cooperative cancel and pause for running batches.
+
+The engine checks a BatchControl before starting each file, so a rename
+in progress is always completed: cancelling stops the batch between
+files and pausing holds every worker before its next file. A cancelled
+batch keeps its journal, which records each completed rename, so it can
+be finished later with ConversionEngine.resume() without rescanning.
+"""
+import threading
+
+
+class BatchControl:
+    """Cancel/pause switch shared by a batch and whoever drives it"""
+
+    def __init__(self, poll_interval: float = 0.1):
+        self.poll_interval = poll_interval
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def cancel(self):
+        """Stop the batch before its next file (also ends a pause)"""
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def toggle_pause(self) -> bool:
+        """Pause or resume; returns whether the batch is now paused"""
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+        return self.paused
+
+    def checkpoint(self) -> bool:
+        """Wait while paused; False if the batch should stop"""
+        while not self._running.wait(self.poll_interval):
+            if self._cancelled.is_set():
+                break
+        return not self._cancelled.is_set()
@@ -0,0 +1,549 @@
+"""
+Format converters: re-encode a workbook instead of only renaming it.
+
+A Converter turns the file at src into a file at dst in the format named
+by dst's extension. Converters are looked up by (source, target)
+extension in registration order; register_converter() adds new ones.
+
+Built in, pure Python and offline:
+
+- OoxmlRepackager: between .xlsx, .xlsm, .xltx and .xltm. These share
+  one package layout, so only the workbook content type changes;
+  converting to a format without macros drops the VBA project, as
+  Excel does when saving that way.
+- SpreadsheetMLWriter: XML Spreadsheet 2003 (.xml) to any of the OOXML
+  formats above. Cell values are kept, formulas are replaced by their
+  cached values and formatting is not carried over.
+
+BIFF (.xls, .xlt) and binary (.xlsb) workbooks need a full spreadsheet
+engine. SofficeConverter hands those to LibreOffice when it is
+installed; without it they cannot be re-encoded.
+
+Conversions run in worker processes (see run_converter) so a slow or
+memory-hungry file cannot stall the caller.
+
+The engine imports this module on every start, so the heavier standard
+modules (zipfile, ElementTree, subprocess, multiprocessing) are only
+imported by the code that converts.
+"""
+import io
+import os
+import re
+import shutil
+import signal
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from .detect import MAIN_CONTENT_TYPES, VBA_CONTENT_TYPE
+
+# Seconds a single file may take before its conversion is abandoned
+DEFAULT_CONVERT_TIMEOUT = 300.0
+
+# Extra seconds the caller waits for a worker to report its own timeout
+TIMEOUT_GRACE = 5.0
+
+# Seconds a worker being replaced has to stop its helper programs
+WORKER_STOP_GRACE = 2.0
+
+# Suffix of the file written before it replaces the target
+CONVERT_TMP_SUFFIX = ".extupdate-tmp"
+
+OOXML_MAIN_CONTENT_TYPES: Dict[str, str] = {
+    "." + fmt: content_type.decode() for content_type, fmt in MAIN_CONTENT_TYPES
+}
+OOXML_EXTENSIONS = (".xlsx", ".xlsm", ".xltx", ".xltm")
+MACRO_EXTENSIONS = (".xlsm", ".xltm")
+
+SS_NS = "urn:schemas-microsoft-com:office:spreadsheet"
+WORKSHEET_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+STYLES_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+# Excel's day 0 for the 1900 date system (accounting for its 1900 leap year)
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+class ConversionTimeout(Exception):
+    """A conversion took longer than its time limit"""
+
+
+class Converter:
+    """Re-encodes workbooks between formats
+
+    Subclasses are pickled into worker processes, so they should be
+    defined at module level and keep no unpicklable state.
+    """
+
+    name = "converter"
+
+    def supports(self, source_ext: str, target_ext: str) -> bool:
+        raise NotImplementedError
+
+    def convert(self, src: str, dst: str):
+        """Write the workbook at src to dst in the format of dst's extension"""
+        raise NotImplementedError
+
+
+def _target_ext(dst: str) -> str:
+    """Extension naming the format to write (ignoring the temporary suffix)"""
+    if dst.endswith(CONVERT_TMP_SUFFIX):
+        dst = dst[:-len(CONVERT_TMP_SUFFIX)]
+    return os.path.splitext(dst)[1]
+
+
+class OoxmlRepackager(Converter):
+    """Switch between OOXML workbook, template and macro-enabled variants"""
+
+    name = "ooxml"
+
+    def supports(self, source_ext: str, target_ext: str) -> bool:
+        return source_ext in OOXML_EXTENSIONS and target_ext in OOXML_EXTENSIONS
+
+    def convert(self, src: str, dst: str):
+        import zipfile
+        target_ext = _target_ext(dst)
+        keep_macros = target_ext in MACRO_EXTENSIONS
+        with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+            names = zin.namelist()
+            if "[Content_Types].xml" not in names:
+                raise ValueError("not an OOXML package (no [Content_Types].xml)")
+            dropped = set() if keep_macros else {n for n in names if _is_vba_part(n)}
+            bin_parts_left = any(n.endswith(".bin") and n not in dropped for n in names)
+            for info in zin.infolist():
+                if info.filename in dropped:
+                    continue
+                if info.filename == "[Content_Types].xml":
+                    xml = zin.read(info).decode("utf-8")
+                    xml = _retype_workbook(xml, target_ext)
+                    if dropped:
+                        xml = _drop_vba_types(xml, bin_parts_left)
+                    zout.writestr(info, xml.encode("utf-8"))
+                elif dropped and info.filename.endswith(".rels"):
+                    xml = zin.read(info).decode("utf-8")
+                    zout.writestr(info, _drop_vba_relationships(xml).encode("utf-8"))
+                else:
+                    with zin.open(info) as part, zout.open(info, "w") as out:
+                        shutil.copyfileobj(part, out, 1 << 20)
+
+
+def _is_vba_part(name: str) -> bool:
+    base = name.rsplit("/", 1)[-1]
+    return base.startswith("vbaProject") or base == "vbaData.xml"
+
+
+def _retype_workbook(xml: str, target_ext: str) -> str:
+    target = OOXML_MAIN_CONTENT_TYPES[target_ext]
+    for content_type in OOXML_MAIN_CONTENT_TYPES.values():
+        if content_type in xml:
+            return xml.replace(content_type, target)
+    raise ValueError("no spreadsheet workbook part in package")
+
+
+_VBA_OVERRIDE = re.compile(r'<Override\b[^>]*PartName="[^"]*/vba[^"]*"[^>]*/>')
+_VBA_DEFAULT = re.compile(r'<Default\b[^>]*ContentType="%s"[^>]*/>' % re.escape(VBA_CONTENT_TYPE.decode()))
+_VBA_RELATIONSHIP = re.compile(r'<Relationship\b[^>]*Target="[^"]*vba(?:Project|Data)[^"]*"[^>]*/>')
+
+
+def _drop_vba_types(xml: str, bin_parts_left: bool) -> str:
+    xml = _VBA_OVERRIDE.sub("", xml)
+    if not bin_parts_left:
+        xml = _VBA_DEFAULT.sub("", xml)
+    return xml
+
+
+def _drop_vba_relationships(xml: str) -> str:
+    return _VBA_RELATIONSHIP.sub("", xml)
+
+
+def column_letter(index: int) -> str:
+    """Excel column name for a 1-based column index"""
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _escape(text: str) -> str:
+    """Escape text for XML character data (as xml.sax.saxutils.escape)"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attr(text: str) -> str:
+    """Escape text for a double-quoted XML attribute value"""
+    return (_escape(text).replace('"', "&quot;")
+            .replace("\n", "&#10;").replace("\r", "&#13;").replace("\t", "&#9;"))
+
+
+def _ss(name: str) -> str:
+    return f"{{{SS_NS}}}{name}"
+
+
+def _excel_serial(text: str) -> Optional[float]:
+    """Excel date serial for an XML Spreadsheet DateTime value"""
+    try:
+        moment = datetime.fromisoformat(text.rstrip("Z"))
+    except ValueError:
+        return None
+    delta = moment - EXCEL_EPOCH
+    return delta.days + delta.seconds / 86400 + delta.microseconds / 86400e6
+
+
+class SpreadsheetMLWriter(Converter):
+    """Convert XML Spreadsheet 2003 documents to OOXML workbooks"""
+
+    name = "spreadsheetml"
+
+    def supports(self, source_ext: str, target_ext: str) -> bool:
+        return source_ext == ".xml" and target_ext in OOXML_EXTENSIONS
+
+    def convert(self, src: str, dst: str):
+        import zipfile
+        target_ext = _target_ext(dst)
+        sheet_names: List[str] = []
+        with zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+            for index, (name, rows) in enumerate(self._worksheets(src), 1):
+                sheet_names.append(name or f"Sheet{index}")
+                with zout.open(f"xl/worksheets/sheet{index}.xml", "w") as raw:
+                    self._write_sheet(raw, rows)
+            if not sheet_names:
+                raise ValueError("no worksheets found in XML spreadsheet")
+            self._write_package(zout, sheet_names, target_ext)
+
+    def _worksheets(self, src: str) -> Iterator[Tuple[str, Iterator]]:
+        """Yield (name, rows) per worksheet, each row a list of (column, type, value)"""
+        import xml.etree.ElementTree as ET
+        context = ET.iterparse(src, events=("start", "end"))
+        for event, elem in context:
+            if event == "start" and elem.tag == _ss("Worksheet"):
+                yield elem.get(_ss("Name"), ""), self._rows(context)
+
+    def _rows(self, context) -> Iterator[Tuple[int, List[Tuple[int, str, str]]]]:
+        row_index = 0
+        for event, elem in context:
+            if event != "end":
+                continue
+            if elem.tag == _ss("Row"):
+                row_index = int(elem.get(_ss("Index"), row_index + 1))
+                cells = []
+                col = 0
+                for cell in elem.iter(_ss("Cell")):
+                    col = int(cell.get(_ss("Index"), col + 1))
+                    data = cell.find(_ss("Data"))
+                    if data is not None:
+                        cells.append((col, data.get(_ss("Type"), "String"), "".join(data.itertext())))
+                    col += int(cell.get(_ss("MergeAcross"), 0))
+                yield row_index, cells
+                elem.clear()
+            elif elem.tag == _ss("Worksheet"):
+                elem.clear()
+                return
+
+    def _write_sheet(self, raw, rows):
+        with io.TextIOWrapper(raw, encoding="utf-8") as out:
+            out.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                      f'<worksheet xmlns="{MAIN_NS}"><sheetData>')
+            for row_index, cells in rows:
+                out.write(f'<row r="{row_index}">')
+                for col, kind, value in cells:
+                    self._write_cell(out, f"{column_letter(col)}{row_index}", kind, value)
+                out.write("</row>")
+            out.write("</sheetData></worksheet>")
+
+    def _write_cell(self, out: TextIO, ref: str, kind: str, value: str):
+        if kind == "Number":
+            try:
+                float(value)
+            except ValueError:
+                kind = "String"
+            else:
+                out.write(f'<c r="{ref}"><v>{value.strip()}</v></c>')
+                return
+        serial = _excel_serial(value) if kind == "DateTime" else None
+        if serial is not None:
+            out.write(f'<c r="{ref}" s="1"><v>{serial!r}</v></c>')
+        elif kind == "Boolean":
+            out.write(f'<c r="{ref}" t="b"><v>{1 if value.strip() in ("1", "true") else 0}</v></c>')
+        elif kind == "Error":
+            out.write(f'<c r="{ref}" t="e"><v>{_escape(value)}</v></c>')
+        else:
+            out.write(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{_escape(value)}</t></is></c>')
+
+    def _write_package(self, zout: "zipfile.ZipFile", sheet_names: List[str], target_ext: str):
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{WORKSHEET_CONTENT_TYPE}"/>'
+            for i in range(1, len(sheet_names) + 1)
+        )
+        zout.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{OOXML_MAIN_CONTENT_TYPES[target_ext]}"/>'
+            f'<Override PartName="/xl/styles.xml" ContentType="{STYLES_CONTENT_TYPE}"/>'
+            f'{overrides}</Types>'))
+        zout.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>'))
+        sheets = "".join(
+            f'<sheet name="{_escape_attr(name[:31])}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, name in enumerate(sheet_names, 1)
+        )
+        zout.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>{sheets}</sheets></workbook>'))
+        rels = "".join(
+            f'<Relationship Id="rId{i}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, len(sheet_names) + 1)
+        )
+        styles_id = len(sheet_names) + 1
+        zout.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{rels}<Relationship Id="rId{styles_id}" Type="{REL_NS}/styles" Target="styles.xml"/>'
+            '</Relationships>'))
+        # Style 1 shows date serials as date and time (built-in format 22)
+        zout.writestr("xl/styles.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<styleSheet xmlns="{MAIN_NS}">'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+            '</styleSheet>'))
+
+
+class SofficeConverter(Converter):
+    """Convert through a LibreOffice installation, when one is available"""
+
+    name = "soffice"
+
+    # Target extension -> LibreOffice export filter
+    FILTERS = {
+        ".xlsx": "xlsx:Calc MS Excel 2007 XML",
+        ".xlsm": "xlsm:Calc MS Excel 2007 VBA XML",
+        ".xltx": "xltx:Calc MS Excel 2007 XML Template",
+        ".xls": "xls:MS Excel 97",
+        ".xlt": "xlt:MS Excel 97 Vorlage/Template",
+        ".xml": "xml:MS Excel 2003 XML",
+    }
+
+    @staticmethod
+    def executable() -> Optional[str]:
+        return shutil.which("soffice") or shutil.which("libreoffice")
+
+    def supports(self, source_ext: str, target_ext: str) -> bool:
+        return target_ext in self.FILTERS and self.executable() is not None
+
+    def convert(self, src: str, dst: str):
+        import subprocess
+        import tempfile
+        target_ext = _target_ext(dst)
+        with tempfile.TemporaryDirectory(prefix="extupdate-") as outdir:
+            # A private profile lets several conversions run at once
+            profile = "file://" + os.path.join(outdir, "profile").replace(os.sep, "/")
+            process = _start_helper([self.executable(), f"-env:UserInstallation={profile}", "--headless",
+                                     "--convert-to", self.FILTERS[target_ext], "--outdir", outdir, src])
+            try:
+                stdout, stderr = process.communicate(timeout=time_left())
+            except subprocess.TimeoutExpired:
+                raise ConversionTimeout("LibreOffice did not finish in time")
+            finally:
+                # soffice starts further processes; an orphan would keep
+                # holding the profile and hang later conversions
+                _stop_helper(process)
+            produced = os.path.join(outdir, os.path.splitext(os.path.basename(src))[0] + target_ext)
+            if process.returncode != 0 or not os.path.exists(produced):
+                message = stderr.strip() or stdout.strip()
+                raise RuntimeError(f"LibreOffice conversion failed: {message}")
+            shutil.move(produced, dst)
+
+
+CONVERTERS: List[Converter] = [OoxmlRepackager(), SpreadsheetMLWriter(), SofficeConverter()]
+
+
+def register_converter(converter: Converter, first: bool = False):
+    """Make a converter available; first=True prefers it over the built-ins"""
+    if first:
+        CONVERTERS.insert(0, converter)
+    else:
+        CONVERTERS.append(converter)
+
+
+def find_converter(source_ext: str, target_ext: str) -> Converter:
+    """The first registered converter for the pair (ValueError if none)"""
+    for converter in CONVERTERS:
+        if converter.supports(source_ext, target_ext):
+            return converter
+    raise ValueError(f"No converter from {source_ext} to {target_ext}")
+
+
+# Worker process state: when the running conversion must end, and the
+# helper programs it started (each leading its own process group)
+_deadline: Optional[float] = None
+_helpers: Set["subprocess.Popen"] = set()
+
+
+def time_left() -> Optional[float]:
+    """Seconds the running conversion has left (None: no limit)
+
+    For converters that wait on other programs, which the alarm of
+    run_converter does not stop.
+    """
+    if _deadline is None:
+        return None
+    return max(_deadline - time.monotonic(), 0.0)
+
+
+def _start_helper(args: List[str]) -> "subprocess.Popen":
+    """Start a program in a process group of its own, for _stop_helper"""
+    import subprocess
+    if os.name == "posix":
+        group = {"start_new_session": True}
+    else:
+        group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **group)
+    _helpers.add(process)
+    return process
+
+
+def _stop_helper(process: "subprocess.Popen"):
+    """Kill what is left of a helper's process group and reap it"""
+    _helpers.discard(process)
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    elif process.poll() is None:
+        process.kill()
+    process.wait()
+
+
+def _on_terminate(signum, frame):
+    for process in list(_helpers):
+        _stop_helper(process)
+    os._exit(1)
+
+
+def _init_worker(memory_mb: int):
+    """Process pool initializer: stop helpers on SIGTERM, cap memory"""
+    if os.name == "posix":
+        signal.signal(signal.SIGTERM, _on_terminate)
+    _limit_memory(memory_mb)
+
+
+def _limit_memory(memory_mb: int):
+    """Cap the worker's address space"""
+    if not memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows; conversions run unlimited there
+        return
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _on_timeout(signum, frame):
+    raise ConversionTimeout("conversion timed out")
+
+
+def run_converter(converter: Converter, src: str, dst: str, timeout: Optional[float] = None):
+    """Run one conversion in a worker process, within timeout seconds"""
+    global _deadline
+    timed = bool(timeout) and hasattr(signal, "setitimer")
+    if timed:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    _deadline = time.monotonic() + timeout if timeout else None
+    try:
+        converter.convert(src, dst)
+    except ConversionTimeout:
+        raise ConversionTimeout(f"conversion took longer than {timeout:g}s")
+    finally:
+        _deadline = None
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class ConversionPool:
+    """Process pool for run_converter that can be rebuilt around a hung worker
+
+    A worker stuck past its timeout (in native code the alarm cannot
+    interrupt) cannot be cancelled: restart() stops every worker (with
+    SIGTERM first, so they can kill their helper programs) and starts a
+    fresh pool. Conversions that were running on the killed
+    workers fail with BrokenProcessPool; killed() tells them apart from
+    a worker that crashed on its own file, so they can be submitted again.
+    """
+
+    def __init__(self, workers: int, memory_mb: int = 0):
+        self.workers = workers
+        self.memory_mb = memory_mb
+        self.generation = 0
+        self._killed = set()
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self.memory_mb,))
+
+    def submit(self, fn, *args) -> Tuple["Future", int]:
+        """Submit fn(*args); returns its future and the pool generation it runs in"""
+        with self._lock:
+            return self._executor.submit(fn, *args), self.generation
+
+    def killed(self, generation: int) -> bool:
+        """Whether generation's workers were killed by restart(kill=True)"""
+        with self._lock:
+            return generation in self._killed
+
+    def restart(self, generation: int, kill: bool = True):
+        """Replace the pool of generation with a fresh one (once per generation)
+
+        kill terminates its workers first; without it they are assumed
+        gone already (the pool is broken).
+        """
+        with self._lock:
+            if generation != self.generation:
+                # Another conversion already replaced it
+                return
+            executor = self._executor
+            if kill:
+                self._killed.add(generation)
+                # No public way to reach them: the pool would otherwise
+                # wait for the stuck worker on every later shutdown
+                processes = list((getattr(executor, "_processes", None) or {}).values())
+                for process in processes:
+                    process.terminate()
+                deadline = time.monotonic() + WORKER_STOP_GRACE
+                for process in processes:
+                    process.join(max(deadline - time.monotonic(), 0))
+                    if process.is_alive():
+                        process.kill()
+            executor.shutdown(wait=False)
+            self._executor = self._start()
+            self.generation += 1
+
+    def shutdown(self):
+        """Wait for running conversions and stop the workers"""
+        with self._lock:
+            executor = self._executor
+        executor.shutdown()
+
+
+def make_conversion_pool(workers: int, memory_mb: int = 0) -> ConversionPool:
+    """Process pool whose workers are limited to memory_mb each (0: no limit)"""
+    return ConversionPool(workers, memory_mb)
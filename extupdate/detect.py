@@ -0,0 +1,270 @@
+"""
+Content sniffing: what format is a file really in?
+
+An extension is only a label. Before renaming, the detector looks at
+the first bytes of a file to tell a BIFF workbook (OLE2 container) from
+an OOXML package (ZIP) or an XML Spreadsheet 2003 document. For OOXML
+packages the [Content_Types].xml part names the workbook type, which
+separates .xlsx, .xlsm, .xltx, .xltm and .xlsb, and declares a
+vbaProject part when the workbook carries macros.
+
+Only a few KB of each file are read: Excel writes [Content_Types].xml as
+the first entry of the package, and the local ZIP headers are walked
+through an mmap so the entries skipped over are never paged in. Packages
+laid out differently fall back to the central directory at the end.
+
+Results are cached by (device, inode, size, mtime), so files that have
+not changed are not opened again.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_SIGNATURE_FILE = "extupdate_signatures.json"
+DEFAULT_MAX_SIGNATURES = 200000
+DEFAULT_DETECT_WORKERS = 8
+
+# What to do with files whose contents do not match the target extension
+CHECK_OFF = "off"      # rename without looking at contents
+CHECK_SKIP = "skip"    # leave mismatched files alone
+CHECK_AUTO = "auto"    # rename to the extension matching the contents
+CHECK_MODES = [CHECK_OFF, CHECK_SKIP, CHECK_AUTO]
+
+FORMAT_BIFF = "biff"
+FORMAT_XLSX = "xlsx"
+FORMAT_XLSM = "xlsm"
+FORMAT_XLTX = "xltx"
+FORMAT_XLTM = "xltm"
+FORMAT_XLSB = "xlsb"
+FORMAT_XML_SPREADSHEET = "xml-spreadsheet"
+FORMAT_ZIP = "zip"
+FORMAT_UNKNOWN = "unknown"
+FORMAT_UNREADABLE = "unreadable"
+
+# Extensions that correctly describe each format, preferred first. BIFF
+# workbooks and templates are told apart by a record deep in the
+# stream, so both legacy extensions are accepted.
+FORMAT_EXTENSIONS: Dict[str, Tuple[str, ...]] = {
+    FORMAT_BIFF: (".xls", ".xlt"),
+    FORMAT_XLSX: (".xlsx",),
+    FORMAT_XLSM: (".xlsm",),
+    FORMAT_XLTX: (".xltx",),
+    FORMAT_XLTM: (".xltm",),
+    FORMAT_XLSB: (".xlsb",),
+    FORMAT_XML_SPREADSHEET: (".xml",),
+}
+
+HEAD_BYTES = 4096
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = b"PK\x03\x04"
+ZIP_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+# Compression methods (zipfile.ZIP_STORED/ZIP_DEFLATED; zipfile is imported
+# only for the central directory fallback)
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+CONTENT_TYPES_PART = "[Content_Types].xml"
+# Local headers walked before falling back to the central directory
+MAX_LOCAL_ENTRIES = 16
+# Upper bound on the decompressed [Content_Types].xml that is inspected
+MAX_CONTENT_TYPES = 1 << 20
+
+# Workbook part content type -> format
+MAIN_CONTENT_TYPES = [
+    (b"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml", FORMAT_XLSX),
+    (b"application/vnd.ms-excel.sheet.macroEnabled.main+xml", FORMAT_XLSM),
+    (b"application/vnd.openxmlformats-officedocument.spreadsheetml.template.main+xml", FORMAT_XLTX),
+    (b"application/vnd.ms-excel.template.macroEnabled.main+xml", FORMAT_XLTM),
+    (b"application/vnd.ms-excel.sheet.binary.macroEnabled.main", FORMAT_XLSB),
+]
+VBA_CONTENT_TYPE = b"application/vnd.ms-office.vbaProject"
+
+XML_SPREADSHEET_MARKERS = (b"urn:schemas-microsoft-com:office:spreadsheet", b'progid="excel.sheet"')
+
+
+class Detection(NamedTuple):
+    """The format found in a file"""
+    format: str
+    macros: bool = False
+
+    @property
+    def extensions(self) -> Tuple[str, ...]:
+        """Extensions that match the contents, preferred first"""
+        return FORMAT_EXTENSIONS.get(self.format, ())
+
+    @property
+    def preferred_ext(self) -> Optional[str]:
+        return self.extensions[0] if self.extensions else None
+
+    def accepts(self, ext: str) -> bool:
+        """Whether a file with these contents may carry ext"""
+        return ext in self.extensions
+
+    def describe(self) -> str:
+        if self.macros and self.format in (FORMAT_XLSX, FORMAT_XLTX, FORMAT_ZIP):
+            return f"{self.format} with macros"
+        return self.format
+
+
+def _from_content_types(xml: bytes) -> Detection:
+    macros = VBA_CONTENT_TYPE in xml
+    for content_type, fmt in MAIN_CONTENT_TYPES:
+        if content_type in xml:
+            return Detection(fmt, macros)
+    return Detection(FORMAT_ZIP, macros)
+
+
+def _inflate(data: bytes, method: int) -> Optional[bytes]:
+    if method == ZIP_STORED:
+        return data[:MAX_CONTENT_TYPES]
+    if method == ZIP_DEFLATED:
+        try:
+            return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data, MAX_CONTENT_TYPES)
+        except zlib.error:
+            return None
+    return None
+
+
+def _sniff_zip_directory(f: BinaryIO) -> Detection:
+    """Classify a package from its central directory"""
+    import zipfile
+    try:
+        with zipfile.ZipFile(f) as package:
+            names = set(package.namelist())
+            if CONTENT_TYPES_PART in names:
+                with package.open(CONTENT_TYPES_PART) as part:
+                    return _from_content_types(part.read(MAX_CONTENT_TYPES))
+    except (zipfile.BadZipFile, zlib.error, EOFError, ValueError):
+        return Detection(FORMAT_UNKNOWN)
+    macros = "xl/vbaProject.bin" in names
+    if "xl/workbook.bin" in names:
+        return Detection(FORMAT_XLSB, macros)
+    if "xl/workbook.xml" in names:
+        return Detection(FORMAT_XLSM if macros else FORMAT_XLSX, macros)
+    return Detection(FORMAT_ZIP, macros)
+
+
+def _sniff_zip(buf: mmap.mmap, f: BinaryIO) -> Detection:
+    """Classify a ZIP package, reading [Content_Types].xml from its local header"""
+    offset = 0
+    for _ in range(MAX_LOCAL_ENTRIES):
+        header = buf[offset:offset + ZIP_LOCAL_HEADER.size]
+        if len(header) < ZIP_LOCAL_HEADER.size:
+            break
+        (magic, _, flags, method, _, _, _, compressed,
+         _, name_len, extra_len) = ZIP_LOCAL_HEADER.unpack(header)
+        if magic != ZIP_MAGIC:
+            break
+        name_start = offset + ZIP_LOCAL_HEADER.size
+        data_start = name_start + name_len + extra_len
+        # Sizes deferred to a data descriptor cannot be walked past
+        sized = not (flags & 0x08 and compressed == 0)
+        if buf[name_start:name_start + name_len] == CONTENT_TYPES_PART.encode() and sized:
+            xml = _inflate(buf[data_start:data_start + compressed], method)
+            if xml is not None:
+                return _from_content_types(xml)
+            break
+        if not sized:
+            break
+        offset = data_start + compressed
+    return _sniff_zip_directory(f)
+
+
+def sniff(path: str) -> Detection:
+    """Detect the format of path from its contents (OSError if unreadable)"""
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+        if head.startswith(ZIP_MAGIC):
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return _sniff_zip(buf, f)
+    if head.startswith(OLE2_MAGIC):
+        return Detection(FORMAT_BIFF)
+    lowered = head.lower()
+    if any(marker in lowered for marker in XML_SPREADSHEET_MARKERS):
+        return Detection(FORMAT_XML_SPREADSHEET)
+    return Detection(FORMAT_UNKNOWN)
+
+
+class SignatureCache:
+    """On-disk cache of detections keyed by (device, inode, size, mtime)"""
+
+    def __init__(self, path: str = DEFAULT_SIGNATURE_FILE, max_entries: int = DEFAULT_MAX_SIGNATURES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Detection] = {}
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(st: os.stat_result) -> str:
+        return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def load(self):
+        """Read the cache from disk (once); a missing or bad file means empty"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._entries = {key: Detection(fmt, bool(macros)) for key, (fmt, macros) in data.items()}
+            except (OSError, ValueError, TypeError, AttributeError):
+                self._entries = {}
+
+    def save(self):
+        """Write the cache to disk if it changed, dropping the oldest entries"""
+        with self._lock:
+            if not self._dirty:
+                return
+            excess = len(self._entries) - self.max_entries
+            if excess > 0:
+                for key in list(self._entries)[:excess]:
+                    del self._entries[key]
+            data = {key: [d.format, d.macros] for key, d in self._entries.items()}
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def detect(self, path: str) -> Detection:
+        """Detection for path, sniffing it only when it changed"""
+        key = self.key(os.stat(path))
+        with self._lock:
+            found = self._entries.get(key)
+        if found is not None:
+            self.hits += 1
+            return found
+        self.misses += 1
+        found = sniff(path)
+        with self._lock:
+            self._entries[key] = found
+            self._dirty = True
+        return found
+
+
+def detect(path: str, cache: Optional[SignatureCache] = None) -> Detection:
+    """Detect one file, reporting unreadable files instead of raising"""
+    try:
+        return cache.detect(path) if cache is not None else sniff(path)
+    except OSError:
+        return Detection(FORMAT_UNREADABLE)
+
+
+def detect_all(paths: Sequence[str], workers: int = DEFAULT_DETECT_WORKERS,
+               cache: Optional[SignatureCache] = None) -> List[Detection]:
+    """Detect many files on a thread pool, in the order given"""
+    if cache is not None:
+        cache.load()
+    if workers <= 1 or len(paths) < 2:
+        return [detect(path, cache) for path in paths]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extupdate-detect") as pool:
+        return list(pool.map(lambda path: detect(path, cache), paths))
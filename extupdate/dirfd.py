@@ -0,0 +1,188 @@
+"""
+Directory-relative file operations for batches.
+
+A batch touches many files in comparatively few directories. Passing a
+full path to every stat, link and rename makes the kernel (and on a
+network filesystem, the client) resolve every component of that path
+again for each call. Here each directory is opened once and the calls
+for the files in it are made relative to that descriptor (the *at()
+system calls through dir_fd), so only the file name is looked up.
+
+Holding the directory open also pins it: if a parent is renamed, or
+replaced by a symlink, between the scan and the rename, the remaining
+operations still act on the directory that was opened rather than on
+whatever the path leads to by then.
+
+Where dir_fd is not supported (Windows), or a directory cannot be
+opened, the same interface works on full paths.
+"""
+import contextlib
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Iterable, Iterator, Optional
+
+# Whether the calls used here accept dir_fd on this platform
+DIR_FD_SUPPORTED = hasattr(os, "O_DIRECTORY") and {os.open, os.stat, os.rename, os.link, os.unlink} <= os.supports_dir_fd
+
+# O_PATH (Linux) opens a directory for use as dir_fd without needing
+# read permission on it, as path lookups do not
+_OPEN_FLAGS = (getattr(os, "O_PATH", os.O_RDONLY) | getattr(os, "O_DIRECTORY", 0)
+               | getattr(os, "O_CLOEXEC", 0))
+
+# Directories kept open at once by a DirectoryHandles beyond those in use
+DEFAULT_MAX_OPEN = 64
+
+
+class Directory:
+    """A directory that file operations are made relative to
+
+    Names passed to the methods are file names inside the directory.
+    With no descriptor they are joined to path and the calls take full
+    paths; Directory("") therefore takes full paths as names.
+    """
+
+    __slots__ = ("path", "fd")
+
+    def __init__(self, path: str, fd: Optional[int] = None):
+        self.path = path
+        self.fd = fd
+
+    def path_of(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def lstat(self, name: str) -> os.stat_result:
+        if self.fd is None:
+            return os.lstat(self.path_of(name))
+        return os.stat(name, dir_fd=self.fd, follow_symlinks=False)
+
+    def lexists(self, name: str) -> bool:
+        """Whether name exists, as os.path.lexists"""
+        try:
+            self.lstat(name)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def rename(self, src: str, dst: str):
+        if self.fd is None:
+            os.rename(self.path_of(src), self.path_of(dst))
+        else:
+            os.rename(src, dst, src_dir_fd=self.fd, dst_dir_fd=self.fd)
+
+    def link(self, src: str, dst: str):
+        if self.fd is None:
+            os.link(self.path_of(src), self.path_of(dst))
+        else:
+            os.link(src, dst, src_dir_fd=self.fd, dst_dir_fd=self.fd)
+
+    def unlink(self, name: str):
+        if self.fd is None:
+            os.unlink(self.path_of(name))
+        else:
+            os.unlink(name, dir_fd=self.fd)
+
+    def opener(self, name: str, flags: int) -> int:
+        """For open(name, mode, opener=directory.opener)"""
+        if self.fd is None:
+            return os.open(self.path_of(name), flags, 0o666)
+        return os.open(name, flags, 0o666, dir_fd=self.fd)
+
+    def device(self) -> int:
+        """st_dev of the directory itself"""
+        if self.fd is None:
+            return os.stat(self.path or ".").st_dev
+        return os.fstat(self.fd).st_dev
+
+
+# Operations on full paths, as plain os calls make them
+PATHS = Directory("")
+
+
+def open_directory(path: str) -> Directory:
+    """Directory for path, holding a descriptor when possible"""
+    if DIR_FD_SUPPORTED:
+        try:
+            return Directory(path, os.open(path or ".", _OPEN_FLAGS))
+        except OSError:
+            # Report errors per file, from the path-based calls
+            pass
+    return Directory(path)
+
+
+class DirectoryHandles:
+    """Open directories shared by the files of one batch
+
+    Built from the paths the batch will touch, so each directory is
+    closed as soon as its last file is done. Directories are opened on
+    first use; at most max_open idle ones are kept beyond that, the
+    least recently used closed first, so plans that visit directories
+    out of order cannot run out of descriptors. With enabled false
+    every Directory works on full paths.
+    """
+
+    def __init__(self, paths: Iterable[str], max_open: int = DEFAULT_MAX_OPEN,
+                 enabled: bool = DIR_FD_SUPPORTED):
+        self.enabled = enabled and DIR_FD_SUPPORTED
+        self.max_open = max_open
+        # Directory -> files still to be done in it
+        self._remaining = Counter(os.path.dirname(p) for p in paths) if self.enabled else Counter()
+        # Directory -> [Directory, users]; oldest use first
+        self._open: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def directory(self, path: str) -> Iterator[Directory]:
+        """The Directory for path, for the operations on one of its files"""
+        if not self.enabled:
+            yield Directory(path)
+            return
+        with self._lock:
+            entry = self._open.get(path)
+            if entry is not None:
+                entry[1] += 1
+                self._open.move_to_end(path)
+        if entry is None:
+            opened = open_directory(path)
+            with self._lock:
+                entry = self._open.get(path)
+                if entry is None:
+                    entry = self._open[path] = [opened, 1]
+                else:
+                    entry[1] += 1
+                    _close(opened)
+        try:
+            yield entry[0]
+        finally:
+            self._release(path, entry)
+
+    def _release(self, path: str, entry: list):
+        closing = []
+        with self._lock:
+            entry[1] -= 1
+            self._remaining[path] -= 1
+            if self._remaining[path] <= 0 and entry[1] == 0:
+                del self._remaining[path]
+                closing.append(self._open.pop(path)[0])
+            idle = len(self._open) - self.max_open
+            for name in list(self._open):
+                if idle <= 0:
+                    break
+                if self._open[name][1] == 0:
+                    closing.append(self._open.pop(name)[0])
+                    idle -= 1
+        for directory in closing:
+            _close(directory)
+
+    def close(self):
+        """Close every directory still open"""
+        with self._lock:
+            entries, self._open = list(self._open.values()), OrderedDict()
+        for directory, _ in entries:
+            _close(directory)
+
+
+def _close(directory: Directory):
+    if directory.fd is not None:
+        os.close(directory.fd)
+        directory.fd = None
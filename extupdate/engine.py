@@ -0,0 +1,880 @@
+"""
+Headless scan/plan/execute engine for Excel extension updates.
+
+This module is pure Python and never imports tkinter, so it can be used
+from the command line, cron jobs or other programs.
+"""
+import os
+import stat
+import threading
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from .backup import BACKUP_AUTO, BACKUP_COPY, BACKUP_JOURNAL, BACKUP_STRATEGIES, BackupManager, backup_path
+from .converters import (
+    CONVERT_TMP_SUFFIX,
+    DEFAULT_CONVERT_TIMEOUT,
+    TIMEOUT_GRACE,
+    ConversionTimeout,
+    Converter,
+    find_converter,
+    make_conversion_pool,
+    run_converter,
+)
+from .executor import make_executor
+from .history import HistoryQuery, HistoryStore
+from .journal import (
+    STATE_CONFLICT,
+    STATE_DONE,
+    STATE_MISSING,
+    STATE_PENDING,
+    BatchJournal,
+    new_batch_id,
+)
+from .cache import ScanCache, directory_reader
+from .compact import CompactPlan, plan_from_pairs, rename_pairs
+from .dirfd import DIR_FD_SUPPORTED, PATHS, Directory, DirectoryHandles
+from .control import BatchControl
+from .metrics import (
+    NULL_METRICS,
+    OP_BACKUP,
+    OP_FILE,
+    OP_JOURNAL,
+    OP_REENCODE,
+    OP_RENAME,
+    Metrics,
+    timed_reader,
+)
+from .detect import CHECK_AUTO, CHECK_MODES, CHECK_OFF, Detection, SignatureCache, detect_all
+from .rules import Rule, RuleSet
+from .storage import StorageBackend, is_remote, open_storage
+from .scanner import (
+    DEFAULT_SCAN_WORKERS,
+    DirectoryReader,
+    Extensions,
+    FilePlan,
+    ScannedFile,
+    read_directory,
+    scan,
+)
+
+# Excel file extensions
+EXCEL_EXTENSIONS = [
+    ".xls", ".xlsx", ".xlsm", ".xlsb",
+    ".xltx", ".xltm", ".xlt", ".xml"
+]
+
+# Extension compatibility warnings
+COMPATIBILITY_WARNINGS = {
+    ".xls": "Legacy format with limited features (65,536 rows, no XML)",
+    ".xlsx": "Modern format, most compatible",
+    ".xlsm": "Supports macros/VBA code",
+    ".xlsb": "Binary format, faster but less compatible",
+    ".xltx": "Template without macros",
+    ".xltm": "Template with macros",
+    ".xlt": "Legacy template format",
+    ".xml": "XML spreadsheet format"
+}
+
+# Backups a storage backend can make: a copy next to the file, or none
+REMOTE_BACKUP_STRATEGIES = [BACKUP_AUTO, BACKUP_COPY, BACKUP_JOURNAL]
+
+# Progress event kinds
+EVENT_STARTED = "started"
+EVENT_CONVERTED = "converted"
+EVENT_FAILED = "failed"
+
+
+def format_size(size: float) -> str:
+    """Format file size in human readable format"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
+
+
+@dataclass
+class ConversionOptions:
+    """Settings for a single conversion run"""
+    root: str
+    source_ext: str = ""
+    target_ext: str = ""
+    recursive: bool = False
+    backup: bool = True
+    backup_strategy: str = BACKUP_AUTO
+    dry_run: bool = False
+    jobs: int = 1
+    scan_workers: int = DEFAULT_SCAN_WORKERS
+    # Several source -> target mappings for one pass; when set,
+    # source_ext and target_ext are not used
+    rules: List[Rule] = field(default_factory=list)
+    # Whether file contents are checked against the target extension
+    content_check: str = CHECK_OFF
+    # Re-encode file contents into the target format instead of renaming
+    reencode: bool = False
+    # Per-file limits for re-encoding; 0 means unlimited
+    convert_timeout: float = DEFAULT_CONVERT_TIMEOUT
+    convert_memory_mb: int = 0
+
+    def __post_init__(self):
+        # History and journals record paths under root; relative ones
+        # would point elsewhere when undone from another directory
+        if self.root and not is_remote(self.root):
+            self.root = os.path.abspath(self.root)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ConversionOptions":
+        """Options from to_dict() output, ignoring unknown keys"""
+        known = {f.name for f in fields(cls)}
+        values = {k: v for k, v in data.items() if k in known}
+        values["rules"] = [Rule.from_dict(r) if isinstance(r, dict) else r for r in values.get("rules", [])]
+        return cls(**values)
+
+    def validate(self):
+        """Raise ValueError if the options cannot be used"""
+        if self.rules:
+            RuleSet(self.rules)
+        elif self.source_ext == self.target_ext:
+            raise ValueError("Current and target extensions must be different!")
+        storage = open_storage(self.root)
+        try:
+            found = storage.isdir(self.root)
+        except OSError as e:
+            raise ValueError(f"Cannot read {self.root}: {e}")
+        if not found:
+            raise ValueError(f"Not a directory: {self.root}")
+        if self.jobs < 1:
+            raise ValueError("jobs must be at least 1")
+        if self.backup_strategy not in BACKUP_STRATEGIES:
+            raise ValueError(f"Unknown backup strategy: {self.backup_strategy}")
+        if self.scan_workers < 1:
+            raise ValueError("scan_workers must be at least 1")
+        if self.content_check not in CHECK_MODES:
+            raise ValueError(f"Unknown content check: {self.content_check}")
+        if self.reencode and self.backup and self.backup_strategy == BACKUP_JOURNAL:
+            raise ValueError("Journal-only backups cannot restore re-encoded files; "
+                             "choose another backup strategy")
+        if self.convert_timeout < 0 or self.convert_memory_mb < 0:
+            raise ValueError("Conversion limits cannot be negative")
+        if not storage.local:
+            if self.reencode or self.content_check != CHECK_OFF:
+                raise ValueError("Re-encoding and content checks need local files")
+            if self.backup and self.backup_strategy not in REMOTE_BACKUP_STRATEGIES:
+                raise ValueError(f"Backups of remote files are copies: use --backup-strategy "
+                                 f"{' or '.join(REMOTE_BACKUP_STRATEGIES)}")
+
+    def extensions(self) -> Extensions:
+        """The extension(s) a scan for these options looks for"""
+        if self.rules:
+            return frozenset(rule.source_ext for rule in self.rules)
+        return self.source_ext
+
+    def rule_set(self) -> RuleSet:
+        """The conversion as a RuleSet, also for a plain source/target pair"""
+        if self.rules:
+            return RuleSet(self.rules)
+        return RuleSet.single(self.source_ext, self.target_ext)
+
+    def describe(self) -> str:
+        """Short description of the conversion, such as .xls -> .xlsx"""
+        return self.rule_set().describe()
+
+
+@dataclass
+class PlannedRename:
+    """A single planned file rename"""
+    old_path: str
+    new_path: str
+
+
+@dataclass
+class ProgressEvent:
+    """Progress of one file within a batch
+
+    completed counts files finished (converted or failed) so far,
+    including this one for converted/failed events.
+    """
+    kind: str
+    index: int
+    total: int
+    path: str
+    completed: int
+    error: Optional[str] = None
+
+
+# Receives ProgressEvents; may be called from executor worker threads
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+@dataclass
+class ConversionResult:
+    """Outcome of executing a conversion plan"""
+    converted: int = 0
+    total: int = 0
+    errors: List[str] = field(default_factory=list)
+    dry_run: bool = False
+    # Backup strategy name -> number of files backed up with it
+    backups: Dict[str, int] = field(default_factory=dict)
+    batch_id: Optional[str] = None
+    # Files left out of the plan because of their contents
+    skipped: List[str] = field(default_factory=list)
+    # Set when the batch was cancelled before every file was processed
+    cancelled: bool = False
+    # Files an undo left alone because they changed since the conversion
+    conflicts: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            "converted": self.converted,
+            "total": self.total,
+            "errors": self.errors,
+            "conflicts": self.conflicts,
+            "skipped": self.skipped,
+            "cancelled": self.cancelled,
+            "dry_run": self.dry_run,
+            "backups": self.backups,
+            "batch": self.batch_id,
+        }
+
+    def backup_summary(self) -> str:
+        """Human readable description of the backup strategies used"""
+        return ", ".join(f"{name} ({count})" for name, count in sorted(self.backups.items()))
+
+
+class UndoConflict(Exception):
+    """A recorded conversion that can no longer be undone safely"""
+
+
+def scan_files(root: str, ext: Extensions, recursive: bool = False,
+               workers: int = DEFAULT_SCAN_WORKERS,
+               cancel: Optional[threading.Event] = None,
+               reader: Optional[DirectoryReader] = None) -> FilePlan:
+    """Scan root once for files with extension ext (or any of a set)
+
+    Without a reader, directories are listed by the storage backend
+    holding root (see storage.open_storage).
+    """
+    if reader is None:
+        storage = open_storage(root)
+        reader = read_directory if storage.local else storage.read_directory
+    return scan(root, ext, recursive, workers, cancel, reader)
+
+
+def plan_conversion(files: Iterable[Union[str, ScannedFile]], source_ext: str,
+                    target_ext: str) -> CompactPlan:
+    """Build the renames for the given paths or scanned files
+
+    The plan is a sequence of PlannedRename stored compactly; see
+    compact.CompactPlan.
+    """
+    plan = CompactPlan(PlannedRename)
+    for f in files:
+        path = f if isinstance(f, str) else f.path
+        plan.append(path, path[:-len(source_ext)] + target_ext)
+    return plan
+
+
+def plan_rules(files: Iterable[Union[str, ScannedFile]], rules: RuleSet,
+               root: str) -> CompactPlan:
+    """Build the renames for files accepted by a rule; other files are left out"""
+    plan = CompactPlan(PlannedRename)
+    for f in files:
+        path = f if isinstance(f, str) else f.path
+        rule = rules.match(path, root)
+        if rule is not None:
+            plan.append(path, path[:-len(rule.source_ext)] + rule.target_ext)
+    return plan
+
+
+def check_content(item: PlannedRename, found: Detection,
+                  mode: str) -> Tuple[Optional[PlannedRename], Optional[str]]:
+    """Apply a content check to one rename: (rename to do, None) or (None, reason to skip)"""
+    base, current_ext = os.path.splitext(item.old_path)
+    target_ext = os.path.splitext(item.new_path)[1]
+    if not found.accepts(target_ext) and mode == CHECK_AUTO:
+        if found.accepts(current_ext):
+            return None, f"already named for its contents ({found.describe()})"
+        if found.preferred_ext is not None:
+            target_ext = found.preferred_ext
+    if not found.accepts(target_ext):
+        return None, f"contents are {found.describe()}, not {target_ext}"
+    return PlannedRename(item.old_path, base + target_ext), None
+
+
+class ConversionEngine:
+    """Scan, plan and execute extension updates without any GUI"""
+
+    def __init__(self, options: ConversionOptions, history: Optional[HistoryStore] = None,
+                 executor=None, journal_dir: Optional[str] = None,
+                 cache: Optional[ScanCache] = None, signatures: Optional[SignatureCache] = None,
+                 control: Optional[BatchControl] = None, metrics: Optional[Metrics] = None,
+                 storage: Optional[StorageBackend] = None):
+        self.options = options
+        # Where the files live: the local filesystem unless root is a URL
+        self.storage = storage if storage is not None else open_storage(options.root)
+        self.history = history
+        self.executor = executor if executor is not None else make_executor(options.jobs)
+        self.journal_dir = journal_dir
+        self.cache = cache
+        self.signatures = signatures
+        # Checked between files to cancel or pause a running batch
+        self.control = control
+        # Timings and counters; a no-op unless a Metrics is given
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        # Files the last plan() left out, as "name: reason"
+        self.skipped: List[str] = []
+        # Rename and back up each file relative to its open directory
+        # (see dirfd); off, every call takes the full path
+        self.dir_fd = DIR_FD_SUPPORTED
+
+    @classmethod
+    def for_journal(cls, journal: BatchJournal, history: Optional[HistoryStore] = None,
+                    executor=None, control: Optional[BatchControl] = None,
+                    metrics: Optional[Metrics] = None,
+                    cache: Optional[ScanCache] = None) -> "ConversionEngine":
+        """Engine configured with the options an interrupted batch was started with"""
+        return cls(ConversionOptions.from_dict(journal.options), history, executor, cache=cache,
+                   control=control, metrics=metrics)
+
+    def scan(self, cancel: Optional[threading.Event] = None) -> FilePlan:
+        """Find files matching the source extension(s), using the scan cache if set"""
+        if self.storage.local:
+            reader = directory_reader(self.cache)
+        else:
+            # The index is keyed on local directory mtimes, which object
+            # stores do not have
+            reader = self.storage.read_directory
+        with self.metrics.phase("scan"):
+            plan = scan_files(self.options.root, self.options.extensions(), self.options.recursive,
+                              self.options.scan_workers, cancel, timed_reader(reader, self.metrics))
+        if self.cache is not None and self.storage.local:
+            try:
+                self.cache.save()
+            except OSError:
+                # A cache that cannot be written only costs speed
+                pass
+        return plan
+
+    def plan(self, files: Optional[Iterable[Union[str, ScannedFile]]] = None) -> Sequence[PlannedRename]:
+        """Plan renames for the given files (scanning if not supplied)
+
+        With a content check, files whose contents do not match their
+        target extension are retargeted (auto) or left out (skip); the
+        files left out are listed in self.skipped.
+        """
+        if files is None:
+            files = self.scan()
+        with self.metrics.phase("plan"):
+            if self.options.rules:
+                plan = plan_rules(files, RuleSet(self.options.rules), self.options.root)
+            else:
+                plan = plan_conversion(files, self.options.source_ext, self.options.target_ext)
+        self.skipped = []
+        if self.options.content_check != CHECK_OFF:
+            plan = self.check_contents(plan)
+        return plan
+
+    def check_contents(self, plan: Sequence[PlannedRename]) -> CompactPlan:
+        """Sniff every planned file and drop or retarget mismatched renames"""
+        with self.metrics.phase("detect"):
+            detections = detect_all([item.old_path for item in plan], self.options.scan_workers, self.signatures)
+        checked = CompactPlan(PlannedRename)
+        for item, found in zip(plan, detections):
+            checked_item, reason = check_content(item, found, self.options.content_check)
+            if checked_item is None:
+                self.skipped.append(f"{os.path.basename(item.old_path)}: {reason}")
+            else:
+                checked.append(checked_item.old_path, checked_item.new_path)
+        if self.signatures is not None:
+            try:
+                self.signatures.save()
+            except OSError:
+                pass
+        return checked
+
+    def execute(self, plan: Sequence[PlannedRename],
+                progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Apply a conversion plan, returning the aggregated result
+
+        Files in the same directory are renamed in plan order; different
+        directories may be processed concurrently by the executor. With a
+        journal directory configured, the plan is journaled first so an
+        interrupted batch can be resumed or rolled back. If the control
+        cancels the batch, files not yet started are left alone and the
+        journal is kept for resume().
+        """
+        batch_id = new_batch_id()
+        journal = None
+        if self.journal_dir is not None and not self.options.dry_run and plan:
+            with self.metrics.phase("journal"):
+                journal = BatchJournal.begin(self.journal_dir, self.options.to_dict(), rename_pairs(plan), batch_id)
+
+        result = ConversionResult(total=len(plan), dry_run=self.options.dry_run, batch_id=batch_id,
+                                  skipped=list(self.skipped))
+        self._apply(plan, range(len(plan)), result, progress, journal)
+        return result
+
+    def resume(self, journal: BatchJournal,
+               progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Finish an interrupted batch from its journal
+
+        Pairs already renamed on disk are kept (and recorded in history,
+        since the interrupted run never flushed them); pairs still at
+        their old name are renamed now; pairs where both or neither name
+        exist are reported as errors.
+        """
+        plan = plan_from_pairs(journal.ops, PlannedRename)
+        result = ConversionResult(total=len(plan), batch_id=journal.batch_id)
+        try:
+            journal.acquire()
+        except OSError as e:
+            result.errors.append(e.strerror or str(e))
+            return result
+        undoes = journal.options.get("undo")
+        restore = {plan[i].old_path for i in journal.options.get("restore", [])}
+        pending = []
+        for i, state in enumerate(journal.states()):
+            if state == STATE_PENDING:
+                pending.append(i)
+            elif state == STATE_DONE:
+                result.converted += 1
+                if self.history is None or i in journal.recorded:
+                    continue
+                st = _stat_quietly(plan[i].new_path)
+                if undoes:
+                    entry = self.undo_entry(plan[i], journal.batch_id, undoes, plan[i].old_path in restore, st)
+                else:
+                    entry = self.history_entry(
+                        plan[i], journal.options.get("backup_strategy") if journal.options.get("backup") else None,
+                        journal.batch_id, st=st)
+                self.history.append(entry)
+            else:
+                result.errors.append(self._state_error(plan[i].old_path, state))
+
+        operation = self._revert_operation(restore, journal.batch_id, undoes) if undoes else None
+        self._apply(plan, pending, result, progress, journal, operation)
+        return result
+
+    def rollback(self, journal: BatchJournal,
+                 progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Undo the completed renames of an interrupted batch
+
+        converted in the result counts the files restored to their
+        original name.
+        """
+        plan = plan_from_pairs(journal.ops, _reverse_rename)
+        result = ConversionResult(total=len(plan), batch_id=journal.batch_id)
+        try:
+            journal.acquire()
+        except OSError as e:
+            result.errors.append(e.strerror or str(e))
+            return result
+        # Files an undo restored from their backups: renaming them back
+        # would give original contents the converted extension
+        restored = set(journal.options.get("restore", []))
+        done = []
+        for i, state in enumerate(journal.states()):
+            if state == STATE_DONE and i in restored:
+                result.errors.append(f"{os.path.basename(journal.ops[i][1])}: restored from a backup; "
+                                     f"convert it again instead")
+            elif state == STATE_DONE:
+                done.append(i)
+            elif state in (STATE_CONFLICT, STATE_MISSING):
+                result.errors.append(self._state_error(journal.ops[i][0], state))
+
+        def restore(item: PlannedRename):
+            open_storage(item.old_path).rename(item.old_path, item.new_path)
+
+        if journal.options.get("reencode"):
+            def restore(item: PlannedRename):
+                # The converted file has different contents: bring back the backup
+                backup = backup_path(item.new_path)
+                if not os.path.exists(backup):
+                    raise ValueError("no backup of the original to restore")
+                os.replace(backup, item.new_path)
+                os.unlink(item.old_path)
+
+        self._apply(plan, done, result, progress, None, restore)
+        if not result.errors and not result.cancelled:
+            journal.commit()
+        else:
+            journal.close()
+        return result
+
+    def undo(self, batch_id: str, progress: Optional[ProgressCallback] = None,
+             force: bool = False) -> ConversionResult:
+        """Revert the conversions of a past batch recorded in history
+
+        Every converted file must still exist unchanged (the size and
+        mtime recorded at conversion time) and its original name must be
+        free; files failing these checks are listed in result.conflicts
+        and left alone. force skips the size/mtime comparison. The rest
+        are renamed back, or have their backup restored if they were
+        re-encoded, through the executor and journaled like any batch.
+        The undo is recorded in history as a batch of its own.
+        """
+        if self.history is None:
+            raise ValueError("undoing a batch needs the conversion history")
+        entries = list(self.history.iter_entries(HistoryQuery(batch=batch_id)))
+        if not entries:
+            raise ValueError(f"no conversions recorded for batch {batch_id}")
+
+        with self.metrics.phase("plan"):
+            failures = self.executor.run(entries, lambda index, entry: self.check_undo(entry, force),
+                                         key=lambda entry: open_storage(entry["new_path"]).ordering_key(
+                                             entry["new_path"]))
+        failures.sort(key=lambda failure: failure[0])
+        failed = {index for index, _ in failures}
+        undoable = [entry for i, entry in enumerate(entries) if i not in failed]
+        # Newest first, so a file converted twice in one batch is reverted in order
+        plan = CompactPlan(PlannedRename)
+        for entry in undoable:
+            plan.append(entry["new_path"], entry["old_path"])
+        restore = [i for i, entry in enumerate(undoable) if entry.get("converter")]
+
+        undo_id = new_batch_id()
+        result = ConversionResult(total=len(entries), dry_run=self.options.dry_run, batch_id=undo_id)
+        result.conflicts = [f"{os.path.basename(entries[i]['new_path'])}: {e}" for i, e in failures]
+        if self.options.dry_run or not plan:
+            result.converted = len(plan) if self.options.dry_run else 0
+            return result
+
+        journal = None
+        if self.journal_dir is not None:
+            first = entries[-1]
+            options = dict(self.options.to_dict(),
+                           root=os.path.commonpath([os.path.dirname(item.old_path) for item in plan]),
+                           source_ext=first.get("new_ext", ""), target_ext=first.get("old_ext", ""),
+                           backup=False, reencode=False, rules=[], undo=batch_id, restore=restore)
+            with self.metrics.phase("journal"):
+                journal = BatchJournal.begin(self.journal_dir, options, rename_pairs(plan), undo_id)
+
+        operation = self._revert_operation({plan[i].old_path for i in restore}, undo_id, batch_id)
+        self._apply(plan, range(len(plan)), result, progress, journal, operation)
+        return result
+
+    def check_undo(self, entry: Dict, force: bool = False):
+        """Raise UndoConflict if the conversion in entry cannot be undone safely"""
+        storage = open_storage(entry["new_path"])
+        try:
+            st = storage.lstat(entry["new_path"])
+        except FileNotFoundError:
+            raise UndoConflict("no longer exists")
+        if not stat.S_ISREG(st.st_mode):
+            raise UndoConflict("is no longer a regular file")
+        if not force and entry.get("size") is not None and (
+                st.st_size != entry["size"] or st.st_mtime_ns != entry.get("mtime_ns")):
+            raise UndoConflict("changed since it was converted")
+        if storage.exists(entry["old_path"]):
+            raise UndoConflict(f"{os.path.basename(entry['old_path'])} already exists")
+        if entry.get("restored"):
+            raise UndoConflict("was restored from a backup; convert it again instead")
+        if entry.get("converter") and not storage.exists(backup_path(entry["old_path"])):
+            raise UndoConflict("re-encoded, and the backup of the original is gone")
+
+    def _revert_operation(self, restore: Set[str], batch_id: str,
+                          undoes: str) -> Callable[[PlannedRename], None]:
+        """The per-file step of an undo: rename back, or restore the backup of
+        files in restore (re-encoded ones), recording each in history"""
+        def revert(item: PlannedRename):
+            storage = open_storage(item.new_path)
+            if storage.exists(item.new_path):
+                raise FileExistsError(f"{os.path.basename(item.new_path)} already exists")
+            restored = item.old_path in restore
+            st = None
+            with self.metrics.timed(OP_RENAME):
+                if restored:
+                    # The converted file has different contents: bring back the backup
+                    storage.rename(backup_path(item.new_path), item.new_path)
+                    storage.delete(item.old_path)
+                else:
+                    st = storage.lstat(item.old_path)
+                    storage.rename(item.old_path, item.new_path)
+            if self.history is not None:
+                if restored or not storage.local:
+                    # A copy, on object stores, has a modification time of its own
+                    st = _stat_quietly(item.new_path)
+                self.history.append(self.undo_entry(item, batch_id, undoes, restored, st))
+        return revert
+
+    def _state_error(self, path: str, state: str) -> str:
+        if state == STATE_CONFLICT:
+            return f"{os.path.basename(path)}: both the original and converted names exist"
+        return f"{os.path.basename(path)}: neither the original nor converted name exists"
+
+    def _apply(self, plan: Sequence[PlannedRename], indices: Sequence[int], result: ConversionResult,
+               progress: Optional[ProgressCallback], journal: Optional[BatchJournal],
+               operation: Optional[Callable[[PlannedRename], None]] = None):
+        """Run an operation over plan[i] for i in indices through the executor"""
+        total = len(plan)
+        backups = None
+        pool = None
+        handles = None
+        if operation is None:
+            backups = BackupManager(self.options.backup_strategy) if self.options.backup else None
+            if self.options.reencode and not self.options.dry_run and indices:
+                pool = make_conversion_pool(min(self.options.jobs, len(indices)),
+                                            self.options.convert_memory_mb)
+            if not self.options.dry_run and self.storage.local:
+                # The executor keeps each directory on one worker, in plan
+                # order, so each is opened once and closed after its last file
+                handles = DirectoryHandles((plan[i].old_path for i in indices), enabled=self.dir_fd)
+
+            def convert(item: PlannedRename):
+                if not self.options.dry_run and not self.storage.local:
+                    self.rename_remote(item, backups, result.batch_id)
+                elif not self.options.dry_run:
+                    with handles.directory(os.path.dirname(item.old_path)) as directory:
+                        self.rename_file(item, backups, result.batch_id, pool, directory)
+                elif self.options.reencode:
+                    # Report files no converter can handle
+                    find_converter(os.path.splitext(item.old_path)[1], os.path.splitext(item.new_path)[1])
+            operation = convert
+
+        metrics = self.metrics
+        lock = threading.Lock()
+        completed = total - len(indices)
+        not_started = 0
+
+        def finish(kind: str, index: int, item: PlannedRename, error: Optional[str] = None):
+            nonlocal completed
+            with lock:
+                completed += 1
+                done = completed
+            if progress is not None:
+                progress(ProgressEvent(kind, index, total, item.old_path, done, error))
+
+        def run_one(position: int, index: int):
+            nonlocal not_started
+            item = plan[index]
+            if self.control is not None and not self.control.checkpoint():
+                with lock:
+                    not_started += 1
+                return
+            if progress is not None:
+                progress(ProgressEvent(EVENT_STARTED, index, total, item.old_path, completed))
+            try:
+                with metrics.timed(OP_FILE):
+                    operation(item)
+            except Exception as e:
+                finish(EVENT_FAILED, index, item, str(e))
+                raise
+            if journal is not None:
+                with metrics.timed(OP_JOURNAL):
+                    journal.mark_done(index)
+            metrics.count("files")
+            finish(EVENT_CONVERTED, index, item)
+
+        try:
+            with metrics.phase("execute"):
+                failures = self.executor.run(indices, run_one,
+                                             key=lambda i: self.storage.ordering_key(plan[i].old_path))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if handles is not None:
+                handles.close()
+            if self.cache is not None and not self.options.dry_run and indices:
+                # Renamed files would otherwise still be listed under their
+                # old names until revalidate_after has passed
+                self.cache.invalidate(os.path.dirname(path) for i in indices
+                                      for path in (plan[i].old_path, plan[i].new_path))
+        failures.sort(key=lambda failure: failure[0])
+        result.errors.extend(
+            f"{os.path.basename(plan[indices[p]].old_path)}: {str(e)}" for p, e in failures
+        )
+        result.converted += len(indices) - len(failures) - not_started
+        result.cancelled = result.cancelled or not_started > 0
+        if backups is not None:
+            result.backups = dict(backups.used)
+
+        history_written = False
+        if self.history is not None and not self.options.dry_run:
+            # Persist the batch's history records with a single fsync
+            try:
+                with metrics.phase("history"):
+                    self.history.flush()
+                history_written = True
+            except OSError as e:
+                result.errors.append(f"History: {str(e)}")
+
+        if journal is not None:
+            if result.cancelled:
+                # Keep the journal so the batch can be resumed
+                if history_written:
+                    journal.mark_recorded()
+                journal.close()
+            else:
+                # History is on disk, so the intents are no longer needed
+                journal.commit()
+
+    def rename_file(self, item: PlannedRename, backups: Optional[BackupManager] = None,
+                    batch_id: Optional[str] = None, pool=None, directory: Optional[Directory] = None):
+        """Back up (if requested) and rename one file, recording history
+
+        With a conversion pool the file is re-encoded into the target
+        format instead of just renamed. directory, if given, is the open
+        directory holding the file: the checks, backup and rename are
+        then made relative to it.
+        """
+        parent, old_name = os.path.split(item.old_path)
+        new_parent, new_name = os.path.split(item.new_path)
+        if new_parent != parent:
+            # Not a rename within one directory: full paths throughout
+            directory, old_name, new_name = PATHS, item.old_path, item.new_path
+        elif directory is None:
+            directory = Directory(parent)
+        if directory.lexists(new_name):
+            # os.rename would silently replace it on POSIX
+            raise FileExistsError(f"{os.path.basename(item.new_path)} already exists")
+        converter = None
+        if pool is not None:
+            # Fail before backing up a file that cannot be converted
+            converter = find_converter(os.path.splitext(item.old_path)[1], os.path.splitext(item.new_path)[1])
+        st = None
+        if self.history is not None or self.metrics.enabled:
+            # Recorded so an undo can tell whether the file changed since
+            st = directory.lstat(old_name)
+            self.metrics.count("bytes", st.st_size)
+        strategy = None
+        if backups is not None:
+            with self.metrics.timed(OP_BACKUP):
+                strategy = backups.backup(item.old_path, directory if directory is not PATHS else None)
+        if converter is not None:
+            with self.metrics.timed(OP_REENCODE):
+                self.reencode_file(item, pool, converter)
+        else:
+            with self.metrics.timed(OP_RENAME):
+                directory.rename(old_name, new_name)
+
+        if self.history is not None:
+            if converter is not None:
+                st = _stat_quietly(item.new_path)
+            self.history.append(self.history_entry(item, strategy, batch_id,
+                                                   converter.name if converter is not None else None, st))
+
+    def rename_remote(self, item: PlannedRename, backups: Optional[BackupManager] = None,
+                      batch_id: Optional[str] = None):
+        """rename_file for a file on a storage backend other than the local one
+
+        Backups are copies made by the backend, recorded as the copy
+        strategy (journal-only backups copy nothing).
+        """
+        storage = self.storage
+        if storage.exists(item.new_path):
+            raise FileExistsError(f"{os.path.basename(item.new_path)} already exists")
+        strategy = None
+        if backups is not None:
+            strategy = BACKUP_JOURNAL if backups.strategy == BACKUP_JOURNAL else BACKUP_COPY
+            if strategy == BACKUP_COPY:
+                with self.metrics.timed(OP_BACKUP):
+                    storage.copy(item.old_path, backup_path(item.old_path))
+            backups.record(strategy)
+        with self.metrics.timed(OP_RENAME):
+            storage.rename(item.old_path, item.new_path)
+
+        st = None
+        if self.history is not None or self.metrics.enabled:
+            # Stat the new object: a rename there is a copy with a new mtime
+            st = storage.lstat(item.new_path)
+            self.metrics.count("bytes", st.st_size)
+        if self.history is not None:
+            self.history.append(self.history_entry(item, strategy, batch_id, st=st))
+
+    def reencode_file(self, item: PlannedRename, pool, converter: Converter):
+        """Convert old_path into new_path on a worker process, then remove old_path
+
+        The result is written to a temporary name first, so new_path only
+        ever holds a complete file.
+        """
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        from concurrent.futures.process import BrokenProcessPool
+        tmp_path = item.new_path + CONVERT_TMP_SUFFIX
+        timeout = self.options.convert_timeout or None
+        while True:
+            future, generation = pool.submit(run_converter, converter, item.old_path, tmp_path, timeout)
+            try:
+                future.result(timeout + TIMEOUT_GRACE if timeout else None)
+                os.replace(tmp_path, item.new_path)
+                break
+            except FutureTimeoutError:
+                # The worker did not stop itself; waiting on it would hang
+                # the batch, so its pool is killed and replaced
+                pool.restart(generation)
+                self._remove_quietly(tmp_path)
+                raise ConversionTimeout(f"conversion took longer than {timeout:g}s")
+            except BrokenProcessPool:
+                self._remove_quietly(tmp_path)
+                if pool.killed(generation):
+                    # Killed for another file's timeout: this one gets a fresh worker
+                    continue
+                # A worker died (crashed or was killed by the system)
+                pool.restart(generation, kill=False)
+                raise
+            except BaseException:
+                self._remove_quietly(tmp_path)
+                raise
+        os.unlink(item.old_path)
+
+    @staticmethod
+    def _remove_quietly(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def history_entry(self, item: PlannedRename, backup: Optional[str] = None,
+                      batch_id: Optional[str] = None, converter: Optional[str] = None,
+                      st: Optional[os.stat_result] = None) -> Dict:
+        """Build the history record for a completed rename
+
+        st is the stat of the file now at new_path, if known.
+        """
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "old_path": item.old_path,
+            "new_path": item.new_path,
+            "old_ext": os.path.splitext(item.old_path)[1],
+            "new_ext": os.path.splitext(item.new_path)[1]
+        }
+        if backup is not None:
+            entry["backup"] = backup
+        if batch_id is not None:
+            entry["batch"] = batch_id
+        if converter is not None:
+            entry["converter"] = converter
+        if st is not None:
+            entry["size"] = st.st_size
+            entry["mtime_ns"] = st.st_mtime_ns
+        return entry
+
+    def undo_entry(self, item: PlannedRename, batch_id: str, undoes: str, restored: bool = False,
+                   st: Optional[os.stat_result] = None) -> Dict:
+        """Build the history record for a reverted conversion"""
+        entry = self.history_entry(item, batch_id=batch_id, st=st)
+        entry["undoes"] = undoes
+        if restored:
+            entry["restored"] = True
+        return entry
+
+    def run(self, progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Validate options, then scan, plan and execute in one call"""
+        self.options.validate()
+        return self.execute(self.plan(), progress)
+
+
+def _reverse_rename(old_path: str, new_path: str) -> PlannedRename:
+    """The rename that takes new_path back to old_path"""
+    return PlannedRename(new_path, old_path)
+
+
+def _stat_quietly(path: str) -> Optional[os.stat_result]:
+    try:
+        return open_storage(path).lstat(path)
+    except OSError:
+        return None
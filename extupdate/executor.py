@@ -0,0 +1,84 @@
+"""
+Executors that run the per-file conversion step of a batch.
+
+An executor calls a task for every item of a plan and reports which
+items failed. Items sharing an ordering key (by default the parent
+directory) are always processed one at a time in plan order; different
+keys may run concurrently.
+"""
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Called with (index, item) for every item; raising marks the item failed
+Task = Callable[[int, T], None]
+
+# Failed items as (index, exception), in no particular order
+Failures = List[Tuple[int, Exception]]
+
+
+def directory_key(path: str) -> str:
+    """Default ordering key: the file's parent directory"""
+    return os.path.dirname(path)
+
+
+class SerialExecutor:
+    """Process every item in order on the calling thread"""
+
+    workers = 1
+
+    def run(self, items: Sequence[T], task: Task, key: Optional[Callable[[T], str]] = None) -> Failures:
+        failures: Failures = []
+        for index, item in enumerate(items):
+            try:
+                task(index, item)
+            except Exception as e:
+                failures.append((index, e))
+        return failures
+
+
+class ThreadPoolBatchExecutor:
+    """Process items on a bounded thread pool, ordered within each key
+
+    Items are grouped by key and each group is handed to one worker, which
+    runs it sequentially in plan order. Groups are submitted largest first
+    so a single huge directory does not end up starting last.
+    """
+
+    def __init__(self, workers: int):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+
+    def run(self, items: Sequence[T], task: Task, key: Optional[Callable[[T], str]] = None) -> Failures:
+        # Without a key every item is independent
+        groups: Dict[object, List[int]] = {}
+        for index, item in enumerate(items):
+            groups.setdefault(key(item) if key else index, []).append(index)
+
+        def run_group(indices: List[int]) -> Failures:
+            failures: Failures = []
+            for index in indices:
+                try:
+                    task(index, items[index])
+                except Exception as e:
+                    failures.append((index, e))
+            return failures
+
+        # Imported here: concurrent.futures pulls in logging, which
+        # serial runs and startup do not need
+        from concurrent.futures import ThreadPoolExecutor
+        failures: Failures = []
+        ordered = sorted(groups.values(), key=len, reverse=True)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extupdate-exec") as pool:
+            for group_failures in pool.map(run_group, ordered):
+                failures.extend(group_failures)
+        return failures
+
+
+def make_executor(jobs: int):
+    """Executor for the requested number of concurrent jobs"""
+    if jobs <= 1:
+        return SerialExecutor()
+    return ThreadPoolBatchExecutor(jobs)
@@ -0,0 +1,1172 @@
+"""
+Tkinter GUI for EXTUPDATE, a thin client over the headless engine.
+"""
+import os
+import queue
+import tkinter as tk
+from tkinter import ttk, messagebox
+from tkinter.font import Font
+import threading
+from typing import Callable, List, Optional
+from datetime import datetime
+
+from .engine import (
+    EXCEL_EXTENSIONS,
+    COMPATIBILITY_WARNINGS,
+    ConversionEngine,
+    ConversionOptions,
+    ConversionResult,
+    ProgressCallback,
+    format_size,
+)
+from .backup import BACKUP_AUTO, BACKUP_STRATEGIES
+from .scanner import FilePlan, ScannedFile, display_name, iter_scan, make_plan
+from .cache import DEFAULT_CACHE_FILE, SESSION_REVALIDATE_AFTER, ScanCache, directory_reader
+from .detect import CHECK_OFF, CHECK_SKIP, DEFAULT_SIGNATURE_FILE, SignatureCache
+from .progress import ProgressChannel
+from .control import BatchControl
+from .metrics import Metrics
+from .journal import DEFAULT_JOURNAL_DIR, STATE_DONE, BatchJournal, pending_journals
+from .history import DEFAULT_HISTORY_FILE, LEGACY_HISTORY_FILES, HistoryQuery, HistoryStore
+from .scheduler import JobScheduler, Manifest
+
+
+class ExtUpdateApp:
+    """Main application class for Excel extension updater"""
+    
+    # Excel file extensions
+    EXCEL_EXTENSIONS = EXCEL_EXTENSIONS
+    
+    # Extension compatibility warnings
+    COMPATIBILITY_WARNINGS = COMPATIBILITY_WARNINGS
+    
+    # How often the main loop checks on a background scan
+    SCAN_POLL_MS = 50
+    
+    # How often batch progress is redrawn (about 10 frames per second)
+    PROGRESS_FRAME_MS = 100
+    
+    # Initial window size; also used to center the window without a layout pass
+    WINDOW_SIZE = (800, 750)
+    
+    # Preview rows inserted per main loop tick, and the most ever shown
+    PREVIEW_CHUNK = 500
+    MAX_PREVIEW_ROWS = 10000
+    
+    # Conversions shown per page of the history window
+    HISTORY_PAGE_SIZE = 100
+    
+    def __init__(self):
+        self.window = tk.Tk()
+        self.window.title("EXTUPDATE - Excel Extension Manager")
+        self.window.geometry("%dx%d" % self.WINDOW_SIZE)
+        self.window.minsize(700, 650)
+
+        try:
+            if os.path.exists("assets/extup.ico"):
+                self.window.iconbitmap("assets/extup.ico")
+        except:
+            pass
+        self.window.protocol("WM_DELETE_WINDOW", self.exit_app)
+        
+        # Variables
+        self.selected_path = tk.StringVar(value="No folder selected...")
+        self.current_ext = tk.StringVar(value=".xls")
+        self.updated_ext = tk.StringVar(value=".xlsx")
+        self.progress_var = tk.DoubleVar()
+        self.status_var = tk.StringVar(value="Ready")
+        self.backup_var = tk.BooleanVar(value=True)
+        self.backup_strategy = tk.StringVar(value=BACKUP_AUTO)
+        self.recursive_var = tk.BooleanVar(value=False)
+        self.check_contents_var = tk.BooleanVar(value=False)
+        self.reencode_var = tk.BooleanVar(value=False)
+        
+        # Result of the last preview scan, reused for conversion
+        self.file_plan = None
+        self.scan_cancel = None
+        self.scan_options = None
+        self.scan_found = 0
+        # Called on the main thread when the running scan completes
+        self.scan_then = None
+        
+        # Cancel/pause switch of the running batch, if any
+        self.batch_control = None
+        self.exit_requested = False
+        # Timings of the running batch, and of the last one for Statistics
+        self.batch_metrics = None
+        self.last_metrics = None
+        
+        # Fonts
+        self.font_title = Font(family="Arial", size=14, weight="bold")
+        self.font_button = Font(family="Arial", size=12, weight="bold")
+        self.font_text = Font(family="Arial", size=10)
+        
+        # History tracking
+        self.history_file = DEFAULT_HISTORY_FILE
+        self.history_store = HistoryStore(self.history_file, legacy_paths=LEGACY_HISTORY_FILES)
+        self.journal_dir = DEFAULT_JOURNAL_DIR
+        
+        # Directory index for instant rescans
+        self.scan_cache = ScanCache(DEFAULT_CACHE_FILE, revalidate_after=SESSION_REVALIDATE_AFTER)
+        # Detected file formats, for content checks
+        self.signatures = SignatureCache(DEFAULT_SIGNATURE_FILE)
+        
+        # Setup UI
+        self.setup_ui()
+        self.update_button_states()
+        
+        # Center window
+        self.center_window()
+        
+        # Recover from a previous crash, once the window is up
+        self.window.after(100, self.check_interrupted_batches)
+        
+    def center_window(self):
+        """Center the window on screen"""
+        width, height = self.WINDOW_SIZE
+        x = (self.window.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.window.winfo_screenheight() // 2) - (height // 2)
+        self.window.geometry(f'{width}x{height}+{x}+{y}')
+        
+    def setup_ui(self):
+        """Setup the user interface"""
+        # Configure grid weights
+        self.window.grid_rowconfigure(1, weight=1)
+        self.window.grid_columnconfigure(0, weight=1)
+        
+        # Create menu
+        self.create_menu()
+        
+        # Header frame
+        header_frame = ttk.Frame(self.window, padding="10")
+        header_frame.grid(row=0, column=0, sticky="ew")
+        
+        # Logo/Title
+        title_label = ttk.Label(
+            header_frame, 
+            text="EXTUPDATE", 
+            font=Font(family="Arial", size=20, weight="bold")
+        )
+        title_label.pack()
+        
+        subtitle_label = ttk.Label(
+            header_frame,
+            text="Excel Extension Manager",
+            font=self.font_text
+        )
+        subtitle_label.pack()
+        
+        # Main content frame
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.grid(row=1, column=0, sticky="nsew")
+        main_frame.grid_columnconfigure(1, weight=1)
+        
+        # Folder selection
+        folder_frame = ttk.LabelFrame(main_frame, text="Folder Selection", padding="10")
+        folder_frame.grid(row=0, column=0, columnspan=3, sticky="ew", pady=(0, 10))
+        folder_frame.grid_columnconfigure(1, weight=1)
+        
+        ttk.Button(
+            folder_frame,
+            text="Select Folder",
+            command=self.select_folder
+        ).grid(row=0, column=0, padx=(0, 10))
+        
+        ttk.Entry(
+            folder_frame,
+            textvariable=self.selected_path,
+            state="readonly",
+            font=self.font_text
+        ).grid(row=0, column=1, sticky="ew")
+        
+        # Options frame
+        options_frame = ttk.LabelFrame(main_frame, text="Options", padding="10")
+        options_frame.grid(row=1, column=0, columnspan=3, sticky="ew", pady=(0, 10))
+        
+        ttk.Checkbutton(
+            options_frame,
+            text="Create backup before conversion",
+            variable=self.backup_var
+        ).grid(row=0, column=0, sticky="w", padx=(0, 20))
+        
+        ttk.Checkbutton(
+            options_frame,
+            text="Include subfolders (recursive)",
+            variable=self.recursive_var
+        ).grid(row=0, column=1, sticky="w", padx=(0, 20))
+        
+        ttk.Label(options_frame, text="Backup method:").grid(row=0, column=2, sticky="e", padx=(0, 5))
+        ttk.Combobox(
+            options_frame,
+            textvariable=self.backup_strategy,
+            values=BACKUP_STRATEGIES,
+            state="readonly",
+            width=12
+        ).grid(row=0, column=3, sticky="w")
+        
+        ttk.Checkbutton(
+            options_frame,
+            text="Skip files whose contents do not match the target format",
+            variable=self.check_contents_var
+        ).grid(row=1, column=0, columnspan=4, sticky="w", pady=(5, 0))
+        
+        ttk.Checkbutton(
+            options_frame,
+            text="Convert file contents to the target format (not just the extension)",
+            variable=self.reencode_var
+        ).grid(row=2, column=0, columnspan=4, sticky="w", pady=(5, 0))
+        
+        # Extension selection frame
+        ext_frame = ttk.LabelFrame(main_frame, text="Extension Conversion", padding="10")
+        ext_frame.grid(row=2, column=0, columnspan=3, sticky="ew", pady=(0, 10))
+        ext_frame.grid_columnconfigure(1, weight=1)
+        ext_frame.grid_columnconfigure(3, weight=1)
+        
+        ttk.Label(ext_frame, text="Current Extension:").grid(row=0, column=0, sticky="e", padx=(0, 5))
+        current_combo = ttk.Combobox(
+            ext_frame,
+            textvariable=self.current_ext,
+            values=self.EXCEL_EXTENSIONS,
+            state="readonly",
+            width=15
+        )
+        current_combo.grid(row=0, column=1, sticky="w", padx=(0, 20))
+        current_combo.bind("<<ComboboxSelected>>", self.on_extension_change)
+        
+        ttk.Label(ext_frame, text="Convert to:").grid(row=0, column=2, sticky="e", padx=(0, 5))
+        updated_combo = ttk.Combobox(
+            ext_frame,
+            textvariable=self.updated_ext,
+            values=self.EXCEL_EXTENSIONS,
+            state="readonly",
+            width=15
+        )
+        updated_combo.grid(row=0, column=3, sticky="w")
+        updated_combo.bind("<<ComboboxSelected>>", self.on_extension_change)
+        
+        # Compatibility info
+        self.compat_label = ttk.Label(
+            ext_frame,
+            text="",
+            font=Font(family="Arial", size=9, slant="italic"),
+            foreground="gray"
+        )
+        self.compat_label.grid(row=1, column=0, columnspan=4, pady=(5, 0))
+        self.update_compatibility_info()
+        
+        # File preview frame
+        preview_frame = ttk.LabelFrame(main_frame, text="Files to be converted", padding="10")
+        preview_frame.grid(row=3, column=0, columnspan=3, sticky="nsew", pady=(0, 10))
+        preview_frame.grid_rowconfigure(0, weight=1)
+        preview_frame.grid_columnconfigure(0, weight=1)
+        
+        # Treeview for file list
+        tree_scroll = ttk.Scrollbar(preview_frame)
+        tree_scroll.grid(row=0, column=1, sticky="ns")
+        
+        self.file_tree = ttk.Treeview(
+            preview_frame,
+            yscrollcommand=tree_scroll.set,
+            columns=("size", "modified"),
+            height=8
+        )
+        self.file_tree.grid(row=0, column=0, sticky="nsew")
+        tree_scroll.config(command=self.file_tree.yview)
+        
+        # Configure treeview columns
+        self.file_tree.heading("#0", text="File Name")
+        self.file_tree.heading("size", text="Size")
+        self.file_tree.heading("modified", text="Modified")
+        self.file_tree.column("#0", width=400)
+        self.file_tree.column("size", width=100)
+        self.file_tree.column("modified", width=150)
+        
+        self.stop_scan_btn = ttk.Button(
+            preview_frame,
+            text="Stop Scan",
+            command=self.stop_scan,
+            state="disabled"
+        )
+        self.stop_scan_btn.grid(row=1, column=0, columnspan=2, sticky="e", pady=(5, 0))
+        
+        # Progress bar
+        self.progress_bar = ttk.Progressbar(
+            main_frame,
+            variable=self.progress_var,
+            mode='determinate'
+        )
+        self.progress_bar.grid(row=4, column=0, columnspan=3, sticky="ew", pady=(0, 10))
+        
+        # Button frame with better visibility
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=5, column=0, columnspan=3, sticky="ew", pady=(10, 0))
+        
+        # Create a frame to center the buttons
+        button_container = ttk.Frame(button_frame)
+        button_container.pack(expand=True)
+        
+        # Style for buttons to make them more visible
+        style = ttk.Style()
+        style.configure('Action.TButton', font=self.font_button, padding=(20, 10))
+        
+        self.update_btn = ttk.Button(
+            button_container,
+            text="Update Extensions",
+            command=self.update_extensions,
+            state="disabled",
+            style='Action.TButton'
+        )
+        self.update_btn.pack(side="left", padx=5)
+        
+        self.clear_btn = ttk.Button(
+            button_container,
+            text="Clear All",
+            command=self.clear_all,
+            state="disabled",
+            style='Action.TButton'
+        )
+        self.clear_btn.pack(side="left", padx=5)
+        
+        self.pause_btn = ttk.Button(
+            button_container,
+            text="Pause",
+            command=self.toggle_pause,
+            state="disabled",
+            style='Action.TButton'
+        )
+        self.pause_btn.pack(side="left", padx=5)
+        
+        self.cancel_btn = ttk.Button(
+            button_container,
+            text="Cancel",
+            command=self.cancel_batch,
+            state="disabled",
+            style='Action.TButton'
+        )
+        self.cancel_btn.pack(side="left", padx=5)
+        
+        ttk.Button(
+            button_container,
+            text="Exit",
+            command=self.exit_app,
+            style='Action.TButton'
+        ).pack(side="left", padx=5)
+        
+        # Add instruction label
+        instruction_label = ttk.Label(
+            main_frame,
+            text="Select a folder to enable the Update Extensions button",
+            font=Font(family="Arial", size=9, slant="italic"),
+            foreground="gray"
+        )
+        instruction_label.grid(row=6, column=0, columnspan=3, pady=(5, 0))
+        
+        # Status bar
+        status_frame = ttk.Frame(self.window)
+        status_frame.grid(row=2, column=0, sticky="ew")
+        
+        ttk.Label(
+            status_frame,
+            textvariable=self.status_var,
+            font=self.font_text
+        ).pack(side="left", padx=10)
+        
+    def create_menu(self):
+        """Create application menu"""
+        menubar = tk.Menu(self.window)
+        self.window.config(menu=menubar)
+        
+        # File menu
+        file_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="File", menu=file_menu)
+        file_menu.add_command(label="Select Folder", command=self.select_folder)
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=self.exit_app)
+        
+        # Tools menu
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
+        tools_menu.add_command(label="View History", command=self.show_history)
+        tools_menu.add_command(label="Statistics", command=self.show_statistics)
+        tools_menu.add_command(label="Clear History", command=self.clear_history)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Resume Interrupted Batch...", command=self.resume_interrupted)
+        tools_menu.add_command(label="Run Job Manifest...", command=self.run_manifest)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Rescan Without Cache", command=self.rescan_uncached)
+        tools_menu.add_command(label="Clear Scan Cache", command=self.clear_scan_cache)
+        
+        # Help menu
+        help_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Help", menu=help_menu)
+        help_menu.add_command(label="Usage", command=self.show_usage)
+        help_menu.add_command(label="About", command=self.show_about)
+        
+    def select_folder(self):
+        """Handle folder selection"""
+        from tkinter import filedialog
+        folder = filedialog.askdirectory()
+        if folder:
+            self.selected_path.set(folder)
+            self.update_button_states()
+            self.scan_files()
+            
+    def scan_files(self, use_cache: bool = True, then: Optional[Callable[[], None]] = None):
+        """Scan selected folder for Excel files in the background
+        
+        The scan streams batches of files through a queue; the main loop
+        drains it every SCAN_POLL_MS and inserts at most PREVIEW_CHUNK
+        rows per tick, so the window stays responsive. Only the first
+        MAX_PREVIEW_ROWS files are shown; all of them are converted.
+        then, if given, is called once the scan completes (not if it is
+        stopped or fails).
+        """
+        self.cancel_scan()
+        self.file_tree.delete(*self.file_tree.get_children())
+        self.file_plan = None
+        
+        if not os.path.exists(self.selected_path.get()):
+            return
+            
+        options = self.conversion_options()
+        cancel = threading.Event()
+        batches = queue.Queue()
+        cache = self.scan_cache if use_cache else None
+        
+        def worker():
+            files = []
+            batch = []
+            try:
+                reader = directory_reader(cache)
+                for scanned in iter_scan(options.root, options.source_ext, options.recursive,
+                                         options.scan_workers, cancel, reader):
+                    files.append(scanned)
+                    batch.append(scanned)
+                    if len(batch) >= self.PREVIEW_CHUNK:
+                        batches.put(batch)
+                        batch = []
+            except OSError as e:
+                batches.put(e)
+                return
+            if batch:
+                batches.put(batch)
+            if not cancel.is_set():
+                batches.put(make_plan(options.root, options.source_ext, options.recursive, files))
+            if cache is not None:
+                try:
+                    cache.save()
+                except OSError:
+                    pass
+                
+        self.scan_cancel = cancel
+        self.scan_options = options
+        self.scan_found = 0
+        self.scan_then = then
+        self.stop_scan_btn.config(state="normal")
+        self.status_var.set(f"Scanning for {options.source_ext} files...")
+        threading.Thread(target=worker, daemon=True).start()
+        self.window.after(self.SCAN_POLL_MS, self.poll_scan, cancel, batches)
+        
+    def poll_scan(self, cancel: threading.Event, batches: "queue.Queue"):
+        """Move scanned files from the background scan into the preview"""
+        if cancel.is_set():
+            return
+            
+        inserted = 0
+        while inserted < self.PREVIEW_CHUNK:
+            try:
+                item = batches.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, FilePlan):
+                self.finish_scan(item)
+                return
+            if isinstance(item, OSError):
+                self.cancel_scan()
+                self.status_var.set(f"Scan failed: {item}")
+                return
+            for scanned in item:
+                if self.scan_found < self.MAX_PREVIEW_ROWS:
+                    self.add_file_to_tree(scanned)
+                self.scan_found += 1
+            inserted += len(item)
+            
+        self.status_var.set(f"Scanning... {self.scan_found} {self.scan_options.source_ext} files found")
+        self.window.after(self.SCAN_POLL_MS, self.poll_scan, cancel, batches)
+        
+    def finish_scan(self, plan: FilePlan):
+        """Keep the completed scan for conversion and report the total"""
+        then = self.scan_then
+        self.cancel_scan()
+        self.file_plan = plan
+        files_found = len(plan)
+        
+        status = f"Found {files_found} {plan.ext} files"
+        if files_found > self.MAX_PREVIEW_ROWS:
+            status += f" (showing first {self.MAX_PREVIEW_ROWS})"
+        self.status_var.set(status)
+        if then is not None:
+            then()
+        
+    def cancel_scan(self):
+        """Stop a background scan that is still running"""
+        if self.scan_cancel is not None:
+            self.scan_cancel.set()
+            self.scan_cancel = None
+        self.scan_then = None
+        self.stop_scan_btn.config(state="disabled")
+            
+    def stop_scan(self):
+        """Handle the Stop Scan button"""
+        if self.scan_cancel is None:
+            return
+        self.cancel_scan()
+        self.status_var.set(f"Scan stopped after {self.scan_found} files")
+        
+    def rescan_uncached(self):
+        """Rescan the selected folder reading every directory"""
+        if self.selected_path.get() != "No folder selected...":
+            self.scan_files(use_cache=False)
+            
+    def clear_scan_cache(self):
+        """Forget all cached directory listings"""
+        self.scan_cache.clear()
+        messagebox.showinfo("Scan Cache Cleared", "The directory scan cache has been cleared.")
+        
+    def add_file_to_tree(self, scanned: ScannedFile):
+        """Add file to treeview"""
+        size = self.format_size(scanned.size)
+        modified = datetime.fromtimestamp(scanned.mtime).strftime("%Y-%m-%d %H:%M")
+        
+        # Get relative path if recursive
+        display = display_name(scanned.path, self.scan_options.root, self.scan_options.recursive)
+            
+        self.file_tree.insert("", "end", text=display, values=(size, modified))
+        
+    def format_size(self, size: int) -> str:
+        """Format file size in human readable format"""
+        return format_size(size)
+        
+    def update_extensions(self):
+        """Update file extensions with threading"""
+        if self.current_ext.get() == self.updated_ext.get():
+            messagebox.showwarning("Invalid Selection", "Current and target extensions must be different!")
+            return
+            
+        if self.scan_cancel is not None:
+            messagebox.showinfo("Scanning", "Still scanning the selected folder, please try again in a moment.")
+            return
+            
+        # Snapshot the selections once; the worker never touches Tk variables
+        options = self.conversion_options()
+        try:
+            options.validate()
+        except ValueError as e:
+            messagebox.showwarning("Invalid Selection", str(e))
+            return
+            
+        files = self.get_files_to_convert(options)
+        if files is None:
+            # Scan in the background first; it comes back here when done
+            self.scan_files(then=self.update_extensions)
+            return
+        if not files:
+            messagebox.showwarning("No Files", f"No {self.current_ext.get()} files found in the selected directory!")
+            return
+            
+        # Confirm action
+        msg = f"Convert {len(files)} files from {self.current_ext.get()} to {self.updated_ext.get()}?"
+        if options.reencode:
+            msg += "\n\nFile contents will be converted to the new format."
+        if self.backup_var.get():
+            msg += "\n\nBackups will be created."
+            
+        if not messagebox.askyesno("Confirm Conversion", msg):
+            return
+            
+        self.start_batch(lambda progress: self.convert_files(files, options, progress))
+        
+    def conversion_options(self) -> ConversionOptions:
+        """Build engine options from the current UI selections"""
+        return ConversionOptions(
+            root=self.selected_path.get(),
+            source_ext=self.current_ext.get(),
+            target_ext=self.updated_ext.get(),
+            recursive=self.recursive_var.get(),
+            backup=self.backup_var.get(),
+            backup_strategy=self.backup_strategy.get(),
+            content_check=CHECK_SKIP if self.check_contents_var.get() else CHECK_OFF,
+            reencode=self.reencode_var.get(),
+            jobs=(os.cpu_count() or 1) if self.reencode_var.get() else 1
+        )
+        
+    def get_files_to_convert(self, options: ConversionOptions) -> Optional[FilePlan]:
+        """The preview scan if it is current for options, else None (a scan is needed)"""
+        if self.file_plan is not None and self.file_plan.matches(
+                options.root, options.source_ext, options.recursive):
+            return self.file_plan
+        return None
+        
+    def start_batch(self, run: Callable[[ProgressCallback], ConversionResult]):
+        """Run a batch on a worker thread, showing its progress from the main loop"""
+        self.update_btn.config(state="disabled")
+        self.clear_btn.config(state="disabled")
+        self.batch_control = BatchControl()
+        self.batch_metrics = Metrics()
+        self.pause_btn.config(state="normal", text="Pause")
+        self.cancel_btn.config(state="normal")
+        
+        channel = ProgressChannel()
+        
+        def worker():
+            try:
+                result = run(channel)
+            except Exception as e:
+                result = ConversionResult(errors=[str(e)])
+            channel.finish(result)
+            
+        threading.Thread(target=worker, daemon=True).start()
+        self.window.after(self.PROGRESS_FRAME_MS, self.poll_progress, channel)
+        
+    def poll_progress(self, channel: ProgressChannel):
+        """Apply the latest batch progress to the UI, once per frame"""
+        snapshot = channel.poll()
+        if snapshot is not None:
+            if snapshot.result is not None:
+                result = snapshot.result
+                self.end_batch()
+                if self.exit_requested:
+                    self.window.quit()
+                    return
+                self.show_conversion_results(result.converted, result.conflicts + result.errors, result.total,
+                                             result.backup_summary(), result.skipped,
+                                             result.cancelled)
+                return
+            self.progress_var.set(snapshot.percent)
+            if self.batch_control.paused:
+                self.status_var.set(f"Paused ({snapshot.completed}/{snapshot.total})")
+            elif snapshot.current_path:
+                self.status_var.set(f"Converting: {os.path.basename(snapshot.current_path)} "
+                                    f"({snapshot.completed}/{snapshot.total})")
+        self.window.after(self.PROGRESS_FRAME_MS, self.poll_progress, channel)
+        
+    def end_batch(self):
+        """Disable the batch controls once a batch has stopped"""
+        self.batch_control = None
+        self.last_metrics, self.batch_metrics = self.batch_metrics, None
+        self.pause_btn.config(state="disabled", text="Pause")
+        self.cancel_btn.config(state="disabled")
+        
+    def toggle_pause(self):
+        """Pause the running batch before its next file, or let it continue"""
+        if self.batch_control is None:
+            return
+        if self.batch_control.toggle_pause():
+            self.pause_btn.config(text="Resume")
+            self.status_var.set("Paused")
+        else:
+            self.pause_btn.config(text="Pause")
+            self.status_var.set("Resuming...")
+            
+    def cancel_batch(self):
+        """Stop the running batch after the file in progress"""
+        if self.batch_control is None:
+            return
+        self.batch_control.cancel()
+        self.pause_btn.config(state="disabled", text="Pause")
+        self.cancel_btn.config(state="disabled")
+        self.status_var.set("Cancelling after the current file...")
+        
+    def exit_app(self):
+        """Quit, first stopping a running batch cleanly so it can be resumed"""
+        if self.batch_control is None:
+            self.window.quit()
+            return
+        if not messagebox.askyesno("Conversion Running",
+                                   "A conversion is still running. Stop it after the current file and exit?\n\n"
+                                   "The remaining files can be converted later with Tools > Resume Interrupted Batch."):
+            return
+        self.exit_requested = True
+        self.cancel_batch()
+        
+    def convert_files(self, files: FilePlan, options: ConversionOptions,
+                      progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Convert files (called on the worker thread)"""
+        engine = ConversionEngine(options, self.history_store, journal_dir=self.journal_dir,
+                                  cache=self.scan_cache, signatures=self.signatures,
+                                  control=self.batch_control, metrics=self.batch_metrics)
+        return engine.execute(engine.plan(files), progress)
+        
+    def check_interrupted_batches(self) -> bool:
+        """Offer to resume or roll back a batch left unfinished by a crash or cancel"""
+        journals = pending_journals(self.journal_dir)
+        if not journals:
+            return False
+        journal = journals[-1]
+        summary = journal.summary()
+        done = summary["states"].get(STATE_DONE, 0)
+        msg = (f"A conversion of {summary['total']} files ({summary['conversion']}) "
+               f"in {summary['root']} was interrupted after {done} files.\n\n"
+               f"Yes: finish the conversion\nNo: undo the converted files\nCancel: decide later")
+        answer = messagebox.askyesnocancel("Interrupted Conversion", msg)
+        if answer is None:
+            return True
+            
+        self.start_batch(lambda progress: self.recover_batch(journal, not answer, progress))
+        return True
+        
+    def resume_interrupted(self):
+        """Offer to finish or undo an interrupted or cancelled batch"""
+        if self.batch_control is not None:
+            messagebox.showinfo("Conversion Running", "Wait for the running conversion to finish first.")
+            return
+        if not self.check_interrupted_batches():
+            messagebox.showinfo("Resume Interrupted Batch", "There are no interrupted conversions.")
+        
+    def run_manifest(self):
+        """Run the jobs of a manifest file, several at a time, as one batch"""
+        if self.batch_control is not None:
+            messagebox.showinfo("Conversion Running", "Wait for the running conversion to finish first.")
+            return
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(
+            title="Run Job Manifest",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            manifest = Manifest.load(path)
+            manifest.validate()
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Run Job Manifest", f"Cannot use {os.path.basename(path)}:\n{e}")
+            return
+        self.status_var.set(f"Running {len(manifest.jobs)} jobs from {os.path.basename(path)}...")
+        self.start_batch(lambda progress: self.run_jobs(manifest, progress))
+        
+    def run_jobs(self, manifest: Manifest, progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Run a manifest's jobs (called on the worker thread); returns their combined result"""
+        scheduler = JobScheduler(manifest, self.history_store, journal_dir=self.journal_dir,
+                                 cache=self.scan_cache, signatures=self.signatures,
+                                 control=self.batch_control, metrics=self.batch_metrics)
+        return scheduler.run(progress).summary()
+        
+    def recover_batch(self, journal: BatchJournal, rollback: bool,
+                      progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Resume or roll back an interrupted batch (called on the worker thread)"""
+        engine = ConversionEngine.for_journal(journal, self.history_store, control=self.batch_control,
+                                              metrics=self.batch_metrics, cache=self.scan_cache)
+        if rollback:
+            return engine.rollback(journal, progress)
+        return engine.resume(journal, progress)
+        
+    def undo_batch(self, batch_id: str, progress: Optional[ProgressCallback] = None) -> ConversionResult:
+        """Revert a past batch from its history records (called on the worker thread)"""
+        options = ConversionOptions(root=os.getcwd(), backup=False)
+        engine = ConversionEngine(options, self.history_store, journal_dir=self.journal_dir,
+                                  cache=self.scan_cache, control=self.batch_control,
+                                  metrics=self.batch_metrics)
+        return engine.undo(batch_id, progress)
+        
+    def show_conversion_results(self, converted: int, errors: List[str], total: int, backups: str = "",
+                                skipped: Optional[List[str]] = None, cancelled: bool = False):
+        """Show conversion results"""
+        self.progress_var.set(0)
+        if cancelled:
+            self.status_var.set(f"Conversion cancelled: {converted}/{total} files")
+        else:
+            self.status_var.set(f"Conversion complete: {converted}/{total} files")
+        backup_msg = f"\n\nBackups: {backups}" if backups else ""
+        if cancelled:
+            backup_msg += ("\n\nThe conversion was cancelled. Use Tools > Resume Interrupted Batch "
+                           "to convert the remaining files or undo this batch.")
+        if skipped:
+            backup_msg += f"\n\nSkipped {len(skipped)} files whose contents did not match:\n"
+            backup_msg += "\n".join(skipped[:10])
+            if len(skipped) > 10:
+                backup_msg += f"\n... and {len(skipped) - 10} more"
+        
+        if errors:
+            error_msg = f"Successfully converted {converted} files.{backup_msg}\n\nErrors occurred with {len(errors)} files:\n"
+            error_msg += "\n".join(errors[:10])  # Show first 10 errors
+            if len(errors) > 10:
+                error_msg += f"\n... and {len(errors) - 10} more"
+            messagebox.showwarning("Conversion Complete with Errors", error_msg)
+        else:
+            messagebox.showinfo("Success", f"Successfully converted {converted} files!{backup_msg}")
+            
+        # Refresh file list, re-enable buttons
+        self.update_button_states()
+        self.scan_files()
+        
+    def clear_all(self):
+        """Clear all selections"""
+        self.cancel_scan()
+        self.selected_path.set("No folder selected...")
+        self.file_tree.delete(*self.file_tree.get_children())
+        self.file_plan = None
+        self.status_var.set("Ready")
+        self.update_button_states()
+        
+    def update_button_states(self):
+        """Update button states based on current selections"""
+        folder_selected = self.selected_path.get() != "No folder selected..."
+        
+        if folder_selected:
+            self.update_btn.config(state="normal")
+            self.clear_btn.config(state="normal")
+            # Update instruction label if it exists
+            for widget in self.window.winfo_children():
+                if isinstance(widget, ttk.Frame):
+                    for child in widget.winfo_children():
+                        if isinstance(child, ttk.Label) and "Select a folder" in child.cget("text"):
+                            child.config(text="Ready to convert files", foreground="green")
+        else:
+            self.update_btn.config(state="disabled")
+            self.clear_btn.config(state="disabled")
+        
+    def on_extension_change(self, event=None):
+        """Handle extension change"""
+        self.update_compatibility_info()
+        if self.selected_path.get() != "No folder selected...":
+            self.scan_files()
+            
+    def update_compatibility_info(self):
+        """Update compatibility information label"""
+        target_ext = self.updated_ext.get()
+        info = self.COMPATIBILITY_WARNINGS.get(target_ext, "")
+        self.compat_label.config(text=info)
+        
+    def show_history(self):
+        """Show conversion history window, searchable and paged"""
+        history_window = tk.Toplevel(self.window)
+        history_window.title("Conversion History")
+        history_window.geometry("760x480")
+        
+        # Filters
+        filter_frame = ttk.Frame(history_window, padding=(10, 10, 10, 0))
+        filter_frame.pack(fill="x")
+        
+        text_var = tk.StringVar()
+        since_var = tk.StringVar()
+        until_var = tk.StringVar()
+        batch_var = tk.StringVar()
+        old_ext_var = tk.StringVar(value="Any")
+        new_ext_var = tk.StringVar(value="Any")
+        try:
+            old_exts, new_exts = self.history_store.extensions()
+        except OSError:
+            old_exts, new_exts = [], []
+        
+        ttk.Label(filter_frame, text="Path contains:").grid(row=0, column=0, sticky="e", padx=(0, 5))
+        text_entry = ttk.Entry(filter_frame, textvariable=text_var, width=30)
+        text_entry.grid(row=0, column=1, columnspan=3, sticky="ew")
+        ttk.Label(filter_frame, text="From:").grid(row=0, column=4, sticky="e", padx=(10, 5))
+        ttk.Combobox(filter_frame, textvariable=old_ext_var, values=["Any"] + old_exts,
+                     state="readonly", width=8).grid(row=0, column=5, sticky="w")
+        ttk.Label(filter_frame, text="To:").grid(row=0, column=6, sticky="e", padx=(10, 5))
+        ttk.Combobox(filter_frame, textvariable=new_ext_var, values=["Any"] + new_exts,
+                     state="readonly", width=8).grid(row=0, column=7, sticky="w")
+        
+        ttk.Label(filter_frame, text="Date from:").grid(row=1, column=0, sticky="e", padx=(0, 5), pady=(5, 0))
+        ttk.Entry(filter_frame, textvariable=since_var, width=12).grid(row=1, column=1, sticky="w", pady=(5, 0))
+        ttk.Label(filter_frame, text="to:").grid(row=1, column=2, sticky="e", padx=(5, 5), pady=(5, 0))
+        ttk.Entry(filter_frame, textvariable=until_var, width=12).grid(row=1, column=3, sticky="w", pady=(5, 0))
+        ttk.Label(filter_frame, text="(YYYY-MM-DD)", foreground="gray").grid(row=1, column=4, columnspan=2,
+                                                                        sticky="w", padx=(10, 0), pady=(5, 0))
+        ttk.Label(filter_frame, text="Batch:").grid(row=2, column=0, sticky="e", padx=(0, 5), pady=(5, 0))
+        ttk.Entry(filter_frame, textvariable=batch_var, width=30).grid(row=2, column=1, columnspan=3,
+                                                                       sticky="ew", pady=(5, 0))
+        filter_frame.grid_columnconfigure(1, weight=1)
+        
+        # Create treeview
+        tree_frame = ttk.Frame(history_window, padding="10")
+        tree_frame.pack(fill="both", expand=True)
+        
+        tree_scroll = ttk.Scrollbar(tree_frame)
+        tree_scroll.pack(side="right", fill="y")
+        
+        history_tree = ttk.Treeview(
+            tree_frame,
+            yscrollcommand=tree_scroll.set,
+            columns=("old", "new", "folder", "time"),
+            height=15
+        )
+        history_tree.pack(fill="both", expand=True)
+        tree_scroll.config(command=history_tree.yview)
+        
+        # Configure columns
+        history_tree.heading("#0", text="ID")
+        history_tree.heading("old", text="Original")
+        history_tree.heading("new", text="Converted")
+        history_tree.heading("folder", text="Folder")
+        history_tree.heading("time", text="Date/Time")
+        
+        history_tree.column("#0", width=60)
+        history_tree.column("old", width=170)
+        history_tree.column("new", width=170)
+        history_tree.column("folder", width=200)
+        history_tree.column("time", width=130)
+        
+        # Paging
+        nav_frame = ttk.Frame(history_window, padding=(10, 0, 10, 10))
+        nav_frame.pack(fill="x")
+        page_label = ttk.Label(nav_frame, text="", font=self.font_text)
+        page_label.pack(side="left")
+        
+        # Each page is fetched when shown; starts holds the before_id of
+        # every page up to the current one (None for the newest)
+        state = {"query": HistoryQuery(), "starts": [None], "page": [], "total": 0}
+        
+        def current_query() -> HistoryQuery:
+            return HistoryQuery(
+                text=text_var.get().strip(),
+                since=since_var.get().strip(),
+                until=until_var.get().strip(),
+                old_ext="" if old_ext_var.get() == "Any" else old_ext_var.get(),
+                new_ext="" if new_ext_var.get() == "Any" else new_ext_var.get(),
+                batch=batch_var.get().strip()
+            )
+            
+        def show_page():
+            try:
+                page = self.history_store.search(state["query"], self.HISTORY_PAGE_SIZE, state["starts"][-1])
+            except OSError as e:
+                messagebox.showerror("History", f"Could not read the history: {e}", parent=history_window)
+                return
+            state["page"] = page
+            history_tree.delete(*history_tree.get_children())
+            for position, entry in enumerate(page):
+                try:
+                    timestamp = datetime.fromisoformat(entry["timestamp"]).strftime("%Y-%m-%d %H:%M")
+                except ValueError:
+                    timestamp = entry["timestamp"]
+                history_tree.insert(
+                    "", "end",
+                    iid=str(position),
+                    text=str(entry["id"]),
+                    values=(
+                        os.path.basename(entry["old_path"]),
+                        os.path.basename(entry["new_path"]),
+                        os.path.dirname(entry["old_path"]),
+                        timestamp
+                    )
+                )
+            first = (len(state["starts"]) - 1) * self.HISTORY_PAGE_SIZE
+            if page:
+                page_label.config(text=f"Showing {first + 1}-{first + len(page)} of {state['total']}")
+            else:
+                page_label.config(text="No matching conversions")
+            newer_btn.config(state="normal" if len(state["starts"]) > 1 else "disabled")
+            older_btn.config(state="normal" if first + len(page) < state["total"] else "disabled")
+            
+        def search(event=None):
+            query = current_query()
+            try:
+                query.validate()
+                total = self.history_store.count(query)
+            except (ValueError, OSError) as e:
+                messagebox.showwarning("History", str(e), parent=history_window)
+                return
+            state.update(query=query, starts=[None], total=total)
+            show_page()
+            
+        def older():
+            if state["page"]:
+                state["starts"].append(state["page"][-1]["id"])
+                show_page()
+                
+        def newer():
+            if len(state["starts"]) > 1:
+                state["starts"].pop()
+                show_page()
+                
+        def export():
+            path = self.ask_save_csv(history_window)
+            if not path:
+                return
+            try:
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    written = self.history_store.export_csv(f, state["query"])
+            except OSError as e:
+                messagebox.showerror("Export Failed", str(e), parent=history_window)
+                return
+            messagebox.showinfo("Export Complete", f"Exported {written} conversions to {path}",
+                                parent=history_window)
+            
+        def selected_batch() -> Optional[str]:
+            selection = history_tree.selection()
+            if not selection:
+                messagebox.showinfo("History", "Select a conversion first.", parent=history_window)
+                return None
+            batch_id = state["page"][int(selection[0])].get("batch")
+            if not batch_id:
+                messagebox.showinfo("History", "This conversion is not part of a recorded batch.",
+                                    parent=history_window)
+            return batch_id
+            
+        def show_batch():
+            batch_id = selected_batch()
+            if batch_id:
+                batch_var.set(batch_id)
+                search()
+                
+        def undo_batch():
+            batch_id = selected_batch()
+            if not batch_id:
+                return
+            if self.batch_control is not None:
+                messagebox.showinfo("Conversion Running", "Wait for the running conversion to finish first.",
+                                    parent=history_window)
+                return
+            try:
+                files = self.history_store.count(HistoryQuery(batch=batch_id))
+            except OSError as e:
+                messagebox.showerror("History", str(e), parent=history_window)
+                return
+            if not messagebox.askyesno(
+                    "Undo Batch",
+                    f"Revert the {files} conversions of batch {batch_id}?\n\n"
+                    f"Files that were changed, moved or replaced since are left alone and listed.",
+                    parent=history_window):
+                return
+            history_window.destroy()
+            self.start_batch(lambda progress: self.undo_batch(batch_id, progress))
+            
+        ttk.Button(nav_frame, text="Undo Batch...", command=undo_batch).pack(side="left", padx=(10, 0))
+        ttk.Button(nav_frame, text="Show Batch", command=show_batch).pack(side="left", padx=(10, 0))
+        ttk.Button(nav_frame, text="Export CSV...", command=export).pack(side="right")
+        older_btn = ttk.Button(nav_frame, text="Older >", command=older)
+        older_btn.pack(side="right", padx=5)
+        newer_btn = ttk.Button(nav_frame, text="< Newer", command=newer)
+        newer_btn.pack(side="right")
+        ttk.Button(filter_frame, text="Search", command=search).grid(row=2, column=7, sticky="e", pady=(5, 0))
+        history_window.bind("<Return>", search)
+        
+        text_entry.focus_set()
+        search()
+        
+    def ask_save_csv(self, parent) -> str:
+        """Ask where to save a CSV export"""
+        from tkinter import filedialog
+        return filedialog.asksaveasfilename(
+            parent=parent,
+            title="Export History",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            initialfile="extupdate_history.csv"
+        )
+        
+    def show_statistics(self):
+        """Show phase timings and operation latencies of the last batch"""
+        if self.last_metrics is None:
+            messagebox.showinfo("Statistics", "No conversion has run yet in this session.")
+            return
+        stats = self.last_metrics.to_dict()
+        
+        stats_window = tk.Toplevel(self.window)
+        stats_window.title("Statistics - Last Conversion")
+        stats_window.geometry("600x400")
+        
+        frame = ttk.Frame(stats_window, padding="10")
+        frame.pack(fill="both", expand=True)
+        
+        # Phase times and throughput
+        lines = ["Phases: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in stats["phases"].items())]
+        counters = stats["counters"]
+        rates = stats["rates"]
+        if rates:
+            lines.append(f"{counters.get('files', 0)} files, {self.format_size(counters.get('bytes', 0))}: "
+                         f"{rates['files_per_second']:.0f} files/s, "
+                         f"{self.format_size(rates['bytes_per_second'])}/s")
+        errors = [f"{op} {name} x{n}" for op, by_errno in stats["errors"].items() for name, n in by_errno.items()]
+        if errors:
+            lines.append("Errors: " + ", ".join(errors))
+        ttk.Label(frame, text="\n".join(lines), font=self.font_text, justify="left").pack(anchor="w", pady=(0, 10))
+        
+        # Latency per operation
+        stats_tree = ttk.Treeview(
+            frame,
+            columns=("count", "p50", "p99", "max"),
+            height=10
+        )
+        stats_tree.pack(fill="both", expand=True)
+        
+        stats_tree.heading("#0", text="Operation")
+        stats_tree.heading("count", text="Count")
+        stats_tree.heading("p50", text="p50 (ms)")
+        stats_tree.heading("p99", text="p99 (ms)")
+        stats_tree.heading("max", text="Max (ms)")
+        
+        stats_tree.column("#0", width=140)
+        for column in ("count", "p50", "p99", "max"):
+            stats_tree.column(column, width=100, anchor="e")
+            
+        for op, op_stats in stats["operations"].items():
+            stats_tree.insert(
+                "", "end",
+                text=op,
+                values=(
+                    op_stats["count"],
+                    f"{op_stats['p50'] * 1000:.3f}",
+                    f"{op_stats['p99'] * 1000:.3f}",
+                    f"{op_stats['max'] * 1000:.3f}"
+                )
+            )
+            
+    def clear_history(self):
+        """Clear conversion history"""
+        if messagebox.askyesno("Clear History", "Are you sure you want to clear the conversion history?"):
+            self.history_store.clear()
+            messagebox.showinfo("History Cleared", "Conversion history has been cleared.")
+            
+    def show_usage(self):
+        """Show usage information"""
+        usage_text = """How to use EXTUPDATE:
+
+        1. Click 'Select Folder' to choose a directory containing Excel files
+        2. Select the current file extension from the dropdown
+        3. Select the target extension for conversion
+        4. Optional: Enable backup creation and/or recursive search
+        5. Review the files that will be converted in the preview
+        6. Click 'Update Extensions' to start the conversion
+
+        Tips:
+        • Always create backups when converting between incompatible formats
+        • Use recursive search to convert files in subfolders
+        • Check the compatibility info before converting
+        • View conversion history from the Tools menu"""
+        
+        messagebox.showinfo("Usage Instructions", usage_text)
+        
+    def show_about(self):
+        """Show about information"""
+        about_text = """EXTUPDATE - Excel Extension Manager
+
+        Version: 2.0.0
+        Author: sorzkode
+
+        An tool for bulk conversion of Excel file extensions.
+
+        Features:
+        • Batch file extension conversion
+        • Backup creation option
+        • Recursive folder processing
+        • Conversion history tracking
+        • File preview with metadata
+        • Compatibility warnings
+
+        License: MIT
+        GitHub: https://github.com/sorzkode/extupdate"""
+        
+        messagebox.showinfo("About EXTUPDATE", about_text)
+        
+    def run(self):
+        """Run the application"""
+        self.window.mainloop()
+
+
+def main():
+    """Start the GUI"""
+    app = ExtUpdateApp()
+    app.run()
\ No newline at end of file
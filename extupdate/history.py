@@ -0,0 +1,344 @@
+"""
+Indexed conversion history.
+
+History is kept in a local SQLite database with indexes on the
+timestamp, both paths, the extension pair and the batch, so months of
+records can be searched and paged through without reading them all.
+Records are buffered in memory, as columns (see compact.RecordBuffer),
+and written in one transaction per batch.
+
+Records written by earlier versions (JSON lines, and before that a JSON
+list) are imported the first time the database is created.
+"""
+import contextlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from .compact import RecordBuffer
+
+# Default history locations (relative to the working directory)
+DEFAULT_HISTORY_FILE = "extupdate_history.db"
+JSONL_HISTORY_FILE = "extupdate_history.jsonl"
+LEGACY_HISTORY_FILE = "extupdate_history.json"
+# Older history files to import into a new database, newest format first
+LEGACY_HISTORY_FILES = (JSONL_HISTORY_FILE, LEGACY_HISTORY_FILE)
+
+# Record fields stored in their own columns; anything else goes to "extra".
+# size and mtime_ns describe the converted file, so an undo can tell
+# whether it changed since; undoes names the batch an undo reverted.
+COLUMNS = ("timestamp", "old_path", "new_path", "old_ext", "new_ext", "backup", "batch", "converter",
+           "size", "mtime_ns", "undoes")
+
+# Fields exported to CSV, in order
+CSV_FIELDS = ("id",) + COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    old_path TEXT NOT NULL,
+    new_path TEXT NOT NULL,
+    old_ext TEXT,
+    new_ext TEXT,
+    backup TEXT,
+    batch TEXT,
+    converter TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    undoes TEXT,
+    extra TEXT
+);
+"""
+
+# Columns added since the first database version, with their types
+ADDED_COLUMNS = (("size", "INTEGER"), ("mtime_ns", "INTEGER"), ("undoes", "TEXT"))
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS history_old_path ON history (old_path);
+CREATE INDEX IF NOT EXISTS history_new_path ON history (new_path);
+CREATE INDEX IF NOT EXISTS history_exts ON history (old_ext, new_ext);
+CREATE INDEX IF NOT EXISTS history_batch ON history (batch);
+CREATE INDEX IF NOT EXISTS history_undoes ON history (undoes);
+"""
+
+
+@dataclass
+class HistoryQuery:
+    """Filter for history records; empty fields match everything
+
+    since and until are ISO dates or timestamps; a date-only until
+    includes that whole day. text matches anywhere in either path.
+    """
+    text: str = ""
+    since: str = ""
+    until: str = ""
+    old_ext: str = ""
+    new_ext: str = ""
+    batch: str = ""
+
+    def where(self) -> Tuple[str, List[str]]:
+        """SQL condition and parameters for this filter"""
+        clauses = []
+        params: List[str] = []
+        if self.text:
+            pattern = "%" + _escape_like(self.text) + "%"
+            clauses.append("(old_path LIKE ? ESCAPE '\\' OR new_path LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        if self.since:
+            clauses.append("timestamp >= ?")
+            params.append(self.since)
+        if self.until:
+            until = self.until
+            if len(until) == 10:
+                # A plain date: everything before the next day
+                until = (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+            else:
+                # Also match longer timestamps starting with until
+                until += "\uffff"
+            clauses.append("timestamp < ?")
+            params.append(until)
+        for column in ("old_ext", "new_ext", "batch"):
+            value = getattr(self, column)
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" AND ".join(clauses) or "1"), params
+
+    def validate(self):
+        for name in ("since", "until"):
+            value = getattr(self, name)
+            if value:
+                try:
+                    date.fromisoformat(value[:10])
+                except ValueError:
+                    raise ValueError(f"Invalid date for {name}: {value!r} (use YYYY-MM-DD)")
+
+
+@contextlib.contextmanager
+def _database_errors():
+    """Report SQLite failures as OSError, as the file-based history did"""
+    import sqlite3
+    try:
+        yield
+    except sqlite3.Error as e:
+        raise OSError(f"history database: {e}") from e
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _row_to_entry(row: Sequence) -> Dict:
+    entry = {"id": row[0]}
+    for name, value in zip(COLUMNS, row[1:]):
+        if value is not None:
+            entry[name] = value
+    if row[-1]:
+        entry.update(json.loads(row[-1]))
+    return entry
+
+
+def _entry_to_row(entry: Dict) -> Tuple:
+    extra = {k: v for k, v in entry.items() if k not in COLUMNS and k != "id"}
+    return tuple(entry.get(name) for name in COLUMNS) + (json.dumps(extra) if extra else None,)
+
+
+class HistoryStore:
+    """Conversion history in an indexed SQLite database.
+
+    append() buffers records; flush() writes them in a single
+    transaction. search() pages through matching records newest first,
+    and export_csv() streams them without loading them all. With
+    max_entries set, the oldest records beyond it are dropped on flush.
+    """
+
+    def __init__(self, path: str, max_entries: int = 0, legacy_paths: Sequence[str] = ()):
+        self.path = path
+        self.max_entries = max_entries
+        self.legacy_paths = tuple(legacy_paths)
+        self._pending = RecordBuffer()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        """Open the database on first use (with the lock held)"""
+        if self._db is None:
+            import sqlite3
+            created = not os.path.exists(self.path)
+            # Used from the GUI thread and batch worker threads, under _lock
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+            existing = {row[1] for row in self._db.execute("PRAGMA table_info(history)")}
+            for name, kind in ADDED_COLUMNS:
+                if name not in existing:
+                    self._db.execute(f"ALTER TABLE history ADD COLUMN {name} {kind}")
+            self._db.executescript(INDEXES)
+            if created:
+                self._import_legacy()
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def append(self, entry: Dict):
+        """Buffer an entry; it is persisted on the next flush()"""
+        with self._lock:
+            self._pending.append(entry)
+
+    def flush(self):
+        """Write buffered entries in a single transaction"""
+        with self._lock, _database_errors():
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, RecordBuffer()
+            db = self._connect()
+            with db:
+                self._insert(db, pending)
+                if self.max_entries:
+                    db.execute("DELETE FROM history WHERE id <= "
+                               "(SELECT MAX(id) FROM history) - ?", (self.max_entries,))
+
+    def load(self, limit: int) -> List[Dict]:
+        """The newest limit entries, oldest first"""
+        entries = self.search(limit=limit)
+        entries.reverse()
+        return entries
+
+    def search(self, query: Optional[HistoryQuery] = None, limit: int = 100,
+               before_id: Optional[int] = None) -> List[Dict]:
+        """A page of matching entries, newest first
+
+        Pass the id of the last entry of a page as before_id to get the
+        next (older) page.
+        """
+        where, params = (query or HistoryQuery()).where()
+        if before_id is not None:
+            where += " AND id < ?"
+            params.append(before_id)
+        with self._lock, _database_errors():
+            rows = self._connect().execute(
+                f"SELECT id, {', '.join(COLUMNS)}, extra FROM history WHERE {where} "
+                f"ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [_row_to_entry(row) for row in rows]
+
+    def count(self, query: Optional[HistoryQuery] = None) -> int:
+        where, params = (query or HistoryQuery()).where()
+        with self._lock, _database_errors():
+            return self._connect().execute(f"SELECT COUNT(*) FROM history WHERE {where}", params).fetchone()[0]
+
+    def iter_entries(self, query: Optional[HistoryQuery] = None, page_size: int = 1000) -> Iterator[Dict]:
+        """Every matching entry, newest first, read a page at a time"""
+        before_id = None
+        while True:
+            page = self.search(query, page_size, before_id)
+            yield from page
+            if len(page) < page_size:
+                return
+            before_id = page[-1]["id"]
+
+    def export_csv(self, stream: TextIO, query: Optional[HistoryQuery] = None) -> int:
+        """Write matching entries to stream as CSV; returns the number written"""
+        import csv
+        writer = csv.DictWriter(stream, CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        written = 0
+        for entry in self.iter_entries(query):
+            writer.writerow(entry)
+            written += 1
+        return written
+
+    def batches(self, query: Optional[HistoryQuery] = None, limit: int = 50) -> List[Dict]:
+        """Batches with matching entries, newest first
+
+        Each is summarised as its id, number of files, first and last
+        timestamps, conversions (".xls -> .xlsx, ..."), the batch it
+        undid if it was an undo, and whether it was itself undone.
+        """
+        where, params = (query or HistoryQuery()).where()
+        with self._lock, _database_errors():
+            rows = self._connect().execute(
+                f"SELECT batch, COUNT(*), MIN(timestamp), MAX(timestamp), "
+                f"GROUP_CONCAT(DISTINCT old_ext || ' -> ' || new_ext), MAX(undoes), "
+                f"EXISTS (SELECT 1 FROM history AS u WHERE u.undoes = h.batch) "
+                f"FROM history AS h WHERE batch IS NOT NULL AND {where} "
+                f"GROUP BY batch ORDER BY MAX(id) DESC LIMIT ?", params + [limit]).fetchall()
+        return [{"batch": batch, "files": files, "started": started, "finished": finished,
+                 "conversion": (conversion or "").replace(",", ", "), "undoes": undoes, "undone": bool(undone)}
+                for batch, files, started, finished, conversion, undoes, undone in rows]
+
+    def extensions(self) -> Tuple[List[str], List[str]]:
+        """Distinct source and target extensions seen in the history"""
+        with self._lock, _database_errors():
+            db = self._connect()
+            old = [r[0] for r in db.execute("SELECT DISTINCT old_ext FROM history WHERE old_ext IS NOT NULL")]
+            new = [r[0] for r in db.execute("SELECT DISTINCT new_ext FROM history WHERE new_ext IS NOT NULL")]
+        return sorted(old), sorted(new)
+
+    def rewrite(self, entries: Iterable[Dict]):
+        """Atomically replace the history with the given entries"""
+        with self._lock, _database_errors():
+            self._pending = RecordBuffer()
+            db = self._connect()
+            with db:
+                db.execute("DELETE FROM history")
+                self._insert(db, entries)
+
+    def clear(self):
+        """Remove all history entries"""
+        self.rewrite([])
+
+    def compact(self):
+        """Drop entries beyond the retention limit and reclaim the space"""
+        with self._lock, _database_errors():
+            db = self._connect()
+            if self.max_entries:
+                with db:
+                    db.execute("DELETE FROM history WHERE id <= "
+                               "(SELECT MAX(id) FROM history) - ?", (self.max_entries,))
+            db.execute("VACUUM")
+
+    @staticmethod
+    def _insert(db, entries: Iterable[Dict]):
+        db.executemany(f"INSERT INTO history ({', '.join(COLUMNS)}, extra) "
+                       f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                       (_entry_to_row(e) for e in entries))
+
+    def _import_legacy(self):
+        """Import the first older history file found into the new database"""
+        for path in self.legacy_paths:
+            entries = _read_legacy(path)
+            if entries:
+                with self._db:
+                    self._insert(self._db, (e for e in entries
+                                             if "timestamp" in e and "old_path" in e and "new_path" in e))
+                return
+
+
+def _read_legacy(path: str) -> List[Dict]:
+    """Entries of a JSON lines history, or of the original JSON list"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return []
+    try:
+        entries = json.loads(text)
+        return entries if isinstance(entries, list) else []
+    except ValueError:
+        pass
+    entries = []
+    for line in text.splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # Torn write from an interrupted batch
+            continue
+    return entries
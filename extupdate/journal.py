@@ -0,0 +1,281 @@
+"""
+Write-ahead intent journal for crash-safe batch renames.
+
+Before a batch renames anything, every planned (old, new) pair is written
+to a journal file and fsynced once. Each completed rename then appends a
+small "done" record, and the journal is deleted when the batch commits.
+A journal that is still present therefore describes an interrupted
+batch, which can be resumed (finish the remaining renames) or rolled
+back (undo the completed ones).
+
+Done records are not fsynced individually: when replaying, the state of
+each pair on disk decides whether it was renamed, so a lost done record
+only costs an extra existence check.
+
+File layout (one JSON value per line)::
+
+    {"batch": ..., "created": ..., "options": {...}, "count": N}
+    [0, "old path", "new path"]
+    ...
+    {"ready": true}
+    {"done": 0}
+    ...
+    {"recorded": true}
+
+A "recorded" line, written when a batch is cancelled, means the history
+already holds every rename marked done before it.
+
+The process running a batch (or resuming or rolling one back) holds an
+exclusive flock on its journal, so a journal only counts as interrupted
+when it can be locked; batches still running elsewhere are left alone.
+Intents are written under a temporary name and renamed into place once
+ready and locked.
+"""
+import errno
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .compact import compact_pairs
+from .rules import Rule
+from .storage import open_storage
+
+DEFAULT_JOURNAL_DIR = "extupdate_journal"
+JOURNAL_SUFFIX = ".journal"
+# Journals whose intents are still being written
+PARTIAL_SUFFIX = ".tmp"
+
+# State of a journaled pair on disk
+STATE_PENDING = "pending"      # old exists, new does not
+STATE_DONE = "done"            # new exists, old does not
+STATE_CONFLICT = "conflict"    # both exist
+STATE_MISSING = "missing"      # neither exists
+
+
+def new_batch_id() -> str:
+    """Sortable, unique batch identifier"""
+    return datetime.now().strftime("%Y%m%d-%H%M%S-") + os.urandom(4).hex()
+
+
+def _try_lock(f) -> bool:
+    """Take an exclusive lock on an open journal without waiting
+
+    Released when the file is closed. Always succeeds where flock is not
+    available (Windows).
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError as e:
+        if e.errno in (errno.EAGAIN, errno.EACCES):
+            return False
+        raise
+    return True
+
+
+def pair_state(old_path: str, new_path: str) -> str:
+    """Classify a journaled (old, new) pair by what exists on disk"""
+    storage = open_storage(old_path)
+    old_exists = storage.exists(old_path)
+    new_exists = storage.exists(new_path)
+    if old_exists and new_exists:
+        return STATE_CONFLICT
+    if old_exists:
+        return STATE_PENDING
+    if new_exists:
+        return STATE_DONE
+    return STATE_MISSING
+
+
+class BatchJournal:
+    """Intent journal for one batch"""
+
+    def __init__(self, path: str, batch_id: str, options: Dict,
+                 ops: Sequence[Tuple[str, str]], done: Optional[Set[int]] = None,
+                 created: Optional[str] = None, recorded: Optional[Set[int]] = None):
+        self.path = path
+        self.batch_id = batch_id
+        self.options = options
+        self.ops = ops
+        self.done: Set[int] = done if done is not None else set()
+        # Done renames whose history records were already written
+        self.recorded: Set[int] = recorded if recorded is not None else set()
+        self.created = created or datetime.now().isoformat()
+        self._file = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def begin(cls, journal_dir: str, options: Dict, ops: Sequence[Tuple[str, str]],
+              batch_id: Optional[str] = None) -> "BatchJournal":
+        """Write the intents for a new batch and fsync them once"""
+        os.makedirs(journal_dir, exist_ok=True)
+        batch_id = batch_id or new_batch_id()
+        path = os.path.join(journal_dir, batch_id + JOURNAL_SUFFIX)
+        journal = cls(path, batch_id, options, ops)
+
+        partial = path + PARTIAL_SUFFIX
+        f = open(partial, "x", encoding="utf-8")
+        _try_lock(f)
+        header = {"batch": batch_id, "created": journal.created, "options": options, "count": len(ops)}
+        f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        for i, (old_path, new_path) in enumerate(ops):
+            f.write(json.dumps([i, old_path, new_path], separators=(",", ":")) + "\n")
+        f.write('{"ready":true}\n')
+        f.flush()
+        os.fsync(f.fileno())
+        # The lock stays with the open file across the rename
+        os.rename(partial, path)
+        journal._file = f
+        return journal
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BatchJournal"]:
+        """Read a journal; None if its intents were never fully written
+
+        The intents are held in a CompactPlan that reads back as pairs.
+        """
+        ops = compact_pairs()
+        done: Set[int] = set()
+        recorded: Set[int] = set()
+        header = None
+        ready = False
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final write
+                    break
+                if header is None:
+                    header = record
+                elif isinstance(record, list):
+                    ops.append(record[1], record[2])
+                elif record.get("ready"):
+                    ready = True
+                elif "done" in record:
+                    done.add(record["done"])
+                elif record.get("recorded"):
+                    recorded = set(done)
+        if header is None or not ready or len(ops) != header.get("count"):
+            return None
+        return cls(path, header["batch"], header.get("options", {}), ops, done, header.get("created"), recorded)
+
+    def acquire(self):
+        """Lock the journal for this process to resume or roll back
+
+        OSError (EBUSY) if another process holds it: that batch is still
+        running. The lock is released by close() or commit().
+        """
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            if not _try_lock(self._file):
+                self._file.close()
+                self._file = None
+                raise OSError(errno.EBUSY, f"Batch {self.batch_id} is still running in another process")
+
+    def _append(self, record: Dict):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            # Reach the OS so a killed process keeps the record; no fsync
+            self._file.flush()
+
+    def mark_done(self, index: int):
+        """Record that the rename at index completed"""
+        self._append({"done": index})
+        self.done.add(index)
+
+    def mark_recorded(self):
+        """Record that history now holds every rename marked done so far"""
+        self._append({"recorded": True})
+        self.recorded = set(self.done)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def commit(self):
+        """Finish the batch: the journal is no longer needed"""
+        # Removed before the lock is released, so no other process can
+        # take it for an interrupted batch in between
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.close()
+
+    def states(self) -> List[str]:
+        """On-disk state of every journaled pair"""
+        return [pair_state(old_path, new_path) for old_path, new_path in self.ops]
+
+    def summary(self) -> Dict:
+        """Counts of pair states, for listing interrupted batches"""
+        counts: Dict[str, int] = {}
+        for state in self.states():
+            counts[state] = counts.get(state, 0) + 1
+        rules = self.options.get("rules") or []
+        if rules:
+            conversion = "; ".join(Rule.from_dict(rule).describe() for rule in rules)
+        else:
+            conversion = f"{self.options.get('source_ext')} -> {self.options.get('target_ext')}"
+        return {
+            "batch": self.batch_id,
+            "created": self.created,
+            "total": len(self.ops),
+            "source_ext": self.options.get("source_ext"),
+            "target_ext": self.options.get("target_ext"),
+            "rules": rules,
+            "conversion": conversion,
+            "root": self.options.get("root"),
+            "states": counts,
+        }
+
+
+def pending_journals(journal_dir: str = DEFAULT_JOURNAL_DIR) -> List[BatchJournal]:
+    """Journals of interrupted batches, oldest first
+
+    Journals locked by a running batch are skipped. Unlocked journals
+    whose intents were never completely written are removed: their batch
+    had not renamed anything yet.
+    """
+    if not os.path.isdir(journal_dir):
+        return []
+    journals = []
+    for name in sorted(os.listdir(journal_dir)):
+        partial = name.endswith(JOURNAL_SUFFIX + PARTIAL_SUFFIX)
+        if not name.endswith(JOURNAL_SUFFIX) and not partial:
+            continue
+        path = os.path.join(journal_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as probe:
+                if not _try_lock(probe):
+                    continue
+                journal = None if partial else BatchJournal.load(path)
+                if journal is None:
+                    # Still locked, so no batch can be writing it
+                    os.unlink(path)
+                    continue
+        except OSError:
+            continue
+        journals.append(journal)
+    return journals
+
+
+def find_journal(batch_id: Optional[str], journal_dir: str = DEFAULT_JOURNAL_DIR) -> Optional[BatchJournal]:
+    """The journal for batch_id, or the most recent one if batch_id is None"""
+    journals = pending_journals(journal_dir)
+    if batch_id is None:
+        return journals[-1] if journals else None
+    for journal in journals:
+        if journal.batch_id == batch_id:
+            return journal
+    return None
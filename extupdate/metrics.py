@@ -0,0 +1,290 @@
+"""
+Per-phase timing and per-operation latency metrics.
+
+The engine times each phase (scan, plan, detect, journal, execute,
+history) and each file operation (directory read, backup, rename,
+re-encode, journal record) through a Metrics object. Latencies go into
+log-scale histograms from which p50/p90/p99 are estimated; failures are
+counted by errno.
+
+Metrics are off unless an engine is given a Metrics instance: the default
+NULL_METRICS hands out a shared no-op timer, so disabled instrumentation
+is one method call per operation and no clock reads.
+
+Results can be dumped as JSON or written in the Prometheus text format
+for node_exporter's textfile collector.
+"""
+import errno
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+# Histogram bucket upper bounds in seconds: 1us doubling up to ~134s
+BUCKET_BOUNDS = [1e-6 * 2 ** i for i in range(28)]
+
+PERCENTILES = (50, 90, 99)
+
+# Operations timed by the engine
+OP_SCANDIR = "scandir"
+OP_BACKUP = "backup"
+OP_RENAME = "rename"
+OP_REENCODE = "reencode"
+OP_FILE = "file"
+OP_JOURNAL = "journal"
+
+
+# errno implied by OSError subclasses raised without one
+_IMPLIED_ERRNO = {
+    FileExistsError: errno.EEXIST,
+    FileNotFoundError: errno.ENOENT,
+    PermissionError: errno.EACCES,
+    IsADirectoryError: errno.EISDIR,
+    NotADirectoryError: errno.ENOTDIR,
+}
+
+
+def error_name(exc: BaseException) -> str:
+    """errno name of an OSError (ENOENT, EACCES, ...), else the exception type"""
+    if isinstance(exc, OSError):
+        code = exc.errno if exc.errno is not None else _IMPLIED_ERRNO.get(type(exc))
+        if code is not None:
+            return errno.errorcode.get(code, str(code))
+    return type(exc).__name__
+
+
+class Histogram:
+    """Log-scale latency histogram"""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile (capped at max)"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        data = {"count": self.count, "sum": round(self.sum, 6),
+                "mean": round(self.sum / self.count, 9) if self.count else 0.0,
+                "max": round(self.max, 9)}
+        for pct in PERCENTILES:
+            data[f"p{pct}"] = round(self.percentile(pct), 9)
+        return data
+
+
+class _Timer:
+    """Times one operation; records its latency, or its error"""
+
+    __slots__ = ("metrics", "op", "start")
+
+    def __init__(self, metrics: "Metrics", op: str):
+        self.metrics = metrics
+        self.op = op
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if exc is None:
+            self.metrics.observe(self.op, elapsed)
+        elif isinstance(exc, Exception):
+            self.metrics.error(self.op, exc)
+        return False
+
+
+class _PhaseTimer(_Timer):
+    __slots__ = ()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.add_phase(self.op, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Phase timings, operation latencies, counters and errors of a batch"""
+
+    enabled = True
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ops: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        # op -> errno name -> count
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def timed(self, op: str) -> _Timer:
+        """Context manager recording the latency (or error) of one operation"""
+        return _Timer(self, op)
+
+    def phase(self, name: str) -> _Timer:
+        """Context manager adding its wall time to a phase"""
+        return _PhaseTimer(self, name)
+
+    def observe(self, op: str, seconds: float):
+        with self._lock:
+            histogram = self.ops.get(op)
+            if histogram is None:
+                histogram = self.ops[op] = Histogram()
+            histogram.observe(seconds)
+
+    def add_phase(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def error(self, op: str, exc: BaseException):
+        name = error_name(exc)
+        with self._lock:
+            by_errno = self.errors.setdefault(op, {})
+            by_errno[name] = by_errno.get(name, 0) + 1
+
+    def rates(self) -> Dict[str, float]:
+        """Files and bytes per second over the execute phase"""
+        seconds = self.phases.get("execute", 0.0)
+        if not seconds:
+            return {}
+        return {"files_per_second": round(self.counters.get("files", 0) / seconds, 1),
+                "bytes_per_second": round(self.counters.get("bytes", 0) / seconds, 1)}
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                "rates": self.rates(),
+                "counters": dict(self.counters),
+                "operations": {op: h.to_dict() for op, h in sorted(self.ops.items())},
+                "errors": {op: dict(by_errno) for op, by_errno in self.errors.items()},
+            }
+
+    def write_json(self, path: str):
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP extupdate_{name} {help_text}")
+            lines.append(f"# TYPE extupdate_{name} {kind}")
+
+        with self._lock:
+            metric("batch_start_time_seconds", "gauge", "Start time of the last batch")
+            lines.append(f"extupdate_batch_start_time_seconds {self.started:.3f}")
+            metric("phase_seconds", "gauge", "Wall time spent in each phase of the last batch")
+            for name, seconds in sorted(self.phases.items()):
+                lines.append(f'extupdate_phase_seconds{{phase="{name}"}} {seconds:.6f}')
+            metric("batch_items", "gauge", "Files and bytes processed by the last batch")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'extupdate_batch_items{{kind="{name}"}} {value}')
+            for name, value in sorted(self.rates().items()):
+                metric(f"batch_{name}", "gauge", f"Throughput of the last batch ({name.replace('_', ' ')})")
+                lines.append(f"extupdate_batch_{name} {value}")
+            metric("operation_seconds", "histogram", "Latency of each file operation in the last batch")
+            for op, h in sorted(self.ops.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKET_BOUNDS, h.counts):
+                    cumulative += n
+                    lines.append(f'extupdate_operation_seconds_bucket{{op="{op}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'extupdate_operation_seconds_bucket{{op="{op}",le="+Inf"}} {h.count}')
+                lines.append(f'extupdate_operation_seconds_sum{{op="{op}"}} {h.sum:.6f}')
+                lines.append(f'extupdate_operation_seconds_count{{op="{op}"}} {h.count}')
+            metric("operation_errors", "gauge", "Failed operations in the last batch by errno")
+            for op, by_errno in sorted(self.errors.items()):
+                for name, n in sorted(by_errno.items()):
+                    lines.append(f'extupdate_operation_errors{{op="{op}",errno="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write a .prom file; replaced atomically as the textfile collector requires"""
+        _write_atomic(path, self.prometheus())
+
+
+class NullMetrics:
+    """Disabled metrics: every call is a no-op"""
+
+    enabled = False
+
+    def timed(self, op: str) -> _NullTimer:
+        return _NULL_TIMER
+
+    def phase(self, name: str) -> _NullTimer:
+        return _NULL_TIMER
+
+    def observe(self, op: str, seconds: float):
+        pass
+
+    def add_phase(self, name: str, seconds: float):
+        pass
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def error(self, op: str, exc: BaseException):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def timed_reader(reader, metrics: Optional[Metrics]):
+    """Wrap a scanner directory reader to time each directory read"""
+    if metrics is None or not metrics.enabled:
+        return reader
+
+    def read(directory, ext, recursive):
+        with metrics.timed(OP_SCANDIR):
+            files, subdirs = reader(directory, ext, recursive)
+        metrics.count("directories")
+        metrics.count("scanned", len(files))
+        return files, subdirs
+    return read
@@ -0,0 +1,199 @@
+"""
+Streaming dry-run planner.
+
+The planner walks the tree with the same scanner as a conversion and
+yields one PlanRecord per file that would be converted, reporting what
+executing the plan would run into:
+
+- conflict:  the target name already exists, so the file would fail
+- duplicate: an earlier file in the plan already claims the target name
+- denied:    the directory (or, for backups, the file) is not writable
+             or readable by this user
+
+Records are produced as the scan streams in, so memory stays bounded by
+the largest directory rather than by the size of the tree. Scanners
+deliver each directory's files together, which is what lets duplicate
+targets be checked against one directory at a time.
+"""
+import csv
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, NamedTuple, Optional, Set, TextIO
+
+from .backup import BACKUP_HARDLINK, BACKUP_JOURNAL, backup_path
+from .cache import ScanCache, directory_reader
+from .detect import CHECK_OFF, SignatureCache, detect
+from .engine import ConversionOptions, PlannedRename, check_content
+from .scanner import iter_scan
+from .storage import open_storage
+
+STATUS_OK = "ok"
+STATUS_CONFLICT = "conflict"
+STATUS_DUPLICATE = "duplicate"
+STATUS_DENIED = "denied"
+STATUS_SKIPPED = "skipped"
+
+PLAN_FORMATS = ["ndjson", "csv"]
+
+
+class PlanRecord(NamedTuple):
+    """What would happen to one file"""
+    old_path: str
+    new_path: str
+    size: int
+    backup_bytes: int
+    status: str
+    detail: str = ""
+
+
+@dataclass
+class PlanTotals:
+    """Running totals over a streamed plan"""
+    files: int = 0
+    bytes: int = 0
+    backup_bytes: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, record: PlanRecord):
+        self.files += 1
+        self.bytes += record.size
+        self.backup_bytes += record.backup_bytes
+        self.statuses[record.status] = self.statuses.get(record.status, 0) + 1
+
+    @property
+    def problems(self) -> int:
+        """Files that would fail or be left alone"""
+        return self.files - self.statuses.get(STATUS_OK, 0)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class DryRunPlanner:
+    """Stream the rename plan for a set of conversion options"""
+
+    def __init__(self, options: ConversionOptions, cache: Optional[ScanCache] = None,
+                 signatures: Optional[SignatureCache] = None):
+        self.options = options
+        self.cache = cache
+        self.signatures = signatures
+        self.rules = options.rule_set()
+        self.storage = open_storage(options.root)
+        self.totals = PlanTotals()
+
+    def backup_bytes(self, size: int) -> int:
+        """Space a backup of a file of this size takes (worst case for auto)"""
+        if not self.options.backup or self.options.backup_strategy in (BACKUP_HARDLINK, BACKUP_JOURNAL):
+            return 0
+        return size
+
+    def records(self, cancel: Optional[threading.Event] = None) -> Iterator[PlanRecord]:
+        """Yield a record per planned file, updating self.totals"""
+        options = self.options
+        needs_read = options.backup and options.backup_strategy != BACKUP_JOURNAL
+        directory = None
+        claimed: Set[str] = set()
+        writable = True
+        local = self.storage.local
+        reader = directory_reader(self.cache) if local else self.storage.read_directory
+        for scanned in iter_scan(options.root, options.extensions(), options.recursive,
+                                 options.scan_workers, cancel, reader):
+            rule = self.rules.match(scanned.path, options.root)
+            if rule is None:
+                continue
+            item = PlannedRename(scanned.path, scanned.path[:-len(rule.source_ext)] + rule.target_ext)
+
+            parent = os.path.dirname(scanned.path)
+            if parent != directory:
+                directory = parent
+                claimed = set()
+                # Remote permissions only show when a request is refused
+                writable = not local or os.access(parent or ".", os.W_OK | os.X_OK)
+
+            record = self._check(item, scanned.size, claimed, writable, needs_read)
+            self.totals.add(record)
+            yield record
+
+    def _check(self, item: PlannedRename, size: int, claimed: Set[str],
+               writable: bool, needs_read: bool) -> PlanRecord:
+        if self.options.content_check != CHECK_OFF:
+            checked, reason = check_content(item, detect(item.old_path, self.signatures),
+                                            self.options.content_check)
+            if checked is None:
+                return PlanRecord(item.old_path, item.new_path, size, 0, STATUS_SKIPPED, reason)
+            item = checked
+
+        backup_bytes = self.backup_bytes(size)
+        if item.new_path in claimed:
+            return PlanRecord(item.old_path, item.new_path, size, 0, STATUS_DUPLICATE,
+                              "another file in the plan has the same target")
+        claimed.add(item.new_path)
+        if self.storage.exists(item.new_path):
+            return PlanRecord(item.old_path, item.new_path, size, 0, STATUS_CONFLICT,
+                              "target already exists")
+        if not writable:
+            return PlanRecord(item.old_path, item.new_path, size, 0, STATUS_DENIED,
+                              "directory is not writable")
+        if needs_read and self.storage.local and not os.access(item.old_path, os.R_OK):
+            return PlanRecord(item.old_path, item.new_path, size, 0, STATUS_DENIED,
+                              "file is not readable for backup")
+        detail = "backup will be replaced" if backup_bytes and self.storage.exists(backup_path(item.old_path)) else ""
+        return PlanRecord(item.old_path, item.new_path, size, backup_bytes, STATUS_OK, detail)
+
+    def write(self, writer: "PlanWriter", cancel: Optional[threading.Event] = None) -> PlanTotals:
+        """Stream every record to writer, then its totals; returns the totals"""
+        for record in self.records(cancel):
+            writer.write(record)
+        writer.close(self.totals)
+        if self.signatures is not None:
+            try:
+                self.signatures.save()
+            except OSError:
+                pass
+        return self.totals
+
+
+class PlanWriter:
+    """Writes plan records to a text stream as they arrive"""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, record: PlanRecord):
+        raise NotImplementedError
+
+    def close(self, totals: PlanTotals):
+        self.stream.flush()
+
+
+class NdjsonPlanWriter(PlanWriter):
+    """One JSON object per file, then a {"totals": ...} line"""
+
+    def write(self, record: PlanRecord):
+        self.stream.write(json.dumps(record._asdict(), separators=(",", ":")) + "\n")
+
+    def close(self, totals: PlanTotals):
+        self.stream.write(json.dumps({"totals": totals.to_dict()}, separators=(",", ":")) + "\n")
+        super().close(totals)
+
+
+class CsvPlanWriter(PlanWriter):
+    """A CSV row per file, with a header row (totals are not written)"""
+
+    def __init__(self, stream: TextIO):
+        super().__init__(stream)
+        self._csv = csv.writer(stream)
+        self._csv.writerow(PlanRecord._fields)
+
+    def write(self, record: PlanRecord):
+        self._csv.writerow(record)
+
+
+def make_plan_writer(fmt: str, stream: TextIO) -> PlanWriter:
+    if fmt == "csv":
+        return CsvPlanWriter(stream)
+    if fmt == "ndjson":
+        return NdjsonPlanWriter(stream)
+    raise ValueError(f"Unknown plan format: {fmt}")
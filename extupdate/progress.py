@@ -0,0 +1,147 @@
+"""
+Progress reporting for conversion batches.
+
+The engine reports ProgressEvents from whichever thread processes a file.
+Consumers here are safe to call from any thread:
+
+- ProgressChannel queues events for a GUI main loop, which polls it at a
+  fixed frame rate and gets one coalesced snapshot per frame
+- ProgressPrinter draws a rate-limited progress line on a terminal
+- JsonProgressLog appends one JSON line per finished file to a log
+
+fan_out() lets a single batch feed several of them.
+"""
+import json
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, TextIO
+
+from .engine import EVENT_FAILED, EVENT_STARTED, ConversionResult, ProgressCallback, ProgressEvent
+
+
+@dataclass
+class ProgressSnapshot:
+    """Coalesced state of a batch as of the last poll"""
+    completed: int = 0
+    total: int = 0
+    current_path: str = ""
+    failed: int = 0
+    # Set once the batch has finished
+    result: Optional[ConversionResult] = None
+
+    @property
+    def percent(self) -> float:
+        return (self.completed / self.total) * 100 if self.total else 0.0
+
+
+class ProgressChannel:
+    """Queue of progress events written by workers and polled by one reader"""
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._snapshot = ProgressSnapshot()
+
+    def __call__(self, event: ProgressEvent):
+        self._queue.put(event)
+
+    def finish(self, result: ConversionResult):
+        """Signal that the batch is over"""
+        self._queue.put(result)
+
+    def poll(self) -> Optional[ProgressSnapshot]:
+        """Drain pending events; None if nothing happened since the last poll"""
+        snapshot = self._snapshot
+        changed = False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if isinstance(item, ConversionResult):
+                snapshot.result = item
+                continue
+            snapshot.total = item.total
+            snapshot.completed = max(snapshot.completed, item.completed)
+            if item.kind == EVENT_STARTED:
+                snapshot.current_path = item.path
+            elif item.kind == EVENT_FAILED:
+                snapshot.failed += 1
+        return snapshot if changed else None
+
+
+class ProgressPrinter:
+    """Single-line progress display for terminals"""
+
+    def __init__(self, stream: TextIO = sys.stderr, interval: float = 0.1, width: int = 30):
+        self.stream = stream
+        self.interval = interval
+        self.width = width
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, event: ProgressEvent):
+        now = time.monotonic()
+        with self._lock:
+            if event.completed < event.total and now - self._last < self.interval:
+                return
+            self._last = now
+            filled = int(self.width * event.completed / event.total) if event.total else self.width
+            bar = "#" * filled + "-" * (self.width - filled)
+            self.stream.write(f"\r[{bar}] {event.completed}/{event.total}")
+            self.stream.flush()
+
+    def close(self):
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+class JsonProgressLog:
+    """Append one JSON line per finished file, plus a final summary line"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _write(self, record: dict):
+        with self._lock:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def __call__(self, event: ProgressEvent):
+        if event.kind == EVENT_STARTED:
+            return
+        record = {
+            "time": time.time(),
+            "event": event.kind,
+            "index": event.index,
+            "path": event.path,
+            "completed": event.completed,
+            "total": event.total,
+        }
+        if event.error is not None:
+            record["error"] = event.error
+        self._write(record)
+
+    def close(self, result: Optional[ConversionResult] = None):
+        if result is not None:
+            self._write(dict(result.to_dict(), time=time.time(), event="finished"))
+        with self._lock:
+            self._file.close()
+
+
+def fan_out(callbacks: List[Optional[ProgressCallback]]) -> Optional[ProgressCallback]:
+    """Combine progress callbacks, skipping None"""
+    active = [c for c in callbacks if c is not None]
+    if not active:
+        return None
+    if len(active) == 1:
+        return active[0]
+
+    def broadcast(event: ProgressEvent):
+        for callback in active:
+            callback(event)
+    return broadcast
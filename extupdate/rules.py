@@ -0,0 +1,142 @@
+"""
+Extension rule sets: convert several source extensions in one pass.
+
+A rule maps a source extension to a target extension and may restrict
+which files it applies to with fnmatch-style globs or a regular
+expression, all matched against the path relative to the scanned root
+(with "/" separators). A RuleSet compiles its rules into a dictionary
+keyed by extension, so matching a file name is one suffix lookup
+however many rules there are; among rules for the same extension the
+first whose filters accept the path wins.
+
+Rule files are JSON, either a list of rules or {"rules": [...]}::
+
+    {"rules": [
+        {"from": ".xlt", "to": ".xltx"},
+        {"from": ".xls", "to": ".xlsx", "exclude": "archive/*"},
+        {"from": ".xml", "to": ".xlsx", "regex": "^exports/"}
+    ]}
+"""
+import fnmatch
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Pattern
+
+
+@dataclass
+class Rule:
+    """Convert files with source_ext to target_ext, optionally filtered by path"""
+    source_ext: str
+    target_ext: str
+    include: Optional[str] = None
+    exclude: Optional[str] = None
+    regex: Optional[str] = None
+
+    def validate(self):
+        """Raise ValueError if the rule cannot be used"""
+        for ext in (self.source_ext, self.target_ext):
+            if not ext.startswith(".") or "." in ext[1:] or len(ext) < 2:
+                raise ValueError(f"Invalid extension: {ext!r}")
+        if self.source_ext == self.target_ext:
+            raise ValueError(f"Rule converts {self.source_ext} to itself")
+        if self.regex is not None:
+            try:
+                re.compile(self.regex)
+            except re.error as e:
+                raise ValueError(f"Invalid regex {self.regex!r}: {e}")
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Rule":
+        """Rule from a rule file entry ("from"/"to") or to_dict() output"""
+        try:
+            source = data["from"] if "from" in data else data["source_ext"]
+            target = data["to"] if "to" in data else data["target_ext"]
+        except KeyError as e:
+            raise ValueError(f"Rule is missing {e.args[0]!r}: {data!r}")
+        return cls(source, target, data.get("include"), data.get("exclude"), data.get("regex"))
+
+    @classmethod
+    def parse(cls, text: str) -> "Rule":
+        """Rule from a command line "SRC:DST" pair"""
+        source, sep, target = text.partition(":")
+        if not sep:
+            raise ValueError(f"Expected SRC:DST, got {text!r}")
+        return cls(source.strip(), target.strip())
+
+    def describe(self) -> str:
+        filters = [f"{name}={value}" for name, value in
+                   (("include", self.include), ("exclude", self.exclude), ("regex", self.regex))
+                   if value is not None]
+        suffix = f" [{', '.join(filters)}]" if filters else ""
+        return f"{self.source_ext} -> {self.target_ext}{suffix}"
+
+
+class _CompiledRule:
+    __slots__ = ("rule", "regex")
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.regex: Optional[Pattern] = re.compile(rule.regex) if rule.regex else None
+
+    def accepts(self, relpath: str) -> bool:
+        rule = self.rule
+        if rule.include is not None and not fnmatch.fnmatchcase(relpath, rule.include):
+            return False
+        if rule.exclude is not None and fnmatch.fnmatchcase(relpath, rule.exclude):
+            return False
+        if self.regex is not None and not self.regex.search(relpath):
+            return False
+        return True
+
+
+class RuleSet:
+    """Rules compiled into a single suffix lookup"""
+
+    def __init__(self, rules: List[Rule]):
+        if not rules:
+            raise ValueError("At least one rule is required")
+        for rule in rules:
+            rule.validate()
+        self.rules = list(rules)
+        self._by_suffix: Dict[str, List[_CompiledRule]] = {}
+        for rule in self.rules:
+            self._by_suffix.setdefault(rule.source_ext, []).append(_CompiledRule(rule))
+        self.suffixes: FrozenSet[str] = frozenset(self._by_suffix)
+        self._filtered = any(r.include or r.exclude or r.regex for r in self.rules)
+
+    @classmethod
+    def single(cls, source_ext: str, target_ext: str) -> "RuleSet":
+        return cls([Rule(source_ext, target_ext)])
+
+    @classmethod
+    def load(cls, path: str) -> "RuleSet":
+        """Load rules from a JSON rule file"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("rules")
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: expected a list of rules")
+        return cls([Rule.from_dict(entry) for entry in data])
+
+    def match(self, path: str, root: str) -> Optional[Rule]:
+        """The rule converting path (under root), or None"""
+        name = os.path.basename(path)
+        dot = name.rfind(".")
+        if dot < 0:
+            return None
+        candidates = self._by_suffix.get(name[dot:])
+        if not candidates:
+            return None
+        if not self._filtered:
+            return candidates[0].rule
+        relpath = os.path.relpath(path, root).replace(os.sep, "/")
+        for compiled in candidates:
+            if compiled.accepts(relpath):
+                return compiled.rule
+        return None
+
+    def describe(self) -> str:
+        return "; ".join(rule.describe() for rule in self.rules)
@@ -0,0 +1,451 @@
+"""
+S3-compatible object storage over asyncio, using only the standard library.
+
+S3Storage is the StorageBackend for s3://bucket/key paths. Each backend
+runs one event loop on a background thread. The engine's executor and
+scanner threads submit requests to it and wait for them, so with -j 32
+thirty-two requests are in flight at once, multiplexed over a pool of
+keep-alive HTTP/1.1 connections (max_connections). Requests that fail
+on the way (connection errors, timeouts, throttling and 5xx responses)
+are retried with exponential backoff and full jitter.
+
+Object stores have no rename: a rename is a server-side copy
+(x-amz-copy-source) followed by a delete, and directories are key
+prefixes listed with a "/" delimiter. Single-request copies limit
+objects to 5 GB. Requests are signed with AWS Signature Version 4 and
+use path-style addressing (endpoint/bucket/key), which S3-compatible
+servers such as MinIO and local test stubs accept; without credentials
+they are sent unsigned.
+
+S3Storage.from_environment() reads the usual variables:
+AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_SESSION_TOKEN,
+AWS_REGION (or AWS_DEFAULT_REGION), and AWS_ENDPOINT_URL_S3 (or
+AWS_ENDPOINT_URL) for servers other than AWS.
+"""
+import asyncio
+import errno
+import hashlib
+import hmac
+import os
+import random
+import ssl
+import stat
+import threading
+import time
+from calendar import timegm
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+
+from .scanner import Extensions, ScannedFile, suffix_matcher
+from .storage import StorageBackend, split_url
+
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_RETRIES = 5
+# Seconds before the first retry; the limit doubles with each attempt
+DEFAULT_BACKOFF = 0.1
+MAX_BACKOFF = 5.0
+# Seconds for one request, connecting included
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_REGION = "us-east-1"
+
+# Throttling and server-side failures, worth another attempt
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+# Characters S3 leaves unencoded in canonical URIs and query strings
+_UNRESERVED = "-_.~"
+
+
+class ObjectStat(NamedTuple):
+    """Stat of an object, with the os.stat_result fields the engine reads"""
+    st_size: int
+    st_mtime_ns: int
+    st_mode: int = stat.S_IFREG | 0o644
+
+    @property
+    def st_mtime(self) -> float:
+        return self.st_mtime_ns / 1e9
+
+
+class _Response(NamedTuple):
+    status: int
+    # Header names in lower case
+    headers: Dict[str, str]
+    body: bytes
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one endpoint, at most size at once"""
+
+    def __init__(self, host: str, port: int, tls: Optional[ssl.SSLContext], size: int):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        # Created on the loop thread (see S3Storage._start)
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, raw: bytes, head: bool) -> _Response:
+        async with self._slots:
+            while self._idle:
+                conn = self._idle.pop()
+                try:
+                    return await self._exchange(conn, raw, head)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # The server closed an idle connection; try the next
+                    continue
+            conn = await asyncio.open_connection(self.host, self.port, ssl=self.tls,
+                                                 server_hostname=self.host if self.tls else None)
+            return await self._exchange(conn, raw, head)
+
+    async def _exchange(self, conn, raw: bytes, head: bool) -> _Response:
+        reader, writer = conn
+        try:
+            writer.write(raw)
+            await writer.drain()
+            status, headers = await self._read_head(reader)
+            reusable = headers.get("connection", "").lower() != "close"
+            if head or status in (204, 304) or 100 <= status < 200:
+                body = b""
+            elif "content-length" in headers:
+                body = await reader.readexactly(int(headers["content-length"]))
+            elif headers.get("transfer-encoding", "").lower() == "chunked":
+                body = await self._read_chunked(reader)
+            else:
+                body = await reader.read()
+                reusable = False
+        except BaseException:
+            writer.close()
+            raise
+        if reusable:
+            self._idle.append(conn)
+        else:
+            writer.close()
+        return _Response(status, headers, body)
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+        line = await reader.readline()
+        if not line:
+            raise asyncio.IncompleteReadError(b"", None)
+        parts = line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/"):
+            raise ConnectionError(f"unexpected response from server: {line[:80]!r}")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return int(parts[1]), headers
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Trailers, then the blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+def _error_for(response: _Response, path: str) -> OSError:
+    """The exception for a failed response"""
+    code = message = ""
+    if response.body:
+        try:
+            root = ElementTree.fromstring(response.body)
+            code = root.findtext("Code") or ""
+            message = root.findtext("Message") or ""
+        except ElementTree.ParseError:
+            pass
+    text = f"S3 {response.status}" + (f" {code}" if code else "") + (f": {message}" if message else "")
+    if response.status == 404:
+        return FileNotFoundError(errno.ENOENT, text, path)
+    if response.status == 403:
+        return PermissionError(errno.EACCES, text, path)
+    return OSError(text)
+
+
+def _embedded_error(response: _Response) -> bool:
+    """Whether a 200 response carries an error (S3 does this for failed copies)"""
+    return response.status == 200 and b"<Error>" in response.body[:512]
+
+
+def _parse_iso_ns(value: str) -> int:
+    """Nanoseconds since the epoch of a LastModified value (2024-05-01T10:00:00.000Z)"""
+    seconds = timegm(time.strptime(value[:19], "%Y-%m-%dT%H:%M:%S"))
+    fraction = value[19:].rstrip("Z").lstrip(".")
+    return seconds * 10**9 + (int(fraction.ljust(9, "0")[:9]) if fraction.isdigit() else 0)
+
+
+class S3Storage(StorageBackend):
+    """One bucket of an S3-compatible object store"""
+
+    def __init__(self, bucket: str, endpoint: Optional[str] = None, region: str = DEFAULT_REGION,
+                 access_key: str = "", secret_key: str = "", session_token: str = "",
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, retries: int = DEFAULT_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF, timeout: float = DEFAULT_TIMEOUT):
+        if not bucket:
+            raise ValueError("S3 paths need a bucket: s3://bucket/prefix")
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+        self.bucket = bucket
+        self.endpoint = endpoint or f"https://s3.{region}.amazonaws.com"
+        url = urlsplit(self.endpoint)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"Invalid S3 endpoint: {self.endpoint}")
+        self.tls = url.scheme == "https"
+        self.host = url.hostname
+        self.port = url.port or (443 if self.tls else 80)
+        default_port = self.port == (443 if self.tls else 80)
+        self.host_header = self.host if default_port else f"{self.host}:{self.port}"
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session_token = session_token
+        self.max_connections = max_connections
+        self.default_jobs = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Requests sent again after a failure; read by benchmarks and metrics
+        self.retried = 0
+        self._signing_key: Tuple[str, bytes] = ("", b"")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[_ConnectionPool] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, bucket: str, **kwargs) -> "S3Storage":
+        env = os.environ
+        settings = dict(
+            endpoint=env.get("AWS_ENDPOINT_URL_S3") or env.get("AWS_ENDPOINT_URL") or None,
+            region=env.get("AWS_REGION") or env.get("AWS_DEFAULT_REGION") or DEFAULT_REGION,
+            access_key=env.get("AWS_ACCESS_KEY_ID", ""),
+            secret_key=env.get("AWS_SECRET_ACCESS_KEY", ""),
+            session_token=env.get("AWS_SESSION_TOKEN", ""),
+        )
+        settings.update(kwargs)
+        return cls(bucket, **settings)
+
+    # Paths
+
+    def key_of(self, path: str) -> str:
+        parts = split_url(path)
+        if parts is None or parts[0] != "s3" or parts[1] != self.bucket:
+            raise ValueError(f"Not in s3://{self.bucket}: {path}")
+        return parts[2]
+
+    def url(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def _uri(self, key: Optional[str]) -> str:
+        uri = "/" + quote(self.bucket, safe=_UNRESERVED)
+        return uri if key is None else uri + "/" + quote(key, safe="/" + _UNRESERVED)
+
+    # Requests
+
+    def _sign(self, method: str, uri: str, query: str, headers: Dict[str, str]):
+        """Add the Signature Version 4 Authorization header"""
+        amz_date = headers["x-amz-date"]
+        day = amz_date[:8]
+        names = sorted(headers)
+        canonical = "\n".join([
+            method, uri, query,
+            "".join(f"{name}:{headers[name]}\n" for name in names),
+            ";".join(names),
+            headers["x-amz-content-sha256"],
+        ])
+        scope = f"{day}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                             hashlib.sha256(canonical.encode()).hexdigest()])
+        if self._signing_key[0] != day:
+            key = ("AWS4" + self.secret_key).encode()
+            for part in (day, self.region, "s3", "aws4_request"):
+                key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+            self._signing_key = (day, key)
+        signature = hmac.new(self._signing_key[1], to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={';'.join(names)}, Signature={signature}")
+
+    def _build(self, method: str, key: Optional[str], params: Dict[str, str],
+               extra: Dict[str, str]) -> bytes:
+        uri = self._uri(key)
+        query = "&".join(f"{quote(k, safe=_UNRESERVED)}={quote(v, safe=_UNRESERVED)}"
+                         for k, v in sorted(params.items()))
+        headers = {
+            "host": self.host_header,
+            "x-amz-date": time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()),
+            "x-amz-content-sha256": EMPTY_SHA256,
+        }
+        if self.session_token:
+            headers["x-amz-security-token"] = self.session_token
+        headers.update(extra)
+        if self.access_key:
+            self._sign(method, uri, query, headers)
+        target = uri + ("?" + query if query else "")
+        lines = [f"{method} {target} HTTP/1.1"] + [f"{name}: {value}" for name, value in headers.items()]
+        if method in ("PUT", "POST"):
+            lines.append("content-length: 0")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+    async def _request(self, method: str, key: Optional[str], params: Optional[Dict[str, str]] = None,
+                       headers: Optional[Dict[str, str]] = None) -> _Response:
+        """Send a request, retrying transient failures; returns the final response"""
+        path = self.url(key or "")
+        attempt = 0
+        while True:
+            # Signed again on every attempt: the signature covers the time
+            raw = self._build(method, key, params or {}, headers or {})
+            try:
+                response = await asyncio.wait_for(self._pool.request(raw, method == "HEAD"), self.timeout)
+            except asyncio.TimeoutError:
+                error: Exception = OSError(errno.ETIMEDOUT, f"S3 request timed out after {self.timeout:g}s", path)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                error = e if isinstance(e, OSError) else ConnectionError(f"S3 connection closed: {e}")
+            else:
+                if response.status not in RETRY_STATUSES and not _embedded_error(response):
+                    return response
+                error = _error_for(response, path)
+            if attempt >= self.retries:
+                raise error
+            # Full jitter: spread retries from many requests over the window
+            await asyncio.sleep(random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt)))
+            attempt += 1
+            self.retried += 1
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, daemon=True, name="extupdate-s3")
+                thread.start()
+                tls = ssl.create_default_context() if self.tls else None
+
+                async def make_pool():
+                    return _ConnectionPool(self.host, self.port, tls, self.max_connections)
+                self._pool = asyncio.run_coroutine_threadsafe(make_pool(), loop).result()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _run(self, coro):
+        """Run a coroutine on the backend's loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._start()).result()
+
+    def close(self):
+        with self._lock:
+            loop, thread, self._loop = self._loop, self._thread, None
+        if loop is None:
+            return
+
+        async def shutdown():
+            self._pool.close()
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    # Operations
+
+    async def _list(self, prefix: str, max_keys: Optional[int] = None):
+        """Objects and common prefixes directly under prefix, every page"""
+        objects: List[Tuple[str, int, int]] = []
+        prefixes: List[str] = []
+        token = None
+        while True:
+            params = {"list-type": "2", "prefix": prefix, "delimiter": "/"}
+            if token:
+                params["continuation-token"] = token
+            if max_keys:
+                params["max-keys"] = str(max_keys)
+            response = await self._request("GET", None, params)
+            if response.status != 200:
+                raise _error_for(response, self.url(prefix))
+            root = ElementTree.fromstring(response.body)
+            for item in root.iter(S3_NS + "Contents"):
+                objects.append((item.findtext(S3_NS + "Key"), int(item.findtext(S3_NS + "Size") or 0),
+                                _parse_iso_ns(item.findtext(S3_NS + "LastModified") or "")))
+            for item in root.iter(S3_NS + "CommonPrefixes"):
+                prefixes.append(item.findtext(S3_NS + "Prefix"))
+            token = root.findtext(S3_NS + "NextContinuationToken")
+            if max_keys or root.findtext(S3_NS + "IsTruncated") != "true" or not token:
+                return objects, prefixes
+
+    def read_directory(self, directory: str, ext: Extensions,
+                       recursive: bool) -> Tuple[List[ScannedFile], List[str]]:
+        key = self.key_of(directory).rstrip("/")
+        prefix = key + "/" if key else ""
+        objects, prefixes = self._run(self._list(prefix))
+        matches = suffix_matcher(ext)
+        files = [ScannedFile(self.url(name), size, mtime_ns / 1e9)
+                 for name, size, mtime_ns in objects
+                 if name != prefix and matches(name[len(prefix):])]
+        subdirs = [self.url(p.rstrip("/")) for p in prefixes] if recursive else []
+        return files, subdirs
+
+    def isdir(self, path: str) -> bool:
+        key = self.key_of(path).rstrip("/")
+        if not key:
+            response = self._run(self._request("HEAD", None))
+            if response.status == 404:
+                return False
+            if response.status != 200:
+                raise _error_for(response, path)
+            return True
+        try:
+            objects, prefixes = self._run(self._list(key + "/", max_keys=1))
+        except FileNotFoundError:
+            # No such bucket
+            return False
+        return bool(objects or prefixes)
+
+    async def _head(self, path: str) -> ObjectStat:
+        response = await self._request("HEAD", self.key_of(path))
+        if response.status != 200:
+            raise _error_for(response, path)
+        modified = parsedate_to_datetime(response.headers["last-modified"])
+        return ObjectStat(int(response.headers.get("content-length", 0)), int(modified.timestamp()) * 10**9)
+
+    def lstat(self, path: str) -> ObjectStat:
+        return self._run(self._head(path))
+
+    async def _copy(self, src: str, dst: str):
+        source = "/" + quote(self.bucket, safe=_UNRESERVED) + "/" + quote(self.key_of(src), safe="/" + _UNRESERVED)
+        response = await self._request("PUT", self.key_of(dst), headers={"x-amz-copy-source": source})
+        if response.status != 200 or _embedded_error(response):
+            raise _error_for(response, src)
+
+    async def _delete(self, path: str):
+        response = await self._request("DELETE", self.key_of(path))
+        if response.status not in (200, 204):
+            raise _error_for(response, path)
+
+    def copy(self, src: str, dst: str):
+        self._run(self._copy(src, dst))
+
+    def rename(self, src: str, dst: str):
+        async def rename():
+            await self._copy(src, dst)
+            await self._delete(src)
+        self._run(rename())
+
+    def delete(self, path: str):
+        self._run(self._delete(path))
+
+    def ordering_key(self, path: str) -> str:
+        # Objects do not share a directory inode: every key is independent
+        return path
@@ -0,0 +1,339 @@
+"""
+Single-pass directory scanner built on os.scandir.
+
+A scan produces a FilePlan holding each matching file together with the
+size and modification time taken from its DirEntry, so the preview and
+the conversion both work from the same walk without stat-ing files again.
+The files are held in a columnar FileTable rather than one tuple each.
+"""
+import contextlib
+import os
+import queue
+import threading
+from collections import deque
+from typing import AbstractSet, Callable, Deque, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .compact import FileTable
+
+# Worker threads used for recursive scans; directory reads on network
+# filesystems are latency bound, so this is well above the core count
+DEFAULT_SCAN_WORKERS = 8
+
+# Read directories through a descriptor, so each matching file is
+# stat-ed by name relative to it rather than by its full path
+SCAN_DIR_FD = os.scandir in os.supports_fd and hasattr(os, "O_DIRECTORY")
+
+# What a scan looks for: one extension, or a set of extensions matched
+# with a single suffix lookup per file name
+Extensions = Union[str, AbstractSet[str]]
+
+
+class ScannedFile(NamedTuple):
+    """A matching file and the metadata gathered while scanning"""
+    path: str
+    size: int
+    mtime: float
+
+
+class FilePlan:
+    """The result of scanning a folder for one extension (or a set of them)
+
+    files may be any iterable of ScannedFile or an already built FileTable;
+    iterating the plan yields ScannedFile tuples built on access.
+    """
+
+    def __init__(self, root: str, ext: Extensions, recursive: bool,
+                 files: Union[FileTable, Iterable[ScannedFile]]):
+        self.root = root
+        self.ext = ext
+        self.recursive = recursive
+        self.table = files if isinstance(files, FileTable) else file_table(files)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __iter__(self) -> Iterator[ScannedFile]:
+        return iter(self.table)
+
+    def __bool__(self) -> bool:
+        return len(self.table) > 0
+
+    @property
+    def files(self) -> List[ScannedFile]:
+        """The matching files as a list (built on each access)"""
+        return list(self.table)
+
+    @property
+    def paths(self) -> List[str]:
+        """Absolute paths of the matching files"""
+        return [self.table.path(i) for i in range(len(self.table))]
+
+    @property
+    def total_bytes(self) -> int:
+        """Combined size of the matching files"""
+        return self.table.total_bytes()
+
+    def matches(self, root: str, ext: Extensions, recursive: bool) -> bool:
+        """Whether this plan was produced for the given scan settings"""
+        return (self.root, self.ext, self.recursive) == (root, ext, recursive)
+
+    def display_name(self, scanned: ScannedFile) -> str:
+        """Name to show for a file: relative path when recursive"""
+        return display_name(scanned.path, self.root, self.recursive)
+
+
+def file_table(files: Iterable[ScannedFile]) -> FileTable:
+    """FileTable of the given files, read back as ScannedFile"""
+    table = FileTable(ScannedFile)
+    for f in files:
+        table.append(*f)
+    return table
+
+
+def display_name(path: str, root: str, recursive: bool) -> str:
+    """Name to show for a scanned file: relative path when recursive"""
+    if recursive:
+        return os.path.relpath(path, root)
+    return os.path.basename(path)
+
+
+def suffix_matcher(ext: Extensions) -> Callable[[str], bool]:
+    """Predicate telling whether a file name has the extension (or one of them)"""
+    if isinstance(ext, str):
+        return lambda name: name.endswith(ext)
+    suffixes = frozenset(ext)
+
+    def matches(name: str) -> bool:
+        dot = name.rfind(".")
+        return dot >= 0 and name[dot:] in suffixes
+    return matches
+
+
+@contextlib.contextmanager
+def scandir(directory: str, dir_fd: bool = SCAN_DIR_FD) -> Iterator[Iterator[os.DirEntry]]:
+    """os.scandir(directory), listed through a descriptor when dir_fd is set
+
+    Entries listed from a descriptor stat themselves relative to it, so
+    a deep path is resolved once per directory instead of once per file;
+    their .path is then only the name.
+    """
+    if not dir_fd:
+        with os.scandir(directory) as it:
+            yield it
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY | getattr(os, "O_CLOEXEC", 0))
+    try:
+        with os.scandir(fd) as it:
+            yield it
+    finally:
+        os.close(fd)
+
+
+def read_directory(directory: str, ext: Extensions, recursive: bool,
+                   dir_fd: bool = SCAN_DIR_FD) -> Tuple[List[ScannedFile], List[str]]:
+    """Matching files and (if recursive) subdirectories of one directory"""
+    matches = suffix_matcher(ext)
+    files: List[ScannedFile] = []
+    subdirs: List[str] = []
+    with scandir(directory, dir_fd) as it:
+        for entry in it:
+            try:
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(os.path.join(directory, entry.name))
+                elif matches(entry.name) and entry.is_file():
+                    st = entry.stat()
+                    files.append(ScannedFile(os.path.join(directory, entry.name), st.st_size, st.st_mtime))
+            except OSError:
+                # Entry vanished or became unreadable mid-scan
+                continue
+    return files, subdirs
+
+
+# Reads one directory for the walkers: (directory, ext(s), recursive) ->
+# (matching files, subdirectories). read_directory is the default; a
+# ScanCache supplies one that answers from its index when it can.
+DirectoryReader = Callable[[str, Extensions, bool], Tuple[List[ScannedFile], List[str]]]
+
+
+def iter_matching(root: str, ext: Extensions, recursive: bool = False,
+                  cancel: Optional[threading.Event] = None,
+                  reader: DirectoryReader = read_directory) -> Iterator[ScannedFile]:
+    """Yield files under root with extension ext, one directory read each
+
+    Subdirectories are not followed through symlinks and unreadable
+    subdirectories are skipped, matching os.walk. Errors reading root
+    itself are raised.
+    """
+    pending = [root]
+    while pending:
+        if cancel is not None and cancel.is_set():
+            return
+        directory = pending.pop()
+        try:
+            files, subdirs = reader(directory, ext, recursive)
+        except OSError:
+            if directory == root:
+                raise
+            continue
+        yield from files
+        # Reverse so subdirectories are visited in listing order
+        pending.extend(reversed(subdirs))
+
+
+class _WorkStealingQueue:
+    """Per-worker directory deques with stealing from the other end
+
+    Each worker pushes and pops its own deque LIFO, so it walks its
+    subtree depth-first with a small working set; idle workers steal the
+    oldest (shallowest, usually largest) directory from another worker.
+    """
+
+    def __init__(self, workers: int):
+        self._deques: List[Deque[str]] = [deque() for _ in range(workers)]
+        self._cond = threading.Condition()
+        self._outstanding = 0
+        self._closed = False
+
+    def push(self, worker: int, directories: List[str]):
+        if not directories:
+            return
+        with self._cond:
+            self._deques[worker].extend(reversed(directories))
+            self._outstanding += len(directories)
+            self._cond.notify(len(directories))
+
+    def get(self, worker: int) -> Optional[str]:
+        """Next directory for worker, or None once the walk is finished"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                own = self._deques[worker]
+                if own:
+                    return own.pop()
+                for other in self._deques:
+                    if other:
+                        return other.popleft()
+                if self._outstanding == 0:
+                    return None
+                self._cond.wait()
+
+    def task_done(self):
+        with self._cond:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def iter_matching_parallel(root: str, ext: Extensions, workers: int = DEFAULT_SCAN_WORKERS,
+                           cancel: Optional[threading.Event] = None,
+                           max_pending: int = 256,
+                           reader: DirectoryReader = read_directory) -> Iterator[ScannedFile]:
+    """Recursively yield matching files, reading directories on a thread pool
+
+    Results are streamed as each directory is read, in no particular
+    order. At most max_pending directory batches are buffered before the
+    workers wait for the consumer. Setting cancel (or closing the
+    generator) stops the workers after their current directory.
+    """
+    work = _WorkStealingQueue(workers)
+    results: "queue.Queue" = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    done = object()
+
+    def stopped() -> bool:
+        return stop.is_set() or (cancel is not None and cancel.is_set())
+
+    def put(item) -> bool:
+        while not stopped():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(index: int):
+        try:
+            while not stopped():
+                directory = work.get(index)
+                if directory is None:
+                    break
+                try:
+                    files, subdirs = reader(directory, ext, True)
+                except OSError as e:
+                    if directory == root:
+                        put(e)
+                else:
+                    work.push(index, subdirs)
+                    if files and not put(files):
+                        break
+                finally:
+                    work.task_done()
+        finally:
+            if stopped():
+                work.close()
+            results.put(done)
+
+    work.push(0, [root])
+    threads = [
+        threading.Thread(target=worker, args=(i,), daemon=True, name=f"extupdate-scan-{i}")
+        for i in range(workers)
+    ]
+    for t in threads:
+        t.start()
+
+    try:
+        finished = 0
+        while finished < workers:
+            item = results.get()
+            if item is done:
+                finished += 1
+            elif isinstance(item, OSError):
+                raise item
+            elif cancel is not None and cancel.is_set():
+                return
+            else:
+                yield from item
+    finally:
+        stop.set()
+        work.close()
+        # Drain so no worker stays blocked on a full queue
+        while any(t.is_alive() for t in threads):
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def iter_scan(root: str, ext: Extensions, recursive: bool = False, workers: int = 1,
+              cancel: Optional[threading.Event] = None,
+              reader: DirectoryReader = read_directory) -> Iterator[ScannedFile]:
+    """Stream matching files, in parallel for recursive multi-worker scans"""
+    if recursive and workers > 1:
+        return iter_matching_parallel(root, ext, workers, cancel, reader=reader)
+    return iter_matching(root, ext, recursive, cancel, reader)
+
+
+def make_plan(root: str, ext: Extensions, recursive: bool, files: Iterable[ScannedFile]) -> FilePlan:
+    """FilePlan from streamed files, sorted by directory and name so plans are stable"""
+    table = file_table(files)
+    table.sort()
+    return FilePlan(root, ext, recursive, table)
+
+
+def scan(root: str, ext: Extensions, recursive: bool = False, workers: int = 1,
+         cancel: Optional[threading.Event] = None,
+         reader: DirectoryReader = read_directory) -> FilePlan:
+    """Scan root once and return the resulting FilePlan
+
+    Recursive scans with more than one worker read directories in
+    parallel; the files are then sorted by directory and name so plans
+    are stable. Files go straight into the plan's table as they stream in.
+    """
+    return make_plan(root, ext, recursive, iter_scan(root, ext, recursive, workers, cancel, reader))
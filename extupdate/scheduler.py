@@ -0,0 +1,344 @@
+"""
+Multi-job scheduler: many conversions, over many roots, in one run.
+
+A manifest lists jobs, each a root with its own rules and options.
+Jobs run concurrently, each as an ordinary batch with its own journal
+and batch ID, all writing to one history store. How many jobs may run
+at once is limited per device (the st_dev of the root; each bucket or
+host of a remote root counts as one device), so a slow NAS only holds
+up the jobs on it and no single array is given more than its share.
+
+Whenever a job finishes, the highest priority waiting job whose device
+has a free slot starts next (manifest order among equal priorities).
+A job waiting for a busy device never holds up jobs on other devices.
+
+Manifests are JSON::
+
+    {"defaults": {"recursive": true, "backup": true, "jobs": 4},
+     "per_device": 1,
+     "device_limits": {"/mnt/nas2": 3},
+     "jobs": [
+        {"name": "finance", "root": "/mnt/nas1/finance", "from": ".xls", "to": ".xlsx",
+         "priority": 10},
+        {"root": "/mnt/nas2/hr", "rules": [{"from": ".xlt", "to": ".xltx"},
+                                           {"from": ".xls", "to": ".xlsx"}]}
+     ]}
+
+Job entries take the ConversionOptions fields ("from"/"to" standing in
+for source_ext/target_ext), over the manifest's defaults. Relative
+roots are relative to the manifest. device_limits are keyed by any path
+on the device.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, field, fields
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+from .cache import ScanCache
+from .control import BatchControl
+from .detect import SignatureCache
+from .engine import (
+    EVENT_STARTED,
+    ConversionEngine,
+    ConversionOptions,
+    ConversionResult,
+    ProgressCallback,
+    ProgressEvent,
+)
+from .history import HistoryStore
+from .metrics import Metrics
+from .storage import split_url
+
+# Jobs running at once on one device unless the manifest says otherwise
+DEFAULT_PER_DEVICE = 1
+
+_OPTION_FIELDS = frozenset(f.name for f in fields(ConversionOptions))
+
+
+def device_key(root: str) -> Hashable:
+    """What a root counts against for the per-device limits
+
+    The st_dev of a local root; (scheme, bucket or host) of a remote one.
+    """
+    parts = split_url(root)
+    if parts is not None:
+        return parts[:2]
+    return os.stat(root).st_dev
+
+
+@dataclass
+class Job:
+    """One conversion of a manifest"""
+    name: str
+    options: ConversionOptions
+    # Higher runs first
+    priority: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict, defaults: Optional[Dict] = None, base_dir: str = "") -> "Job":
+        """Job from a manifest entry over the manifest's defaults
+
+        A relative root is joined to base_dir (the manifest's directory).
+        """
+        values = dict(defaults or {})
+        values.update(data)
+        if "from" in values:
+            values["source_ext"] = values.pop("from")
+        if "to" in values:
+            values["target_ext"] = values.pop("to")
+        name = values.pop("name", None)
+        try:
+            priority = int(values.pop("priority", 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"Job priority must be a number: {data!r}")
+        if "root" not in values:
+            raise ValueError(f"Job is missing 'root': {data!r}")
+        name = name or values["root"]
+        # Before ConversionOptions, which makes a relative root absolute
+        # against the current directory
+        values["root"] = _resolve(values["root"], base_dir)
+        unknown = sorted(set(values) - _OPTION_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job settings {', '.join(unknown)}: {data!r}")
+        return cls(name, ConversionOptions.from_dict(values), priority)
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "priority": self.priority, "options": self.options.to_dict()}
+
+
+@dataclass
+class Manifest:
+    """The jobs of a run and the per-device limits they share"""
+    jobs: List[Job]
+    per_device: int = DEFAULT_PER_DEVICE
+    # Any path on a device -> jobs at once on that device
+    device_limits: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict, base_dir: str = "") -> "Manifest":
+        """Manifest from its JSON form; relative paths are joined to base_dir"""
+        if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+            raise ValueError("Manifest must be an object with a list of jobs")
+        defaults = data.get("defaults") or {}
+        jobs = []
+        for entry in data["jobs"]:
+            if not isinstance(entry, dict):
+                raise ValueError(f"Job must be an object: {entry!r}")
+            jobs.append(Job.from_dict(entry, defaults, base_dir))
+        if not jobs:
+            raise ValueError("Manifest has no jobs")
+        limits = {_resolve(path, base_dir): int(limit)
+                  for path, limit in (data.get("device_limits") or {}).items()}
+        return cls(jobs, int(data.get("per_device", DEFAULT_PER_DEVICE)), limits)
+
+    @classmethod
+    def load(cls, path: str) -> "Manifest":
+        """Load a JSON manifest file"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.from_dict(data, os.path.dirname(os.path.abspath(path)))
+
+    def validate(self):
+        """Raise ValueError if the limits or job names cannot be used
+
+        Each job's options are validated when it starts, so one
+        unreachable root fails only its own job.
+        """
+        if self.per_device < 1 or any(limit < 1 for limit in self.device_limits.values()):
+            raise ValueError("Device limits must be at least 1")
+        names = set()
+        for job in self.jobs:
+            if job.name in names:
+                raise ValueError(f"Two jobs are named {job.name!r}")
+            names.add(job.name)
+
+
+def _resolve(path: str, base_dir: str) -> str:
+    if not base_dir or split_url(path) is not None:
+        return path
+    return os.path.join(base_dir, os.path.expanduser(path))
+
+
+@dataclass
+class JobResult:
+    """Outcome of one job; result.errors holds the reason if it could not run"""
+    job: Job
+    result: ConversionResult
+    # Whether the job was never started (the run was cancelled first)
+    skipped: bool = False
+
+    def to_dict(self) -> Dict:
+        data = self.result.to_dict()
+        data.update(name=self.job.name, root=self.job.options.root,
+                    conversion=self.job.options.describe(), priority=self.job.priority,
+                    not_started=self.skipped)
+        return data
+
+
+def merge_results(results: Sequence[JobResult]) -> ConversionResult:
+    """One ConversionResult for a whole run, with messages prefixed by job name"""
+    merged = ConversionResult()
+    for job_result in results:
+        name, result = job_result.job.name, job_result.result
+        merged.converted += result.converted
+        merged.total += result.total
+        merged.dry_run = merged.dry_run or result.dry_run
+        merged.cancelled = merged.cancelled or result.cancelled or job_result.skipped
+        merged.errors.extend(f"{name}: {message}" for message in result.errors)
+        merged.conflicts.extend(f"{name}: {message}" for message in result.conflicts)
+        merged.skipped.extend(f"{name}: {message}" for message in result.skipped)
+        for strategy, count in result.backups.items():
+            merged.backups[strategy] = merged.backups.get(strategy, 0) + count
+    return merged
+
+
+@dataclass
+class ScheduleResult:
+    """Per-job outcomes of a run, in manifest order"""
+    jobs: List[JobResult]
+
+    def summary(self) -> ConversionResult:
+        return merge_results(self.jobs)
+
+    def to_dict(self) -> Dict:
+        data = self.summary().to_dict()
+        del data["batch"]
+        data["jobs"] = [job.to_dict() for job in self.jobs]
+        return data
+
+
+class _Progress:
+    """Forwards the progress of every running job as one batch
+
+    total grows as jobs are planned; index is the file's position within
+    its own job.
+    """
+
+    def __init__(self, progress: ProgressCallback):
+        self.progress = progress
+        self.total = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def add(self, files: int):
+        with self._lock:
+            self.total += files
+
+    def __call__(self, event: ProgressEvent):
+        with self._lock:
+            if event.kind != EVENT_STARTED:
+                self.completed += 1
+            total, completed = self.total, self.completed
+        self.progress(ProgressEvent(event.kind, event.index, total, event.path, completed, event.error))
+
+
+class JobScheduler:
+    """Run a manifest's jobs concurrently within per-device limits
+
+    All jobs share the history store, caches, metrics and control:
+    cancelling the control stops the running jobs between files (their
+    journals are kept for resume) and starts no more.
+    """
+
+    def __init__(self, manifest: Manifest, history: Optional[HistoryStore] = None,
+                 journal_dir: Optional[str] = None, cache: Optional[ScanCache] = None,
+                 signatures: Optional[SignatureCache] = None, control: Optional[BatchControl] = None,
+                 metrics: Optional[Metrics] = None, max_jobs: int = 0):
+        self.manifest = manifest
+        self.history = history
+        self.journal_dir = journal_dir
+        self.cache = cache
+        self.signatures = signatures
+        self.control = control
+        self.metrics = metrics
+        # Jobs running at once over all devices; 0 for no limit
+        self.max_jobs = max_jobs
+        self._cond = threading.Condition()
+        self._running: Dict[Hashable, int] = {}
+        self._limits: Dict[Hashable, int] = {}
+
+    def limit_for(self, device: Hashable) -> int:
+        return self._limits.get(device, self.manifest.per_device)
+
+    def run(self, progress: Optional[ProgressCallback] = None,
+            on_job: Optional[Callable[[JobResult], None]] = None) -> ScheduleResult:
+        """Run every job and return their results
+
+        on_job, if given, is called with each JobResult as its job
+        finishes (from the job's thread).
+        """
+        for path, limit in self.manifest.device_limits.items():
+            self._limits[device_key(path)] = limit
+        jobs = self.manifest.jobs
+        results: List[Optional[JobResult]] = [None] * len(jobs)
+        devices: Dict[int, Hashable] = {}
+        for i, job in enumerate(jobs):
+            try:
+                devices[i] = device_key(job.options.root)
+            except OSError as e:
+                results[i] = JobResult(job, ConversionResult(errors=[f"Cannot read {job.options.root}: {e}"]))
+        # Highest priority first; sorted() keeps manifest order among equals
+        waiting = sorted(devices, key=lambda i: -jobs[i].priority)
+        forward = _Progress(progress) if progress is not None else None
+        threads = []
+        active = 0
+
+        def finished(i: int, result: JobResult):
+            nonlocal active
+            results[i] = result
+            with self._cond:
+                self._running[devices[i]] -= 1
+                active -= 1
+                self._cond.notify_all()
+            if on_job is not None:
+                on_job(result)
+
+        def worker(i: int):
+            finished(i, JobResult(jobs[i], self._run_job(jobs[i], forward)))
+
+        with self._cond:
+            while waiting:
+                if self.control is not None and self.control.cancelled:
+                    break
+                i = self._next(waiting, devices, active)
+                if i is None:
+                    # Every waiting job's device (or the run) is full
+                    self._cond.wait(0.5)
+                    continue
+                waiting.remove(i)
+                self._running[devices[i]] = self._running.get(devices[i], 0) + 1
+                active += 1
+                thread = threading.Thread(target=worker, args=(i,), daemon=True,
+                                          name=f"extupdate-job-{i}")
+                threads.append(thread)
+                thread.start()
+        for thread in threads:
+            thread.join()
+        for i in waiting:
+            results[i] = JobResult(jobs[i], ConversionResult(), skipped=True)
+        return ScheduleResult(results)
+
+    def _next(self, waiting: List[int], devices: Dict[int, Hashable], active: int) -> Optional[int]:
+        """First waiting job that may start now (with the condition held)"""
+        if self.max_jobs and active >= self.max_jobs:
+            return None
+        for i in waiting:
+            device = devices[i]
+            if self._running.get(device, 0) < self.limit_for(device):
+                return i
+        return None
+
+    def _run_job(self, job: Job, progress: Optional[_Progress]) -> ConversionResult:
+        try:
+            job.options.validate()
+            engine = ConversionEngine(job.options, self.history, journal_dir=self.journal_dir,
+                                      cache=self.cache, signatures=self.signatures,
+                                      control=self.control, metrics=self.metrics)
+            plan = engine.plan()
+            if progress is not None:
+                progress.add(len(plan))
+            return engine.execute(plan, progress)
+        except Exception as e:
+            # Reported as the job's error; the other jobs carry on
+            return ConversionResult(errors=[str(e)], dry_run=job.options.dry_run)
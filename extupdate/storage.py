@@ -0,0 +1,171 @@
+"""
+Storage backends: where the files of a conversion live.
+
+The engine lists, stats, copies, renames and deletes files through a
+StorageBackend. LocalStorage, the default, makes the same os calls the
+engine always made, and the engine keeps its local fast paths (scan
+cache, directory-relative operations, hard-link and reflink backups)
+for it.
+
+Other backends are picked by the scheme of the root, such as
+s3://bucket/prefix (see s3.S3Storage). Paths on them keep the same
+form, scheme included, so history and journals record them as they
+are. Further schemes can be added with register_backend().
+"""
+import os
+import re
+import shutil
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .executor import directory_key
+from .scanner import Extensions, ScannedFile, read_directory
+
+# "scheme://" at the start of a path; two letters at least, so Windows
+# drive letters never match
+_URL = re.compile(r"^([A-Za-z][A-Za-z0-9+.-]+)://")
+
+
+class StorageBackend:
+    """Operations the engine needs from a place files are stored
+
+    Methods are called from executor and scanner worker threads. Errors
+    are raised as OSError, FileNotFoundError for missing files.
+    """
+
+    # True for the local filesystem, where the engine uses os directly
+    # for what it can do better than these methods
+    local = False
+    # Files to process at once when the command line does not say
+    default_jobs = 1
+
+    def read_directory(self, directory: str, ext: Extensions,
+                       recursive: bool) -> Tuple[List[ScannedFile], List[str]]:
+        """List one directory, as scanner.read_directory does"""
+        raise NotImplementedError
+
+    def isdir(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def lstat(self, path: str):
+        """Stat of path, without following symlinks
+
+        Anything with st_mode, st_size, st_mtime and st_mtime_ns will do.
+        """
+        raise NotImplementedError
+
+    def exists(self, path: str) -> bool:
+        try:
+            self.lstat(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def copy(self, src: str, dst: str):
+        """Copy src to dst, replacing dst"""
+        raise NotImplementedError
+
+    def rename(self, src: str, dst: str):
+        """Move src to dst, replacing dst"""
+        raise NotImplementedError
+
+    def delete(self, path: str):
+        raise NotImplementedError
+
+    def ordering_key(self, path: str) -> str:
+        """Files with the same key are processed one at a time, in plan order"""
+        return directory_key(path)
+
+    def close(self):
+        """Release connections; the backend must not be used afterwards"""
+
+
+class LocalStorage(StorageBackend):
+    """The local filesystem (and anything mounted into it)"""
+
+    local = True
+
+    def read_directory(self, directory: str, ext: Extensions,
+                       recursive: bool) -> Tuple[List[ScannedFile], List[str]]:
+        return read_directory(directory, ext, recursive)
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def lstat(self, path: str) -> os.stat_result:
+        return os.lstat(path)
+
+    def exists(self, path: str) -> bool:
+        return os.path.lexists(path)
+
+    def copy(self, src: str, dst: str):
+        shutil.copy2(src, dst)
+
+    def rename(self, src: str, dst: str):
+        os.replace(src, dst)
+
+    def delete(self, path: str):
+        os.unlink(path)
+
+
+LOCAL = LocalStorage()
+
+# Builds the backend for a scheme from the location part of a URL (the
+# bucket or host: "bucket" for s3://bucket/key)
+BackendFactory = Callable[[str], StorageBackend]
+
+
+def _open_s3(location: str) -> StorageBackend:
+    # Imported here: asyncio and ssl are only needed for remote storage
+    from .s3 import S3Storage
+    return S3Storage.from_environment(location)
+
+
+_FACTORIES: Dict[str, BackendFactory] = {"s3": _open_s3}
+_open: Dict[Tuple[str, str], StorageBackend] = {}
+_open_lock = threading.Lock()
+
+
+def register_backend(scheme: str, factory: BackendFactory):
+    """Use factory for paths starting with scheme:// (replacing any earlier one)"""
+    with _open_lock:
+        _FACTORIES[scheme.lower()] = factory
+
+
+def split_url(path: str) -> Optional[Tuple[str, str, str]]:
+    """(scheme, location, key) of a URL path; None for a local path
+
+    The key has no leading slash: s3://bucket/a/b.xls gives
+    ("s3", "bucket", "a/b.xls").
+    """
+    match = _URL.match(path)
+    if match is None:
+        return None
+    location, _, key = path[match.end():].partition("/")
+    return match.group(1).lower(), location, key
+
+
+def is_remote(path: str) -> bool:
+    return _URL.match(path) is not None
+
+
+def open_storage(path: str) -> StorageBackend:
+    """The backend holding path, shared by every caller for the same location"""
+    parts = split_url(path)
+    if parts is None:
+        return LOCAL
+    scheme, location, _ = parts
+    with _open_lock:
+        backend = _open.get((scheme, location))
+        if backend is not None:
+            return backend
+        factory = _FACTORIES.get(scheme)
+    if factory is None:
+        raise ValueError(f"No storage backend for {scheme}:// paths")
+    backend = factory(location)
+    with _open_lock:
+        # Another thread may have opened it meanwhile; keep the first
+        existing = _open.setdefault((scheme, location), backend)
+    if existing is not backend:
+        backend.close()
+    return existing
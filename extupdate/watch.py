@@ -0,0 +1,410 @@
+"""
+Watch mode: convert files as they arrive in a folder.
+
+A WatchDaemon converts what is already in the folder, then waits for
+filesystem events and converts new matching files in small batches
+through the same engine (backups, journal, history) as a one-off run.
+
+Events come from inotify on Linux. Elsewhere, or when inotify cannot be
+used (for example when the per-user watch limit is reached), the folder
+is polled instead: an in-memory ScanCache re-reads only directories whose
+modification time changed, so each poll costs one stat per directory.
+
+A file is converted once it has stopped changing: its size and mtime
+must be the same at the end of a quiet period as when its last event
+arrived. Quiet periods end on ticks of a quarter of their length, so
+files copied in together become ready together and go into one batch.
+While idle the daemon blocks in select() with no timeout (or sleeps
+between polls), so it uses no CPU.
+"""
+import errno
+import math
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache import ScanCache
+from .engine import ConversionEngine, ConversionResult, ProgressCallback
+from .scanner import Extensions, iter_matching, suffix_matcher
+
+# Seconds a file must stay unchanged before it is converted
+DEFAULT_QUIET_SECONDS = 2.0
+# Seconds between scans when polling
+DEFAULT_POLL_INTERVAL = 5.0
+
+WATCH_INOTIFY = "inotify"
+WATCH_POLLING = "polling"
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE_SELF | IN_ONLYDIR)
+INOTIFY_EVENT = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+# A file's identity for the quiet-period check: (size, mtime)
+Fingerprint = Tuple[int, float]
+
+# Called with the result of every batch the daemon runs
+BatchCallback = Callable[[ConversionResult], None]
+
+
+class _Watcher:
+    """Base for watchers: a pipe that wakes a waiting watcher from another thread"""
+
+    method = ""
+
+    def __init__(self):
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+
+    def wake(self):
+        """Make a pending wait() return now (safe from signal handlers)"""
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            # Already woken
+            pass
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _select(self, fds: List[int], timeout: Optional[float]) -> List[int]:
+        ready, _, _ = select.select(fds + [self._wake_read], [], [], timeout)
+        if self._wake_read in ready:
+            self._drain_wake()
+        return ready
+
+    def close(self):
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+
+class InotifyWatcher(_Watcher):
+    """Changed files reported by Linux inotify"""
+
+    method = WATCH_INOTIFY
+
+    def __init__(self, root: str, recursive: bool):
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, f"inotify_init1: {os.strerror(code)}")
+        self._ctypes = ctypes
+        self.fd = fd
+        self.root = root
+        self.recursive = recursive
+        # Watch descriptor -> directory
+        self._dirs: Dict[int, str] = {}
+        super().__init__()
+        try:
+            self._watch_tree(root, strict=True)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, directory: str, strict: bool = False) -> bool:
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            code = self._ctypes.get_errno()
+            if strict or code == errno.ENOSPC:
+                # Out of watches: the caller falls back to polling
+                raise OSError(code, f"inotify_add_watch {directory}: {os.strerror(code)}")
+            # Vanished or unreadable subdirectory
+            return False
+        # A directory moved within the tree keeps its descriptor
+        self._dirs[wd] = directory
+        return True
+
+    def _watch_tree(self, directory: str, strict: bool = False) -> List[str]:
+        """Watch directory (and, recursively, its subdirectories); returns the files already in them"""
+        files = []
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            if not self._watch(current, strict and current == directory):
+                continue
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if self.recursive:
+                                    pending.append(entry.path)
+                            else:
+                                files.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return files
+
+    def _unwatch_tree(self, directory: str):
+        """Stop watching a directory moved away, and everything below it"""
+        prefix = directory + os.sep
+        for wd, path in list(self._dirs.items()):
+            if path == directory or path.startswith(prefix):
+                del self._dirs[wd]
+                self._rm_watch(self.fd, wd)
+
+    def wait(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        """Paths changed since the last call, empty after timeout or wake()
+
+        None means events were lost (queue overflow) and the whole tree
+        must be rescanned.
+        """
+        if self.fd not in self._select([self.fd], timeout):
+            return set()
+        changed: Set[str] = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + name_len].rstrip(b"\0")
+                offset += name_len
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                directory = self._dirs.get(wd)
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    if directory == self.root:
+                        # The folder itself is gone; a rescan reports it
+                        overflow = True
+                    continue
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if not self.recursive:
+                        continue
+                    if mask & IN_MOVED_FROM:
+                        # Re-added by IN_MOVED_TO if it moved within the tree
+                        self._unwatch_tree(path)
+                    elif mask & (IN_CREATE | IN_MOVED_TO):
+                        # Files may have arrived before the watch was added
+                        changed.update(self._watch_tree(path))
+                elif not mask & IN_MOVED_FROM:
+                    changed.add(path)
+        return None if overflow else changed
+
+    def close(self):
+        os.close(self.fd)
+        super().close()
+
+
+class PollingWatcher(_Watcher):
+    """Changed files found by rescanning every poll_interval seconds"""
+
+    method = WATCH_POLLING
+
+    def __init__(self, root: str, recursive: bool, ext: Extensions,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        super().__init__()
+        self.root = root
+        self.recursive = recursive
+        self.ext = ext
+        self.poll_interval = poll_interval
+        # In memory only (never saved); directories are re-read when their mtime changes
+        self._cache = ScanCache(os.devnull, revalidate_after=0)
+        self._seen: Dict[str, Fingerprint] = self._scan()
+        self._next_poll = time.monotonic() + poll_interval
+
+    def _scan(self) -> Dict[str, Fingerprint]:
+        try:
+            return {f.path: (f.size, f.mtime)
+                    for f in iter_matching(self.root, self.ext, self.recursive, reader=self._cache.read_directory)}
+        except OSError:
+            return {}
+
+    def wait(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        """Paths added or changed since the last poll; empty after timeout or wake()"""
+        until_poll = max(self._next_poll - time.monotonic(), 0)
+        if timeout is not None and timeout < until_poll:
+            self._select([], timeout)
+            return set()
+        if self._select([], until_poll):
+            # Woken up before the poll was due
+            return set()
+        current = self._scan()
+        self._next_poll = time.monotonic() + self.poll_interval
+        changed = {path for path, fingerprint in current.items() if self._seen.get(path) != fingerprint}
+        self._seen = current
+        return changed
+
+
+def make_watcher(root: str, recursive: bool, ext: Extensions, polling: bool = False,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """An inotify watcher where possible, else a polling one"""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, recursive)
+        except (OSError, AttributeError):
+            # No inotify (or out of watches): poll instead
+            pass
+    return PollingWatcher(root, recursive, ext, poll_interval)
+
+
+def fingerprint(path: str) -> Optional[Fingerprint]:
+    """(size, mtime) of a regular file, None if it is missing or not a file"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_size, st.st_mtime
+
+
+class WatchDaemon:
+    """Convert matching files under the engine's root as they arrive
+
+    run() converts the files already present, then blocks waiting for
+    events until stop() is called. Files are converted once they have
+    not changed for quiet seconds, in batches of every file that became
+    ready at the same time.
+    """
+
+    def __init__(self, engine: ConversionEngine, quiet: float = DEFAULT_QUIET_SECONDS,
+                 polling: bool = False, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 on_batch: Optional[BatchCallback] = None, progress: Optional[ProgressCallback] = None):
+        self.engine = engine
+        self.quiet = quiet
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.on_batch = on_batch
+        self.progress = progress
+        self.batches = 0
+        self.converted = 0
+        self.watcher = None
+        options = engine.options
+        self._matches = suffix_matcher(options.extensions())
+        # Files waiting for their quiet period: path -> (deadline, fingerprint)
+        self._pending: Dict[str, Tuple[float, Fingerprint]] = {}
+        self._stopped = threading.Event()
+
+    def stop(self):
+        """Stop after the file in progress; safe from signal handlers"""
+        self._stopped.set()
+        if self.engine.control is not None:
+            self.engine.control.cancel()
+        if self.watcher is not None:
+            self.watcher.wake()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    @property
+    def method(self) -> str:
+        """How changes are detected: inotify or polling"""
+        return self.watcher.method if self.watcher is not None else ""
+
+    def run(self):
+        """Convert existing files, then watch until stop()"""
+        options = self.engine.options
+        ext = options.extensions()
+        # Watch first, so files arriving during the initial scan are not missed
+        self.watcher = make_watcher(options.root, options.recursive, ext, self.polling, self.poll_interval)
+        try:
+            self._add_all()
+            while not self.stopped:
+                changed = self.watcher.wait(self._timeout())
+                if changed is None:
+                    self._add_all()
+                else:
+                    self._add(path for path in changed if self._matches(os.path.basename(path)))
+                ready = self._ready()
+                if ready and not self.stopped:
+                    self._convert(ready)
+        finally:
+            self.watcher.close()
+
+    def _add_all(self):
+        """Queue every matching file in the tree (start-up, or after lost events)"""
+        self._add(f.path for f in self.engine.scan())
+
+    def _deadline(self, now: float) -> float:
+        """End of a quiet period starting now, rounded up to the next tick"""
+        tick = self.quiet / 4
+        if tick <= 0:
+            return now
+        return math.ceil((now + self.quiet) / tick) * tick
+
+    def _add(self, paths: Iterable[str]):
+        deadline = self._deadline(time.monotonic())
+        for path in paths:
+            current = fingerprint(path)
+            if current is None:
+                self._pending.pop(path, None)
+            else:
+                self._pending[path] = (deadline, current)
+
+    def _timeout(self) -> Optional[float]:
+        """Seconds until the next quiet period ends; None to wait for events"""
+        if not self._pending:
+            return None
+        return max(min(deadline for deadline, _ in self._pending.values()) - time.monotonic(), 0)
+
+    def _ready(self) -> List[str]:
+        """Files whose quiet period ended without a change, removed from pending"""
+        now = time.monotonic()
+        ready = []
+        for path, (deadline, previous) in list(self._pending.items()):
+            if deadline > now:
+                continue
+            current = fingerprint(path)
+            if current is None:
+                del self._pending[path]
+            elif current == previous:
+                del self._pending[path]
+                ready.append(path)
+            else:
+                # Still being written
+                self._pending[path] = (self._deadline(now), current)
+        ready.sort()
+        return ready
+
+    def _convert(self, paths: List[str]):
+        engine = self.engine
+        plan = engine.plan(paths)
+        if not plan and not engine.skipped:
+            return
+        result = engine.execute(plan, self.progress)
+        self.batches += 1
+        self.converted += result.converted
+        if self.on_batch is not None:
+            self.on_batch(result)
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from extupdate.engine import ConversionEngine, ConversionOptions
+from extupdate.history import HistoryStore
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """A folder of .xls files, each with its own contents"""
+    root = tmp_path / "reports"
+    root.mkdir()
+    for i in range(3):
+        (root / f"book{i}.xls").write_bytes(f"workbook {i}".encode() * 100)
+    return root
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path / "journal")
+
+
+def contents(root) -> dict:
+    """File name -> bytes for everything in root"""
+    return {name: (root / name).read_bytes() for name in sorted(os.listdir(root))}
+
+
+def convert(root, history, journal_dir, **options):
+    options.setdefault("source_ext", ".xls")
+    options.setdefault("target_ext", ".xlsx")
+    engine = ConversionEngine(ConversionOptions(root=str(root), **options), history, journal_dir=journal_dir)
+    return engine.execute(engine.plan())
+
+
+def undo(batch_id, history, journal_dir):
+    engine = ConversionEngine(ConversionOptions(root=os.getcwd(), backup=False), history,
+                              journal_dir=journal_dir)
+    return engine.undo(batch_id)
@@ -0,0 +1,87 @@
+import errno
+import os
+import shutil
+
+import pytest
+
+from extupdate import backup as backup_module
+from extupdate.backup import (
+    BACKUP_AUTO,
+    BACKUP_HARDLINK,
+    BACKUP_KERNEL_COPY,
+    BackupManager,
+    copy,
+    kernel_copy,
+    reflink,
+)
+from extupdate.dirfd import PATHS, open_directory
+
+COPIES = [copy, kernel_copy, reflink]
+
+
+def backup(function, folder, use_fd: bool):
+    """Back up folder/a with function, by full path or relative to the open folder"""
+    directory = open_directory(str(folder)) if use_fd else PATHS
+    src = "a" if use_fd else str(folder / "a")
+    try:
+        function(src, src + ".backup", directory)
+    except OSError as e:
+        if function is reflink and e.errno in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL):
+            pytest.skip("no reflink support here")
+        raise
+    finally:
+        if directory.fd is not None:
+            os.close(directory.fd)
+
+
+@pytest.mark.parametrize("use_fd", [False, True])
+@pytest.mark.parametrize("function", COPIES)
+def test_old_backup_is_replaced_not_overwritten(tmp_path, function, use_fd):
+    (tmp_path / "a").write_bytes(b"new contents")
+    (tmp_path / "a.backup").write_bytes(b"old")
+    os.link(tmp_path / "a.backup", tmp_path / "elsewhere")
+
+    backup(function, tmp_path, use_fd)
+
+    assert (tmp_path / "a.backup").read_bytes() == b"new contents"
+    assert (tmp_path / "elsewhere").read_bytes() == b"old"
+
+
+@pytest.mark.parametrize("use_fd", [False, True])
+@pytest.mark.parametrize("function", COPIES)
+def test_backup_linked_to_source_is_refused(tmp_path, function, use_fd):
+    (tmp_path / "a").write_bytes(b"original")
+    os.link(tmp_path / "a", tmp_path / "a.backup")
+
+    with pytest.raises(shutil.SameFileError):
+        backup(function, tmp_path, use_fd)
+    assert (tmp_path / "a").read_bytes() == b"original"
+
+
+def test_auto_falls_back_after_remembered_strategy_fails(tmp_path, monkeypatch):
+    manager = BackupManager(BACKUP_AUTO)
+    (tmp_path / "a").write_bytes(b"a")
+    (tmp_path / "b").write_bytes(b"b")
+    assert manager.backup(str(tmp_path / "a")) == BACKUP_HARDLINK
+
+    def at_link_limit(src, dst):
+        raise OSError(errno.EMLINK, "Too many links")
+    monkeypatch.setattr(os, "link", at_link_limit)
+
+    assert manager.backup(str(tmp_path / "b")) != BACKUP_HARDLINK
+    assert (tmp_path / "b.backup").read_bytes() == b"b"
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        BackupManager("tape")
+
+
+def test_explicit_strategy_falls_back_to_copy(tmp_path, monkeypatch):
+    def unsupported(src, dst, directory):
+        raise OSError(errno.ENOSYS, "no in-kernel copy available")
+    monkeypatch.setitem(backup_module._STRATEGY_FUNCS, BACKUP_KERNEL_COPY, unsupported)
+    (tmp_path / "a").write_bytes(b"a")
+    manager = BackupManager(BACKUP_KERNEL_COPY)
+    assert manager.backup(str(tmp_path / "a")) == "copy"
+    assert manager.used == {"copy": 1}
@@ -0,0 +1,57 @@
+import os
+import time
+
+from extupdate.cache import ScanCache
+
+
+def age(path, seconds=60):
+    """Backdate path's mtime, out of the cache's racy window"""
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def names(cache, folder, ext=".xls"):
+    files, _ = cache.read_directory(str(folder), ext, False)
+    return sorted(os.path.basename(f.path) for f in files)
+
+
+def test_listing_is_reused_until_the_directory_changes(tmp_path):
+    (tmp_path / "a.xls").write_bytes(b"")
+    age(tmp_path)
+    cache = ScanCache(str(tmp_path / "cache.json"))
+
+    assert names(cache, tmp_path) == ["a.xls"]
+    assert names(cache, tmp_path) == ["a.xls"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Another process adds a file: seen on the very next scan
+    (tmp_path / "b.xls").write_bytes(b"")
+    assert names(cache, tmp_path) == ["a.xls", "b.xls"]
+
+
+def test_invalidate_drops_trusted_listings(tmp_path):
+    (tmp_path / "a.xls").write_bytes(b"")
+    age(tmp_path)
+    cache = ScanCache(str(tmp_path / "cache.json"), revalidate_after=30)
+    assert names(cache, tmp_path) == ["a.xls"]
+
+    os.rename(tmp_path / "a.xls", tmp_path / "a.xlsx")
+    age(tmp_path)
+    assert names(cache, tmp_path) == ["a.xls"]
+    cache.invalidate([str(tmp_path)])
+    assert names(cache, tmp_path) == []
+
+
+def test_index_survives_a_reload(tmp_path):
+    folder = tmp_path / "d"
+    folder.mkdir()
+    (folder / "a.xls").write_bytes(b"")
+    age(folder)
+    cache = ScanCache(str(tmp_path / "cache.json"))
+    names(cache, folder)
+    cache.save()
+
+    reloaded = ScanCache(str(tmp_path / "cache.json"))
+    reloaded.load()
+    assert names(reloaded, folder) == ["a.xls"]
+    assert (reloaded.hits, reloaded.misses) == (1, 0)
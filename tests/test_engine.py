@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from extupdate.backup import BACKUP_STRATEGIES, BACKUP_HARDLINK, BACKUP_JOURNAL, backup_path
+from extupdate.cache import ScanCache
+from extupdate.engine import ConversionEngine, ConversionOptions
+
+from conftest import contents, convert, undo
+
+
+@pytest.mark.parametrize("strategy", BACKUP_STRATEGIES)
+def test_convert_undo_convert(folder, history, journal_dir, strategy):
+    original = contents(folder)
+
+    result = convert(folder, history, journal_dir, backup_strategy=strategy)
+    assert (result.converted, result.errors) == (3, [])
+    for name, data in original.items():
+        assert (folder / (name[:-4] + ".xlsx")).read_bytes() == data
+        if strategy != BACKUP_JOURNAL:
+            assert (folder / backup_path(name)).read_bytes() == data
+
+    reverted = undo(result.batch_id, history, journal_dir)
+    assert (reverted.converted, reverted.errors, reverted.conflicts) == (3, [], [])
+    for name, data in original.items():
+        assert (folder / name).read_bytes() == data
+
+    again = convert(folder, history, journal_dir, backup_strategy=strategy)
+    assert (again.converted, again.errors) == (3, [])
+    for name, data in original.items():
+        assert (folder / (name[:-4] + ".xlsx")).read_bytes() == data
+
+
+@pytest.mark.parametrize("strategy", ["reflink", "kernel-copy", "copy"])
+def test_copying_backup_after_hardlink_undo_keeps_contents(folder, history, journal_dir, strategy):
+    original = contents(folder)
+    result = convert(folder, history, journal_dir, backup_strategy=BACKUP_HARDLINK)
+    undo(result.batch_id, history, journal_dir)
+
+    # Each backup is now the restored file's own inode: writing a copy
+    # into it would truncate the original
+    again = convert(folder, history, journal_dir, backup_strategy=strategy)
+
+    assert again.converted == 0
+    assert len(again.errors) == 3 and all("same file" in error for error in again.errors)
+    for name, data in original.items():
+        assert (folder / name).read_bytes() == data
+        assert (folder / backup_path(name)).read_bytes() == data
+
+
+def test_dry_run_changes_nothing(folder, history, journal_dir):
+    original = contents(folder)
+    result = convert(folder, history, journal_dir, dry_run=True)
+    assert result.converted == 3
+    assert contents(folder) == original
+    assert not os.path.exists(journal_dir) or not os.listdir(journal_dir)
+
+
+def test_existing_target_is_not_replaced(folder, history, journal_dir):
+    (folder / "book0.xlsx").write_bytes(b"keep me")
+    result = convert(folder, history, journal_dir)
+    assert result.converted == 2
+    assert (folder / "book0.xlsx").read_bytes() == b"keep me"
+    assert (folder / "book0.xls").exists()
+
+
+def test_relative_root_is_recorded_absolute(folder, history, journal_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(folder.parent)
+    result = convert(folder.name, history, journal_dir, backup=False)
+    assert result.converted == 3
+
+    # Undo from somewhere else entirely
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    reverted = undo(result.batch_id, history, journal_dir)
+    assert reverted.converted == 3
+    assert sorted(os.listdir(folder)) == ["book0.xls", "book1.xls", "book2.xls"]
+
+
+def test_rescan_after_convert_lists_new_names(folder, history, journal_dir, tmp_path):
+    cache = ScanCache(str(tmp_path / "cache.json"), revalidate_after=30)
+    options = ConversionOptions(root=str(folder), source_ext=".xls", target_ext=".xlsx", backup=False)
+    engine = ConversionEngine(options, history, journal_dir=journal_dir, cache=cache)
+    assert len(engine.scan()) == 3
+    engine.execute(engine.plan())
+
+    assert len(engine.scan()) == 0
+    rescan = ConversionEngine(ConversionOptions(root=str(folder), source_ext=".xlsx", target_ext=".xls"),
+                              cache=cache)
+    assert len(rescan.scan()) == 3
@@ -0,0 +1,80 @@
+import os
+
+from extupdate.control import BatchControl
+from extupdate.engine import EVENT_CONVERTED, ConversionEngine, ConversionOptions
+from extupdate.journal import JOURNAL_SUFFIX, BatchJournal, pending_journals
+
+from conftest import contents
+
+
+def interrupted_batch(folder, history, journal_dir):
+    """Convert folder, stopping after the first file"""
+    control = BatchControl()
+
+    def progress(event):
+        if event.kind == EVENT_CONVERTED:
+            control.cancel()
+
+    options = ConversionOptions(root=str(folder), source_ext=".xls", target_ext=".xlsx")
+    engine = ConversionEngine(options, history, journal_dir=journal_dir, control=control)
+    result = engine.execute(engine.plan(), progress)
+    assert result.cancelled and result.converted == 1
+    return result
+
+
+def test_resume_finishes_an_interrupted_batch(folder, history, journal_dir):
+    original = contents(folder)
+    batch = interrupted_batch(folder, history, journal_dir)
+
+    journals = pending_journals(journal_dir)
+    assert [journal.batch_id for journal in journals] == [batch.batch_id]
+    result = ConversionEngine.for_journal(journals[0], history).resume(journals[0])
+
+    assert (result.converted, result.errors) == (3, [])
+    assert pending_journals(journal_dir) == []
+    for name, data in original.items():
+        assert (folder / (name[:-4] + ".xlsx")).read_bytes() == data
+    # Every file of the batch is in the history exactly once
+    entries = history.search()
+    assert sorted(entry["old_path"] for entry in entries if entry["batch"] == batch.batch_id) == \
+        sorted(str(folder / name) for name in original)
+
+
+def test_rollback_restores_original_names(folder, history, journal_dir):
+    original = contents(folder)
+    interrupted_batch(folder, history, journal_dir)
+
+    journal = pending_journals(journal_dir)[0]
+    result = ConversionEngine.for_journal(journal).rollback(journal)
+
+    assert (result.converted, result.errors) == (1, [])
+    assert pending_journals(journal_dir) == []
+    for name, data in original.items():
+        assert (folder / name).read_bytes() == data
+        assert not (folder / (name[:-4] + ".xlsx")).exists()
+
+
+def test_running_batch_is_not_listed_or_resumed(tmp_path, journal_dir):
+    ops = [(str(tmp_path / "a.xls"), str(tmp_path / "a.xlsx"))]
+    running = BatchJournal.begin(journal_dir, {"root": str(tmp_path)}, ops)
+    try:
+        assert pending_journals(journal_dir) == []
+        assert os.path.exists(running.path)
+
+        other = BatchJournal.load(running.path)
+        result = ConversionEngine.for_journal(other).resume(other)
+        assert result.converted == 0 and "still running" in result.errors[0]
+    finally:
+        running.close()
+
+    assert [journal.batch_id for journal in pending_journals(journal_dir)] == [running.batch_id]
+
+
+def test_unready_journal_is_removed(journal_dir):
+    os.makedirs(journal_dir)
+    path = os.path.join(journal_dir, "20240101-000000-00000000" + JOURNAL_SUFFIX)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"batch":"20240101-000000-00000000","count":2}\n[0,"a","b"]\n')
+
+    assert pending_journals(journal_dir) == []
+    assert not os.path.exists(path)
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from extupdate.rules import Rule, RuleSet
+
+
+def test_match_by_extension():
+    rules = RuleSet([Rule(".xls", ".xlsx"), Rule(".xlt", ".xltx")])
+    assert rules.match("/data/a.xls", "/data").target_ext == ".xlsx"
+    assert rules.match("/data/b.xlt", "/data").target_ext == ".xltx"
+    assert rules.match("/data/c.xlsx", "/data") is None
+    assert rules.match("/data/README", "/data") is None
+
+
+def test_first_accepting_rule_wins():
+    rules = RuleSet([
+        Rule(".xls", ".xlsm", include="macros/*"),
+        Rule(".xls", ".xlsx", exclude="archive/*"),
+    ])
+    assert rules.match("/data/macros/a.xls", "/data").target_ext == ".xlsm"
+    assert rules.match("/data/reports/a.xls", "/data").target_ext == ".xlsx"
+    assert rules.match("/data/archive/a.xls", "/data") is None
+
+
+def test_regex_is_searched_in_the_relative_path():
+    rules = RuleSet([Rule(".xml", ".xlsx", regex="^exports/")])
+    assert rules.match("/data/exports/q1.xml", "/data") is not None
+    assert rules.match("/data/other/exports/q1.xml", "/data") is None
+
+
+@pytest.mark.parametrize("rule", [
+    Rule("xls", ".xlsx"),
+    Rule(".xls", ".xls"),
+    Rule(".xls", ".tar.gz"),
+    Rule(".xls", ".xlsx", regex="("),
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        RuleSet([rule])
+
+
+def test_empty_rule_set_is_rejected():
+    with pytest.raises(ValueError):
+        RuleSet([])
+
+
+def test_load_rule_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": [{"from": ".xlt", "to": ".xltx"},
+                                          {"from": ".xls", "to": ".xlsx", "exclude": "archive/*"}]}))
+    rules = RuleSet.load(str(path))
+    assert rules.suffixes == {".xlt", ".xls"}
+    assert rules.rules[1].exclude == "archive/*"
+
+
+def test_parse_command_line_rule():
+    assert Rule.parse(".xls:.xlsx") == Rule(".xls", ".xlsx")
+    with pytest.raises(ValueError):
+        Rule.parse(".xls")
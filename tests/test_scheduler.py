@@ -0,0 +1,40 @@
+import json
+import os
+
+from extupdate.scheduler import JobScheduler, Manifest
+
+
+def test_relative_roots_are_relative_to_the_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base = tmp_path / "mf"
+    manifest = Manifest.from_dict({
+        "jobs": [{"root": "sub", "from": ".xls", "to": ".xlsx"},
+                 {"root": str(tmp_path / "abs"), "from": ".xls", "to": ".xlsx"}],
+        "device_limits": {"sub": 2},
+    }, str(base))
+
+    assert manifest.jobs[0].options.root == str(base / "sub")
+    assert manifest.jobs[0].name == "sub"
+    assert manifest.jobs[1].options.root == str(tmp_path / "abs")
+    assert manifest.device_limits == {str(base / "sub"): 2}
+
+
+def test_remote_roots_are_left_alone():
+    manifest = Manifest.from_dict({"jobs": [{"root": "s3://bucket/reports", "from": ".xls", "to": ".xlsx"}]},
+                                  "/srv/manifests")
+    assert manifest.jobs[0].options.root == "s3://bucket/reports"
+
+
+def test_load_runs_jobs_under_the_manifest_directory(tmp_path, monkeypatch):
+    folder = tmp_path / "mf" / "reports"
+    folder.mkdir(parents=True)
+    (folder / "a.xls").write_bytes(b"a")
+    path = tmp_path / "mf" / "manifest.json"
+    path.write_text(json.dumps({"jobs": [{"root": "reports", "from": ".xls", "to": ".xlsx"}]}))
+    # A cron job's working directory has nothing to do with the manifest
+    monkeypatch.chdir(tmp_path)
+
+    result = JobScheduler(Manifest.load(str(path))).run()
+
+    assert result.summary().converted == 1
+    assert "a.xlsx" in os.listdir(folder)